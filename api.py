@@ -0,0 +1,273 @@
+"""
+Headless HTTP service for AskDocs.
+
+    uvicorn api:app --host 0.0.0.0 --port 8000
+
+Endpoints:
+    POST /ingest?name=<file name>&workspace=<name>   raw PDF bytes in the body, returns job progress
+    GET  /jobs/{job_id}             ingestion progress
+    GET  /workspaces                names of the workspaces
+    GET  /bundle?workspace=<name>   the workspace's index as a bundle file (chunks, embeddings, manifest)
+    POST /bundle?workspace=<name>   bundle file in the body, swapped in without re-embedding or downtime
+    POST /chunks                    {"ids": [...], "workspaces": [...]}, stored chunks by ID
+    POST /retrieve                  {"question": str, "k": int, "workspaces": [...], "file_hashes": [...]}
+    POST /ask                       {"question": str, "history": [...], "workspaces": [...], "file_hashes": [...],
+                                     "conversation_id": str}
+    POST /ask/stream                same body, newline-delimited JSON events
+
+Empty "workspaces" means the default workspace; "file_hashes" restricts the search to those files.
+Older "history" messages are summarized once and cached; a "conversation_id" keeps that summary
+when the client drops old messages.
+    GET  /health                    liveness, answers as soon as the server listens
+    GET  /ready                     503 until models and indexes are loaded in the background
+    GET  /stats
+    GET  /metrics                   Prometheus text format
+    GET  /traces                    most recent request span trees
+"""
+
+import asyncio
+import json
+import os
+import sys
+import tempfile
+import threading
+from contextlib import asynccontextmanager
+
+# Workaround to ensure compatibility with SQLite
+__import__('pysqlite3')
+sys.modules['sqlite3'] = sys.modules.pop('pysqlite3')
+
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.responses import FileResponse, JSONResponse, PlainTextResponse, StreamingResponse
+from pydantic import BaseModel
+from starlette.background import BackgroundTask
+
+from util.metrics import metrics
+from util.printer import Printer
+
+
+class RetrieveRequest(BaseModel):
+    question: str
+    k: int = 20
+    workspaces: list = []
+    file_hashes: list = []
+
+
+class ChunksRequest(BaseModel):
+    ids: list[str]
+    workspaces: list = []
+
+
+class AskRequest(BaseModel):
+    question: str
+    history: list = []
+    workspaces: list = []
+    file_hashes: list = []
+    conversation_id: str = ""
+
+
+def serialize_docs(docs):
+    return [{"id": doc.metadata.get("id"), "page_content": doc.page_content, "metadata": doc.metadata}
+            for doc in docs]
+
+
+def create_service():
+    """Build the shared service from environment settings."""
+    # Heavy dependencies (torch, Chroma, swarm) load here, off the startup path
+    from rag.embeddings import get_embedding_service
+    from rag.rag import RAG, load_environment
+    from rag.service import AskDocsService
+    from rag.vectordb import VectorDB
+
+    load_environment()
+    vector_db = VectorDB(
+        persist_directory=os.getenv("ASKDOCS_PERSIST_DIRECTORY", "./chroma_db"),
+        embedding=get_embedding_service(),
+    )
+    rag = RAG(model=os.getenv("ASKDOCS_MODEL", "gemini/gemini-2.0-flash"))
+    return AskDocsService(vector_db, rag)
+
+
+async def _call(awaitable):
+    """Await a service call, reporting invalid workspace names as 400 errors."""
+    try:
+        return await awaitable
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+def create_app(service=None, service_factory=create_service, warm_up=True):
+    """
+    Args:
+        service: Ready-made AskDocsService, otherwise built by service_factory on first use
+        service_factory: Callable returning the AskDocsService
+        warm_up: Build and warm up the service on a background thread at startup; otherwise
+            it is built on the first request (including /ready) and ready once built
+    """
+    service_lock = threading.Lock()
+
+    def get_service():
+        if app.state.service is None:
+            with service_lock:
+                if app.state.service is None:
+                    app.state.service = service_factory()
+                    if not warm_up:
+                        app.state.ready.set()
+        return app.state.service
+
+    def warm():
+        try:
+            get_service().warm_up()
+            app.state.ready.set()
+        except Exception as e:
+            app.state.warm_up_error = str(e)
+            Printer().print(f"❌ Service warm-up failed: {e}", "red")
+
+    @asynccontextmanager
+    async def lifespan(app):
+        if warm_up:
+            threading.Thread(target=warm, name="askdocs-warm-up", daemon=True).start()
+        yield
+
+    app = FastAPI(title="AskDocs", lifespan=lifespan)
+    app.state.service = service
+    app.state.ready = threading.Event()
+    app.state.warm_up_error = None
+    if service is not None and not warm_up:
+        app.state.ready.set()
+
+    async def current_service():
+        # Requests arriving during warm-up wait for it without blocking the event loop
+        return app.state.service or await asyncio.to_thread(get_service)
+
+    @app.get("/health")
+    async def health():
+        return {"status": "ok"}
+
+    @app.get("/ready")
+    async def ready():
+        if not warm_up and not app.state.ready.is_set():
+            try:
+                await current_service()
+            except Exception as e:
+                return JSONResponse({"status": "failed", "error": str(e)}, status_code=503)
+        if app.state.ready.is_set():
+            return {"status": "ready"}
+        if app.state.warm_up_error:
+            return JSONResponse({"status": "failed", "error": app.state.warm_up_error}, status_code=503)
+        return JSONResponse({"status": "warming_up"}, status_code=503)
+
+    @app.get("/stats")
+    async def stats():
+        return (await current_service()).stats()
+
+    @app.get("/metrics", response_class=PlainTextResponse)
+    async def prometheus_metrics():
+        return PlainTextResponse(metrics.render_prometheus(), media_type="text/plain; version=0.0.4")
+
+    @app.get("/traces")
+    async def traces(limit: int = 20):
+        return {"traces": metrics.recent_traces(limit)}
+
+    @app.post("/ingest")
+    async def ingest(request: Request, name: str = "upload.pdf", workspace: str = None):
+        pdf_bytes = await request.body()
+        if not pdf_bytes:
+            raise HTTPException(status_code=400, detail="Empty request body")
+        try:
+            # Opening a workspace for the first time loads its indexes, so keep it off the event loop
+            service = await current_service()
+            return await asyncio.to_thread(service.ingest, pdf_bytes, name, workspace)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+
+    @app.get("/jobs/{job_id}")
+    async def job(job_id: int):
+        progress = (await current_service()).job(job_id)
+        if progress is None:
+            raise HTTPException(status_code=404, detail="Unknown job")
+        return progress
+
+    @app.get("/workspaces")
+    async def workspaces():
+        return {"workspaces": (await current_service()).workspaces.names()}
+
+    @app.get("/bundle")
+    async def export_bundle(workspace: str = None):
+        service = await current_service()
+        fd, path = tempfile.mkstemp(suffix=".zip")
+        os.close(fd)
+        try:
+            await _call(asyncio.to_thread(service.export_bundle, path, workspace))
+        except Exception:
+            os.remove(path)
+            raise
+        return FileResponse(path, media_type="application/zip", filename=f"{workspace or 'default'}.askdocs.zip",
+                            background=BackgroundTask(os.remove, path))
+
+    @app.post("/bundle")
+    async def import_bundle(request: Request, workspace: str = None):
+        service = await current_service()
+        fd, path = tempfile.mkstemp(suffix=".zip")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                async for data in request.stream():
+                    f.write(data)
+            count = await _call(asyncio.to_thread(service.import_bundle, path, workspace))
+        finally:
+            os.remove(path)
+        return {"chunks": count}
+
+    @app.post("/chunks")
+    async def chunks(body: ChunksRequest):
+        service = await current_service()
+        return {"docs": serialize_docs(await _call(service.chunks(body.ids, body.workspaces)))}
+
+    @app.post("/retrieve")
+    async def retrieve(body: RetrieveRequest):
+        service = await current_service()
+        docs = await _call(service.retrieve(body.question, k=body.k, workspaces=body.workspaces,
+                                            file_hashes=body.file_hashes))
+        return {"docs": serialize_docs(docs)}
+
+    @app.post("/ask")
+    async def ask(body: AskRequest):
+        service = await current_service()
+        result = await _call(service.ask(body.question, body.history, body.workspaces, body.file_hashes,
+                                          body.conversation_id or None))
+        return {"answer": result["answer"], "cached": result["cached"],
+                "report": result["report"], "docs": serialize_docs(result["docs"])}
+
+    @app.post("/ask/stream")
+    async def ask_stream(body: AskRequest):
+        service = await current_service()
+
+        async def events():
+            async for event in service.ask_stream(body.question, body.history, body.workspaces,
+                                                  body.file_hashes, body.conversation_id or None):
+                if event["type"] == "docs":
+                    event = {**event, "docs": serialize_docs(event["docs"])}
+                yield json.dumps(event) + "\n"
+
+        return StreamingResponse(events(), media_type="application/x-ndjson")
+
+    return app
+
+
+app = create_app()
+
+
+def start_background_server(host="127.0.0.1", port=8000, service=None):
+    """Run the service on a daemon thread, e.g. embedded in the Streamlit process."""
+    import uvicorn
+
+    server = uvicorn.Server(uvicorn.Config(create_app(service), host=host, port=port, log_level="warning"))
+    thread = threading.Thread(target=server.run, name="askdocs-api", daemon=True)
+    thread.start()
+    return server
+
+
+if __name__ == "__main__":
+    import uvicorn
+
+    uvicorn.run("api:app", host=os.getenv("ASKDOCS_HOST", "0.0.0.0"), port=int(os.getenv("ASKDOCS_PORT", "8000")))
@@ -5,16 +5,43 @@ import base64
 import os
 from pathlib import Path
 from PIL import Image
-import sys
-# Workaround to ensure compatibility with SQLite
-__import__('pysqlite3')
-sys.modules['sqlite3'] = sys.modules.pop('pysqlite3')
+import time
+import uuid
 
-from rag.rag import RAG
-from rag.vectordb import VectorDB
-from util.util import extract_text_from_pdf, chunk_text, convert_to_documents
+from util.client import AskDocsClient
 
 
+# Workspace this UI ingests into and searches (the service's default if unset)
+WORKSPACE = os.getenv("ASKDOCS_WORKSPACE")
+
+# Chat messages kept per session; older ones are dropped from the page
+MAX_HISTORY_MESSAGES = int(os.getenv("ASKDOCS_MAX_HISTORY", "50"))
+
+# URL of the AskDocs service; an embedded server is started unless ASKDOCS_API_URL is set.
+# This returns at once: the server loads its models on a background thread.
+@st.cache_resource
+def get_api_url():
+    api_url = os.getenv("ASKDOCS_API_URL")
+    if not api_url:
+        from api import start_background_server
+        port = int(os.getenv("ASKDOCS_PORT", "8000"))
+        start_background_server(port=port)
+        api_url = f"http://127.0.0.1:{port}"
+    return api_url
+
+# Client of the AskDocs service
+@st.cache_resource
+def get_client():
+    client = AskDocsClient(get_api_url())
+    # Wait for the service to accept connections
+    for _ in range(300):
+        try:
+            client.health()
+            break
+        except OSError:
+            time.sleep(0.1)
+    return client
+
 # Function to load and encode an image as base64 for displaying
 def get_image_as_base64(image_path):
     if os.path.exists(image_path):
@@ -27,32 +54,66 @@ def initialize_session_state():
     """Initialize session state variables for chat, PDF processing, and RAG system."""
     if 'chat_input' not in st.session_state:
         st.session_state.chat_input = ""
-    if 'pdf_chunks' not in st.session_state:
-        st.session_state.pdf_chunks = []
     if 'chat_history' not in st.session_state:
         st.session_state.chat_history = []
-    if 'retriever' not in st.session_state:
-        st.session_state.retriever = None
-    if 'rag' not in st.session_state:
-        st.session_state.rag = RAG(model="gemini/gemini-2.0-flash", functions=[])
-    if 'relevant_docs' not in st.session_state:
-        st.session_state.relevant_docs = []
-    if 'vector_db' not in st.session_state:
-        st.session_state.vector_db = VectorDB()  # Initialize without chunks
+    # Lets the service keep summarizing this chat after its oldest messages are trimmed
+    if 'conversation_id' not in st.session_state:
+        st.session_state.conversation_id = uuid.uuid4().hex
+    # Whether this session has documents to ask about
+    if 'documents_ready' not in st.session_state:
+        st.session_state.documents_ready = False
+    # IDs of the chunks behind the last answer; their texts live in the client's shared LRU
+    if 'relevant_ids' not in st.session_state:
+        st.session_state.relevant_ids = []
+    if 'context_report' not in st.session_state:
+        st.session_state.context_report = None
     # Store processed files to avoid reprocessing duplicates
     if 'processed_files' not in st.session_state:
         st.session_state.processed_files = {}
+    # Progress of background ingestion jobs started by this session
+    if 'ingest_jobs' not in st.session_state:
+        st.session_state.ingest_jobs = []
 
 # Function to calculate the MD5 hash of file content
 def get_file_hash(file_content):
     return hashlib.md5(file_content).hexdigest()
 
+# Show live progress of this session's ingestion jobs without blocking the page
+@st.fragment(run_every=1)
+def render_ingest_progress():
+    jobs = st.session_state.ingest_jobs
+    if not jobs:
+        return
+
+    client = get_client()
+    for i, progress in enumerate(jobs):
+        if progress["status"] not in ("done", "indexed", "failed"):
+            progress = jobs[i] = client.job(progress["job_id"])
+        if progress["status"] == "failed":
+            st.error(f"❌ {progress['name']}: {progress['error']}")
+            continue
+        st.progress(
+            min(progress["fraction"], 1.0),
+            text=(
+                f"{progress['name']} – {progress['status']}: "
+                f"{progress['pages']}/{progress['total_pages']} pages, {progress['chunks']} chunks "
+                f"({progress['pages_per_second']:.1f} pages/s, {progress['chunks_per_second']:.1f} chunks/s)"
+            ),
+        )
+
+    # Rerun the whole page once the first documents become searchable
+    if not st.session_state.documents_ready and any(job["status"] == "done" for job in jobs):
+        st.rerun()
+
 # Main application function
 def main():
     # Configure the Streamlit page
     icon = Image.open("assets/askdocs.jpg")
     st.set_page_config(page_title="AskDocs", page_icon=icon, layout="wide")
 
+    # Start the service early so it warms up while the user picks files
+    get_api_url()
+
     # Initialize session state variables
     initialize_session_state()
 
@@ -96,43 +157,34 @@ def main():
         )
         process_button = st.button("🛠 Process PDFs")
 
-    # Process uploaded PDF files
+    # Queue uploaded PDF files for background ingestion
     if process_button and uploaded_files:
-        with st.spinner('⚙️ Extracting & Analyzing PDFs...'):
-            all_chunks = {}  # Dictionary to store unique text chunks
-            new_files_count = 0
-            duplicate_files_count = 0
-
-            for pdf_file in uploaded_files:
-                # Read file content and compute its hash to check for duplicates
-                pdf_content = pdf_file.read()
-                file_hash = get_file_hash(pdf_content)
-                
-                # Skip if the file has already been processed
-                if file_hash in st.session_state.processed_files:
-                    duplicate_files_count += 1
-                    continue
-                
-                # Mark the file as processed
-                st.session_state.processed_files[file_hash] = pdf_file.name
-                new_files_count += 1
-                
-                # Reset file pointer and extract text
-                pdf_file.seek(0)
-                text = extract_text_from_pdf(pdf_file)
-                chunks = chunk_text(text)
-
-                # Store unique text chunks using a hash-based filtering approach
-                for chunk in chunks:
-                    chunk_id = hashlib.md5(chunk.encode()).hexdigest()
-                    if chunk_id not in all_chunks:
-                        all_chunks[chunk_id] = chunk
-
-            # Add new non-duplicate chunks to the vector database
-            if new_files_count > 0 and all_chunks:
-                doc_chunks = convert_to_documents(list(all_chunks.values()))
-                st.session_state.vector_db.add_documents(doc_chunks)
-                st.session_state.retriever = st.session_state.vector_db.get_retriever()
+        new_files_count = 0
+        duplicate_files_count = 0
+        indexed_files_count = 0
+
+        for pdf_file in uploaded_files:
+            # Read file content and compute its hash to check for duplicates
+            pdf_content = pdf_file.read()
+            file_hash = get_file_hash(pdf_content)
+            
+            # Skip if the file has already been processed
+            if file_hash in st.session_state.processed_files:
+                duplicate_files_count += 1
+                continue
+            
+            # Mark the file as processed
+            st.session_state.processed_files[file_hash] = pdf_file.name
+
+            # Extraction, chunking and embedding run on the service's ingestion worker;
+            # files already ingested by any session are reused immediately
+            progress = get_client().ingest(pdf_content, pdf_file.name, workspace=WORKSPACE)
+            if progress["status"] == "indexed":
+                indexed_files_count += 1
+                st.session_state.documents_ready = True
+                continue
+            new_files_count += 1
+            st.session_state.ingest_jobs.append(progress)
 
         # Display processing status messages in the sidebar
         with st.sidebar:
@@ -140,7 +192,17 @@ def main():
                 st.markdown(
                     f"""
                     <div style='background-color: #2A2A2A; padding: 10px; border-radius: 8px; color: #50C878; text-align: center;'>
-                        ✅ Successfully processed {new_files_count} new PDF(s)!
+                        ⚙️ Processing {new_files_count} new PDF(s) in the background
+                    </div>
+                    """,
+                    unsafe_allow_html=True
+                )
+
+            if indexed_files_count > 0:
+                st.markdown(
+                    f"""
+                    <div style='background-color: #2A2A2A; padding: 10px; border-radius: 8px; color: #50C878; text-align: center; margin-top: 10px;'>
+                        ♻️ Reused {indexed_files_count} already indexed PDF(s)
                     </div>
                     """,
                     unsafe_allow_html=True
@@ -156,8 +218,15 @@ def main():
                     unsafe_allow_html=True
                 )
 
-    # Ensure retriever is initialized before allowing questions
-    if not st.session_state.retriever:
+    # Documents become searchable as soon as the first ingestion job finishes
+    if any(job["status"] == "done" for job in st.session_state.ingest_jobs):
+        st.session_state.documents_ready = True
+
+    with st.sidebar:
+        render_ingest_progress()
+
+    # Ensure documents are available before allowing questions
+    if not st.session_state.documents_ready:
         st.warning("📌 Please upload and process PDFs before asking questions.")
         return
 
@@ -183,29 +252,27 @@ def main():
                 with st.chat_message("user"):
                     st.write(question)
 
-            # Retrieve relevant documents from the vector database
-            relevant_docs = st.session_state.retriever.invoke(question)
-
-            # Remove duplicate documents
-            seen = set()
-            unique_docs = []
-            for doc in relevant_docs:
-                if doc.page_content not in seen:
-                    seen.add(doc.page_content)
-                    unique_docs.append(doc)
-
-            st.session_state.relevant_docs = unique_docs
-            context = "\n".join([doc.page_content for doc in unique_docs])
+            # The service condenses the previous turns into a summary and a token-budgeted window,
+            # rewrites follow-ups into standalone queries, retrieves and streams the answer
+            previous_messages = st.session_state.chat_history[:-1]
+            with chat_container:
+                with st.chat_message("assistant"):
+                    # Only search the PDFs uploaded in this session
+                    events = get_client().ask_stream(
+                        question, previous_messages,
+                        workspaces=[WORKSPACE] if WORKSPACE else None,
+                        file_hashes=list(st.session_state.processed_files),
+                        conversation_id=st.session_state.conversation_id,
+                    )
+                    retrieved = next(events)
+                    answer = st.write_stream(event["text"] for event in events if event["type"] == "token")
 
-            # Generate a response using the RAG system
-            recent_messages = st.session_state.chat_history[-5:]
-            answer = st.session_state.rag.llm(messages=recent_messages, context=context)
+            st.session_state.relevant_ids = [doc.metadata.get("id") for doc in retrieved["docs"]]
+            st.session_state.context_report = retrieved["report"]
 
             # Add response to chat history
             st.session_state.chat_history.append({"role": "assistant", "content": answer})
-            with chat_container:
-                with st.chat_message("assistant"):
-                    st.write(answer)
+            del st.session_state.chat_history[:-MAX_HISTORY_MESSAGES]
 
     # Sidebar for displaying relevant documents
     with col_relevant:
@@ -218,8 +285,20 @@ def main():
             unsafe_allow_html=True
         )
 
+        report = st.session_state.context_report
+        if report:
+            st.caption(
+                f"📏 Prompt context: {report['selected']}/{report['candidates']} passages, "
+                f"~{report['prompt_tokens']} tokens ({report['tokens_saved']} saved)"
+            )
+            if report.get("history_tokens"):
+                st.caption(f"💬 Chat history: ~{report['history_tokens']} tokens, searched for “{report['query']}”")
+
         # Show relevant documents retrieved
-        if not st.session_state.relevant_docs:
+        relevant_docs = get_client().chunks(
+            st.session_state.relevant_ids, workspaces=[WORKSPACE] if WORKSPACE else None
+        ) if st.session_state.relevant_ids else []
+        if not relevant_docs:
             st.markdown(
                 """
                 <div style='background-color: #2A2A2A; padding: 15px; border-radius: 8px; text-align: center; color: #A0A0A0;'>
@@ -231,8 +310,10 @@ def main():
             )
         else:
             with st.container(height=500):
-                for idx, doc in enumerate(st.session_state.relevant_docs):
-                    with st.expander(f"{doc.page_content[:30]}", expanded=False):
+                for idx, doc in enumerate(relevant_docs):
+                    # Cite the source file and page when the chunk carries them
+                    citation = f"{doc.metadata['source']} (p. {doc.metadata['page']}) – " if "page" in doc.metadata else ""
+                    with st.expander(f"{citation}{doc.page_content[:30]}", expanded=False):
                         st.markdown(
                             f"""
                             <div style='background-color: #2A2A2A; padding: 10px; border-radius: 8px; box-shadow: 0 2px 4px rgba(0,0,0,0.2);'>
@@ -0,0 +1,216 @@
+"""
+Batch question answering over a JSONL file, for evaluations and nightly reports.
+
+    python batch.py questions.jsonl answers.jsonl --concurrency 8
+
+Input lines: {"id": ..., "question": str, "workspaces": [...], "file_hashes": [...]}
+Only "question" is required; the line number is used when "id" is missing.
+
+Output lines, written as each answer completes:
+    {"id", "question", "answer", "sources", "attempts", "seconds"}
+    {"id", "question", "error", "attempts"}     once the retries are exhausted
+
+The output file is also the checkpoint: running the same command again skips the
+questions that already have an answer and retries the failed ones, so the last
+line written for an id is the one that counts. IDs are written as strings.
+"""
+
+import argparse
+import json
+import os
+import random
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from itertools import islice
+
+from util.metrics import metrics
+from util.printer import Printer
+
+
+def read_questions(path, skip_ids=()):
+    """Yield the input records with a string "id", leaving out those in skip_ids."""
+    with open(path, encoding="utf-8") as f:
+        for line_number, line in enumerate(f, 1):
+            if not line.strip():
+                continue
+            record = json.loads(line)
+            record["id"] = str(record.get("id", line_number))
+            if record["id"] not in skip_ids:
+                yield record
+
+
+def load_checkpoint(path):
+    """
+    Return the IDs already answered in an output file. A last line cut off by a
+    crash is truncated away, so that new results start on a line of their own.
+    """
+    if not os.path.exists(path):
+        return set()
+    with open(path, "rb+") as f:
+        data = f.read()
+        end = data.rfind(b"\n") + 1
+        if end < len(data):
+            Printer().print(f"⚠ Dropping an incomplete last line from {path}", "yellow")
+            f.truncate(end)
+    answered = set()
+    for line in data[:end].splitlines():
+        record = json.loads(line)
+        if "error" not in record:
+            answered.add(record["id"])
+    return answered
+
+
+def _batches(records, size):
+    records = iter(records)
+    while batch := list(islice(records, size)):
+        yield batch
+
+
+class BatchRunner:
+    """
+    Answers many questions with an AskDocsService. Each batch of questions is
+    embedded in one model call and retrieved with one vectorized search per
+    workspace, while the LLM calls of earlier batches run on a bounded pool of
+    threads and are retried with exponential backoff.
+    """
+
+    def __init__(self, service, concurrency=8, batch_size=64, max_retries=4, backoff=1.0, max_backoff=30.0,
+                 sync_every=50):
+        self.printer = Printer()
+        self.service = service
+        self.concurrency = concurrency
+        self.batch_size = batch_size
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.sync_every = sync_every
+        embedding = service.vector_db.embedding
+        self.embed_batch = getattr(embedding, "embed_queries", embedding.embed_documents)
+
+    def _prepare(self, batch):
+        """
+        Embed and retrieve a batch of questions.
+        Returns:
+            (record, docs, context, error) per question; error is None on success
+        """
+        with metrics.span("batch_embed"):
+            vectors = self.embed_batch([record["question"] for record in batch])
+
+        # Questions restricted to the same workspaces and files share one search
+        groups = {}
+        for record, vector in zip(batch, vectors):
+            key = (tuple(record.get("workspaces") or ()), tuple(record.get("file_hashes") or ()))
+            groups.setdefault(key, []).append((record, vector))
+
+        prepared = []
+        for (workspaces, file_hashes), items in groups.items():
+            try:
+                with metrics.span("batch_retrieve"):
+                    results = self.service.workspaces.search_batch(
+                        [record["question"] for record, _ in items], [vector for _, vector in items],
+                        list(workspaces), self.service.k, list(file_hashes),
+                    )
+            except ValueError as e:
+                prepared.extend((record, [], "", str(e)) for record, _ in items)
+                continue
+            for (record, vector), docs in zip(items, results):
+                with metrics.span("context"):
+                    docs, context, _ = self.service.context_builder.build(record["question"], docs, vector)
+                prepared.append((record, docs, context, None))
+        return prepared
+
+    def _delay(self, attempt):
+        """Exponential backoff with full jitter, so that retries of parallel calls spread out."""
+        return random.uniform(0, min(self.max_backoff, self.backoff * 2 ** (attempt - 1)))
+
+    def _answer(self, record, docs, context):
+        """Call the LLM for one question, retrying failures; runs in a worker thread."""
+        started = time.perf_counter()
+        messages = [{"role": "user", "content": record["question"]}]
+        attempt = 0
+        while True:
+            attempt += 1
+            try:
+                with metrics.timer("llm"):
+                    answer = self.service.rag.llm(messages, context)
+                break
+            except Exception as e:
+                if attempt > self.max_retries:
+                    return {"id": record["id"], "question": record["question"],
+                            "error": f"{type(e).__name__}: {e}", "attempts": attempt}
+                metrics.inc("llm_retries")
+                time.sleep(self._delay(attempt))
+
+        sources = [{"id": doc.metadata.get("id"), "source": doc.metadata.get("source"),
+                    "page": doc.metadata.get("page")} for doc in docs]
+        return {"id": record["id"], "question": record["question"], "answer": answer, "sources": sources,
+                "attempts": attempt, "seconds": round(time.perf_counter() - started, 3)}
+
+    def _write(self, out, result, summary):
+        out.write(json.dumps(result, ensure_ascii=False) + "\n")
+        out.flush()
+        status = "failed" if "error" in result else "answered"
+        summary[status] += 1
+        metrics.inc("batch_questions", status=status)
+        if (summary["answered"] + summary["failed"]) % self.sync_every == 0:
+            os.fsync(out.fileno())
+            self.printer.print(f"{summary['answered']} answered, {summary['failed']} failed", "cyan")
+
+    def _drain(self, out, pending, summary, limit):
+        """Write finished answers until at most limit calls are outstanding."""
+        while len(pending) > limit:
+            finished, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in finished:
+                self._write(out, future.result(), summary)
+        return pending
+
+    def run(self, input_path, output_path):
+        """
+        Answer every question of input_path not yet answered in output_path.
+        Returns:
+            Counts of questions answered, failed and skipped (answered by an earlier run)
+        """
+        answered = load_checkpoint(output_path)
+        summary = {"answered": 0, "failed": 0, "skipped": len(answered)}
+        pending = set()
+        with open(output_path, "a", encoding="utf-8") as out, \
+                ThreadPoolExecutor(max_workers=self.concurrency, thread_name_prefix="batch-llm") as executor:
+            for batch in _batches(read_questions(input_path, answered), self.batch_size):
+                for record, docs, context, error in self._prepare(batch):
+                    if error is None:
+                        pending.add(executor.submit(self._answer, record, docs, context))
+                    else:
+                        self._write(out, {"id": record["id"], "question": record["question"],
+                                          "error": error, "attempts": 0}, summary)
+                # Retrieve the next batch while at most one batch of LLM calls is outstanding
+                pending = self._drain(out, pending, summary, max(self.batch_size, self.concurrency))
+            self._drain(out, pending, summary, 0)
+            os.fsync(out.fileno())
+        return summary
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("input", help="JSONL file of questions")
+    parser.add_argument("output", help="JSONL file of answers, appended to and used as the checkpoint")
+    parser.add_argument("--concurrency", type=int, default=8, help="Maximum number of LLM calls in flight")
+    parser.add_argument("--batch-size", type=int, default=64, help="Questions embedded and retrieved together")
+    parser.add_argument("--max-retries", type=int, default=4)
+    parser.add_argument("--backoff", type=float, default=1.0, help="Initial retry delay in seconds")
+    args = parser.parse_args()
+
+    from api import create_service
+
+    runner = BatchRunner(create_service(), concurrency=args.concurrency, batch_size=args.batch_size,
+                         max_retries=args.max_retries, backoff=args.backoff)
+    started = time.perf_counter()
+    summary = runner.run(args.input, args.output)
+    Printer().print(
+        f"✅ {summary['answered']} answered, {summary['failed']} failed, {summary['skipped']} already answered "
+        f"in {time.perf_counter() - started:.1f} seconds",
+        "bold_green",
+    )
+
+
+if __name__ == "__main__":
+    main()
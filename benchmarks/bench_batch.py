@@ -0,0 +1,144 @@
+"""
+Throughput of the batch question-answering runner (batch.py) against answering the
+same questions one at a time, with an LLM stub that has a fixed latency and fails
+a share of its calls. Also checks that batched retrieval returns the same chunks
+as single-query retrieval, and that a run cut off mid-line resumes without losing
+or repeating questions. Runs offline with hashing embeddings.
+
+Run from the repository root:
+    python -m benchmarks.bench_batch --chunks 5000 --questions 1000 --llm-latency 0.05
+"""
+
+import argparse
+import json
+import os
+import random
+import tempfile
+import time
+
+from batch import BatchRunner
+from benchmarks.bench_retrieval import make_chunks, make_queries
+from benchmarks.bench_workspaces import add_files
+from benchmarks.fakes import FakeRAG, HashingEmbeddings
+from rag.service import AskDocsService
+from rag.vectordb import VectorDB
+
+
+class FlakyRAG(FakeRAG):
+    """FakeRAG whose calls fail at random, like a rate-limited provider."""
+
+    def __init__(self, failure_rate=0.05, seed=0, **kwargs):
+        super().__init__(**kwargs)
+        self.failure_rate = failure_rate
+        self.random = random.Random(seed)
+        self.failures = 0
+
+    def llm(self, messages, context):
+        time.sleep(self.delay)
+        if self.random.random() < self.failure_rate:
+            self.failures += 1
+            raise ConnectionError("stub rate limit")
+        return super().llm(messages, context)
+
+
+def write_questions(path, queries, file_hash):
+    with open(path, "w", encoding="utf-8") as f:
+        for i, (question, _) in enumerate(queries):
+            record = {"id": f"q{i}", "question": question}
+            if i % 4 == 3:
+                record["file_hashes"] = [file_hash]
+            f.write(json.dumps(record) + "\n")
+
+
+def sequential(service, queries, count):
+    """Questions per second when each is embedded, retrieved and answered in turn."""
+    started = time.perf_counter()
+    for question, _ in queries[:count]:
+        vector = service.vector_db.embedding.embed_query(question)
+        docs = service.workspaces.search(question, vector, k=service.k)
+        docs, context, _ = service.context_builder.build(question, docs, vector)
+        for _ in range(5):
+            try:
+                service.rag.llm([{"role": "user", "content": question}], context)
+                break
+            except ConnectionError:
+                time.sleep(0.01)
+    return count / (time.perf_counter() - started)
+
+
+def agreement(service, queries, k):
+    """Share of queries whose batched retrieval returns the same chunks as single retrieval."""
+    questions = [question for question, _ in queries]
+    vectors = service.vector_db.embedding.embed_documents(questions)
+    batched = service.workspaces.search_batch(questions, vectors, k=k)
+    same = sum(
+        [doc.metadata.get("id") for doc in docs] ==
+        [doc.metadata.get("id") for doc in service.workspaces.search(question, vector, k=k)]
+        for question, vector, docs in zip(questions, vectors, batched)
+    )
+    return same / len(questions)
+
+
+def last_lines(path):
+    results = {}
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            record = json.loads(line)
+            results[record["id"]] = record
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--chunks", type=int, default=5000)
+    parser.add_argument("--questions", type=int, default=1000)
+    parser.add_argument("--sequential", type=int, default=100, help="Questions answered in the sequential baseline")
+    parser.add_argument("--llm-latency", type=float, default=0.05)
+    parser.add_argument("--failure-rate", type=float, default=0.05)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--batch-size", type=int, default=64)
+    args = parser.parse_args()
+
+    chunks = make_chunks(args.chunks)
+    queries = make_queries(chunks, args.questions)
+
+    with tempfile.TemporaryDirectory() as directory:
+        vector_db = VectorDB(persist_directory=os.path.join(directory, "db"), embedding=HashingEmbeddings(),
+                             embedding_cache_dir=None)
+        add_files(vector_db, chunks, 10, "f")
+        rag = FlakyRAG(failure_rate=args.failure_rate, delay=args.llm_latency)
+        service = AskDocsService(vector_db, rag)
+        questions_path = os.path.join(directory, "questions.jsonl")
+        output_path = os.path.join(directory, "answers.jsonl")
+        write_questions(questions_path, queries, chunks[0].metadata["file_hash"])
+
+        same = agreement(service, queries[:200], service.k)
+        sequential_qps = sequential(service, queries, min(args.sequential, len(queries)))
+
+        runner = BatchRunner(service, concurrency=args.concurrency, batch_size=args.batch_size,
+                             max_retries=8, backoff=0.01)
+        failures = rag.failures
+        started = time.perf_counter()
+        summary = runner.run(questions_path, output_path)
+        batch_seconds = time.perf_counter() - started
+        retried = rag.failures - failures
+
+        # Simulate a crash: keep the first 60% of the output, cut in the middle of a line
+        with open(output_path, "rb+") as f:
+            f.truncate(int(os.path.getsize(output_path) * 0.6))
+        resumed = runner.run(questions_path, output_path)
+        results = last_lines(output_path)
+        missing = len(queries) - sum("error" not in record for record in results.values())
+
+    print(f"\n{args.chunks} chunks, {args.questions} questions, LLM latency {args.llm_latency * 1000:.0f} ms, "
+          f"{args.failure_rate:.0%} of calls failing")
+    print(f"batched vs single retrieval agreement: {same:.3f}")
+    print(f"sequential: {sequential_qps:8.1f} questions/s")
+    print(f"batch:      {summary['answered'] / batch_seconds:8.1f} questions/s "
+          f"({summary['answered']} answered, {summary['failed']} failed, {retried} failed calls retried)")
+    print(f"resume after a cut-off write: {resumed['skipped']} skipped, {resumed['answered']} answered again, "
+          f"{missing} missing")
+
+
+if __name__ == "__main__":
+    main()
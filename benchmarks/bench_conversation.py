@@ -0,0 +1,150 @@
+"""
+Prompt size over a long scripted chat: the previous last-4-messages history
+against ConversationMemory (token-budgeted window, cached rolling summary and
+standalone query rewriting). The stub LLM gives answers of very different
+lengths, like the tables and lists the system prompt asks for, and records the
+tokens of every prompt it receives. The client keeps its last 50 messages, as
+the UI does. Runs offline with hashing embeddings.
+
+Run from the repository root:
+    python -m benchmarks.bench_conversation --turns 60
+"""
+
+import argparse
+import asyncio
+import os
+import random
+import tempfile
+
+import numpy as np
+
+from benchmarks.bench_retrieval import make_chunks
+from benchmarks.bench_workspaces import add_files
+from benchmarks.fakes import FakeRAG, HashingEmbeddings
+from rag.context import estimate_tokens
+from rag.memory import ConversationMemory
+from rag.service import AskDocsService
+from rag.vectordb import VectorDB
+
+# Rough size of RAG's instructions around the context
+INSTRUCTION_TOKENS = 150
+
+FOLLOW_UPS = [
+    "Can you explain that in more detail?",
+    "How does it compare with the previous one?",
+    "Show that as a table.",
+    "What are the exceptions to this?",
+    "Why is that?",
+    "And what about the second point?",
+]
+
+
+class ChattyRAG(FakeRAG):
+    """FakeRAG with answers of 80 to 900 tokens that records the size of every prompt."""
+
+    def __init__(self, seed=0, **kwargs):
+        super().__init__(**kwargs)
+        self.random = random.Random(seed)
+        self.answer_prompts = []
+        self.history_tokens = []
+        self.memory_prompts = []
+
+    def llm(self, messages, context):
+        history = sum(estimate_tokens(message["content"]) for message in messages[:-1])
+        self.history_tokens.append(history)
+        self.answer_prompts.append(INSTRUCTION_TOKENS + estimate_tokens(context or "") + history
+                                   + estimate_tokens(messages[-1]["content"]))
+        words = (context or "no context").split()
+        rows = self.random.randint(4, 60)
+        return "\n".join(f"| {words[i % len(words)]} | {' '.join(words[i:i + 8])} |" for i in range(rows))
+
+    def complete(self, prompt):
+        self.memory_prompts.append(estimate_tokens(prompt))
+        return super().complete(prompt)
+
+
+class LastMessages:
+    """The previous behaviour: the last four messages verbatim and the question as the query."""
+
+    def condense(self, history, conversation_id=None):
+        return "", list(history)[-4:]
+
+    def rewrite(self, question, summary, recent):
+        return question
+
+    def messages(self, question, summary, recent):
+        return recent + [{"role": "user", "content": question}]
+
+    def stats(self):
+        return {}
+
+
+def questions(chunks, turns, seed=0):
+    """A new topic every few turns, followed up with questions that only make sense in context."""
+    rng = random.Random(seed)
+    for turn in range(turns):
+        if turn % 4 == 0:
+            words = rng.choice(chunks).page_content.split()
+            yield f"What does the document say about {' '.join(words[:6])}?"
+        else:
+            yield rng.choice(FOLLOW_UPS)
+
+
+async def chat(service, chunks, turns, conversation_id, max_history=50):
+    history = []
+    for question in questions(chunks, turns):
+        result = await service.ask(question, history, conversation_id=conversation_id)
+        history += [{"role": "user", "content": question}, {"role": "assistant", "content": result["answer"]}]
+        del history[:-max_history]
+
+
+def summarize(name, rag, memory, warmup):
+    prompts = np.array(rag.answer_prompts[warmup:])
+    history = np.array(rag.history_tokens[warmup:])
+    quarter = max(len(prompts) // 4, 1)
+    stats = memory.stats()
+    extra = sum(rag.memory_prompts) / len(rag.answer_prompts)
+    print(f"{name:<22} {prompts.mean():>8.0f} {prompts.std():>7.0f} {prompts.max():>7.0f} "
+          f"{history.mean():>8.0f} {history.std():>7.0f} {prompts[:quarter].mean():>9.0f} "
+          f"{prompts[-quarter:].mean():>9.0f} {stats.get('summary_calls', 0):>6} "
+          f"{stats.get('messages_summarized', 0):>7} {extra:>8.0f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--chunks", type=int, default=2000)
+    parser.add_argument("--turns", type=int, default=60)
+    parser.add_argument("--window-tokens", type=int, default=800)
+    parser.add_argument("--summary-tokens", type=int, default=250)
+    parser.add_argument("--warmup", type=int, default=5, help="First turns left out of the statistics")
+    args = parser.parse_args()
+
+    chunks = make_chunks(args.chunks)
+    with tempfile.TemporaryDirectory() as directory:
+        vector_db = VectorDB(persist_directory=os.path.join(directory, "db"), embedding=HashingEmbeddings(),
+                             embedding_cache_dir=None)
+        add_files(vector_db, chunks, 10, "f")
+
+        print(f"\n{args.turns} turns, client keeps 50 messages; prompt and history sizes in estimated tokens")
+        print(f"{'history':<22} {'prompt':>8} {'std':>7} {'max':>7} {'history':>8} {'std':>7} "
+              f"{'first 1/4':>9} {'last 1/4':>9} {'sums':>6} {'msgs':>7} {'extra/t':>8}")
+        modes = [
+            ("last 4 messages", lambda rag: LastMessages(), "chat"),
+            ("memory", lambda rag: ConversationMemory(rag.complete, window_tokens=args.window_tokens,
+                                                      summary_tokens=args.summary_tokens), "chat"),
+            ("memory, no chat ID", lambda rag: ConversationMemory(rag.complete, window_tokens=args.window_tokens,
+                                                                  summary_tokens=args.summary_tokens), None),
+        ]
+        for name, make_memory, conversation_id in modes:
+            rag = ChattyRAG(answer_tokens=40)
+            memory = make_memory(rag)
+            service = AskDocsService(vector_db, rag, memory=memory)
+            asyncio.run(chat(service, chunks, args.turns, conversation_id))
+            summarize(name, rag, memory, args.warmup)
+
+    print("\nsums: summary calls, msgs: messages folded into summaries (each at most once with a chat ID), "
+          "extra/t: summary and rewrite prompt tokens per turn")
+
+
+if __name__ == "__main__":
+    main()
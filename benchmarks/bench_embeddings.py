@@ -0,0 +1,111 @@
+"""
+Chunks per second of the embedding backends on CPU, and how closely their
+embeddings agree with the current HuggingFaceEmbeddings (PyTorch fp32) ones.
+
+Compares, for every thread count:
+    huggingface     HuggingFaceEmbeddings with its default settings (the reference)
+    onnx-naive      fp32 ONNX, fixed batches in input order padded to their longest text
+    onnx            fp32 ONNX, length-bucketed batches sized by a token budget
+    onnx-int8       int8 ONNX, length-bucketed
+
+Needs the model exported first (python -m rag.onnx_embeddings DIR --int8) and
+exits non-zero when an ONNX backend's mean cosine agreement is below --min-cosine.
+
+Run from the repository root:
+    python -m benchmarks.bench_embeddings --onnx-dir ./models/bge-small-en-v1.5-onnx --texts 2000 --threads 1 4
+"""
+
+import argparse
+import random
+import sys
+import time
+
+import numpy as np
+
+from benchmarks.synthetic import make_sentences
+from rag.embeddings import DEFAULT_EMBEDDING_MODEL
+from rag.onnx_embeddings import DEFAULT_ONNX_DIR, OnnxEmbeddings, cosine_agreement
+
+
+def make_texts(count, max_sentences=40, seed=0):
+    """Chunk-like texts of very different lengths, from a short question to a long page."""
+    rng = random.Random(seed)
+    sentences = make_sentences(2000, seed=seed)
+    return [" ".join(rng.choices(sentences, k=rng.randint(1, max_sentences))) for _ in range(count)]
+
+
+def recall_at_k(reference, vectors, queries, k=10):
+    """Share of the reference top-k neighbours of each query text that the other embeddings also return."""
+    reference, vectors = np.asarray(reference, dtype=np.float32), np.asarray(vectors, dtype=np.float32)
+    found = 0
+    for query in queries:
+        expected = np.argsort(-(reference @ reference[query]))[:k]
+        actual = np.argsort(-(vectors @ vectors[query]))[:k]
+        found += len(set(expected) & set(actual))
+    return found / (k * len(queries))
+
+
+def timed(embed, texts):
+    start = time.perf_counter()
+    vectors = np.asarray(embed(texts), dtype=np.float32)
+    return vectors, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--onnx-dir", default=DEFAULT_ONNX_DIR)
+    parser.add_argument("--texts", type=int, default=2000)
+    parser.add_argument("--threads", type=int, nargs="+", default=[1, 4])
+    parser.add_argument("--max-batch-tokens", type=int, default=16384)
+    parser.add_argument("--min-cosine", type=float, default=0.99)
+    args = parser.parse_args()
+
+    texts = make_texts(args.texts)
+    queries = random.Random(1).sample(range(len(texts)), min(100, len(texts)))
+
+    import torch
+    from langchain_huggingface import HuggingFaceEmbeddings
+
+    results = []
+    for threads in args.threads:
+        torch.set_num_threads(threads)
+        reference_model = HuggingFaceEmbeddings(model_name=DEFAULT_EMBEDDING_MODEL)
+        reference_model.embed_documents(texts[:32])
+        reference, seconds = timed(reference_model.embed_documents, texts)
+        results.append((threads, "huggingface", seconds, None, None, None))
+
+        backends = {
+            "onnx-naive": dict(int8=False, bucket=False, max_batch_size=32),
+            "onnx": dict(int8=False),
+            "onnx-int8": dict(int8=True),
+        }
+        for name, options in backends.items():
+            # Agreement is measured here, so exports that would not load in the service are compared too
+            model = OnnxEmbeddings(args.onnx_dir, intra_op_threads=threads, max_batch_tokens=args.max_batch_tokens,
+                                   min_agreement=None, **options)
+            model.embed_array(texts[:32])
+            model.tokens = model.padded_tokens = 0
+            vectors, seconds = timed(model.embed_array, texts)
+            results.append((threads, name, seconds, model.stats()["padding_ratio"],
+                            cosine_agreement(reference, vectors), recall_at_k(reference, vectors, queries)))
+
+    lengths = [len(text.split()) for text in texts]
+    print(f"\n{args.texts} texts of {min(lengths)}-{max(lengths)} words (mean {np.mean(lengths):.0f}), "
+          f"max {args.max_batch_tokens} tokens per batch")
+    print(f"{'threads':>7} {'backend':<12} {'chunks/s':>9} {'padding':>8} {'cos mean':>9} {'cos min':>8} "
+          f"{'recall@10':>9}")
+    failed = False
+    for threads, name, seconds, padding, agreement, recall in results:
+        row = f"{threads:>7} {name:<12} {args.texts / seconds:>9.1f}"
+        if agreement is not None:
+            row += (f" {padding:>7.2f}x {agreement['mean']:>9.4f} {agreement['min']:>8.4f} {recall:>9.3f}")
+            failed = failed or agreement["mean"] < args.min_cosine
+        print(row)
+
+    if failed:
+        print(f"❌ Mean cosine agreement below {args.min_cosine}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,67 @@
+"""
+Time-to-first-token of the blocking RAG.llm path (new Swarm client per call)
+against RAG.llm_stream on a shared client, using a local stub model server.
+
+Run from the repository root:
+    python -m benchmarks.bench_llm_stream --calls 20
+"""
+
+import argparse
+import os
+import time
+
+from benchmarks.stub_llm import StubLLMServer
+from benchmarks.timing import latency_summary
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--calls", type=int, default=20)
+    parser.add_argument("--tokens", type=int, default=200)
+    parser.add_argument("--first-token-delay", type=float, default=0.3)
+    parser.add_argument("--token-delay", type=float, default=0.01)
+    args = parser.parse_args()
+
+    with StubLLMServer(args.first_token_delay, args.token_delay, args.tokens) as server:
+        # Point both the OpenAI client and LiteLLM at the stub before the client is created
+        os.environ.update({
+            "OPENAI_BASE_URL": server.base_url,
+            "OPENAI_API_BASE": server.base_url,
+            "OPENAI_API_KEY": "stub",
+            "GEMINI_API_KEY": os.environ.get("GEMINI_API_KEY", "stub"),
+        })
+        from swarm import Swarm
+        from rag.rag import RAG
+
+        messages = [{"role": "user", "content": "Summarize the backup policy."}]
+        context = "Backups run nightly and are kept for 30 days."
+        model = "openai/stub"
+
+        # Current path: a new client per call, nothing shown until the answer is complete
+        blocking = []
+        for _ in range(args.calls):
+            start = time.perf_counter()
+            RAG(model=model, client=Swarm()).llm(messages, context)
+            blocking.append(time.perf_counter() - start)
+
+        # Streaming path on the long-lived client
+        rag = RAG(model=model)
+        first_token, total = [], []
+        for _ in range(args.calls):
+            start = time.perf_counter()
+            for i, _ in enumerate(rag.llm_stream(messages, context)):
+                if i == 0:
+                    first_token.append(time.perf_counter() - start)
+            total.append(time.perf_counter() - start)
+
+    blocking, first_token, total = map(latency_summary, (blocking, first_token, total))
+    print(f"{'path':>22} {'p50 ms':>9} {'p99 ms':>9}")
+    print(f"{'blocking llm (answer)':>22} {blocking['p50_ms']:>9.1f} {blocking['p99_ms']:>9.1f}")
+    print(f"{'stream first token':>22} {first_token['p50_ms']:>9.1f} {first_token['p99_ms']:>9.1f}")
+    print(f"{'stream complete':>22} {total['p50_ms']:>9.1f} {total['p99_ms']:>9.1f}")
+    print(f"\nTTFT improvement: {blocking['p50_ms'] / first_token['p50_ms']:.1f}x "
+          f"({server.requests} requests over {len(server.connections)} client connections)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,65 @@
+"""
+Compare the serial extractor against the streaming process-pool extractor.
+
+Run from the repository root:
+    python -m benchmarks.bench_pdf_extract --pages 100 500
+"""
+
+import argparse
+import io
+import time
+
+import PyPDF2
+
+from benchmarks.synthetic import make_pdf
+from util.util import iter_pdf_pages
+
+
+def serial_extract(pdf_bytes):
+    """The original extract_text_from_pdf loop, kept here as the baseline."""
+    pdf_reader = PyPDF2.PdfReader(io.BytesIO(pdf_bytes))
+    text = ""
+    for page in pdf_reader.pages:
+        extracted_text = page.extract_text()
+        if extracted_text:
+            text += extracted_text
+    return text
+
+
+def streaming_extract(pdf_bytes, max_workers):
+    """Consume iter_pdf_pages, recording when the first page becomes available."""
+    start = time.perf_counter()
+    first_page = None
+    parts = []
+    for _, text in iter_pdf_pages(io.BytesIO(pdf_bytes), max_workers=max_workers):
+        if first_page is None:
+            first_page = time.perf_counter() - start
+        parts.append(text)
+    return "".join(parts), first_page
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pages", type=int, nargs="+", default=[50, 200, 500])
+    parser.add_argument("--workers", type=int, default=None)
+    args = parser.parse_args()
+
+    print(f"{'pages':>6} {'serial s':>10} {'stream s':>10} {'first page s':>13} {'speedup':>8}")
+    for pages in args.pages:
+        pdf_bytes = make_pdf(pages)
+
+        start = time.perf_counter()
+        baseline = serial_extract(pdf_bytes)
+        serial_seconds = time.perf_counter() - start
+
+        start = time.perf_counter()
+        text, first_page = streaming_extract(pdf_bytes, args.workers)
+        stream_seconds = time.perf_counter() - start
+
+        assert text == baseline, "streaming extractor returned different text"
+        print(f"{pages:>6} {serial_seconds:>10.2f} {stream_seconds:>10.2f} "
+              f"{first_page:>13.3f} {serial_seconds / stream_seconds:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
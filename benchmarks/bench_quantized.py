@@ -0,0 +1,112 @@
+"""
+Memory footprint, latency and recall of the quantized index (int8 and binary
+codes with exact re-scoring) against the Chroma HNSW index on the same vectors.
+Recall@k is measured against exact brute-force neighbours.
+
+Run from the repository root:
+    python -m benchmarks.bench_quantized --count 100000 --rescore 50 200 1000 5000
+"""
+
+import argparse
+import hashlib
+import os
+import tempfile
+import time
+
+import numpy as np
+from langchain_community.vectorstores import Chroma
+
+from benchmarks.fakes import HashingEmbeddings
+from benchmarks.timing import latency_summary
+from rag.quantized import QuantizedIndex
+
+
+def make_vectors(count, dim=384, clusters=1000, noise=0.6, seed=0):
+    """Normalized vectors around random cluster centres, like topical text embeddings."""
+    rng = np.random.default_rng(seed)
+    centres = rng.standard_normal((clusters, dim)).astype(np.float32)
+    vectors = centres[rng.integers(0, clusters, count)]
+    vectors += noise * rng.standard_normal((count, dim)).astype(np.float32)
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+def exact_neighbours(vectors, queries, k, block_size=100_000):
+    scores = np.concatenate([queries @ vectors[i:i + block_size].T
+                             for i in range(0, len(vectors), block_size)], axis=1)
+    return [set(row) for row in np.argpartition(-scores, k, axis=1)[:, :k]]
+
+
+def measure(search, queries, truth, k):
+    durations, hits = [], 0
+    for query, relevant in zip(queries, truth):
+        start = time.perf_counter()
+        rows = search(query)
+        durations.append(time.perf_counter() - start)
+        hits += len(relevant & set(rows[:k]))
+    return {"recall_at_k": hits / (len(queries) * k), **latency_summary(durations)}
+
+
+def directory_bytes(directory, exclude=("chroma.sqlite3",)):
+    total = 0
+    for root, _, files in os.walk(directory):
+        total += sum(os.path.getsize(os.path.join(root, name)) for name in files if name not in exclude)
+    return total
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--count", type=int, default=100_000)
+    parser.add_argument("--dim", type=int, default=384)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=20)
+    parser.add_argument("--rescore", type=int, nargs="+", default=[50, 200, 1000, 5000])
+    parser.add_argument("--skip-chroma", action="store_true")
+    args = parser.parse_args()
+
+    vectors = make_vectors(args.count, args.dim)
+    base = vectors[np.random.default_rng(1).integers(0, args.count, args.queries)]
+    queries = base + 0.3 * np.random.default_rng(2).standard_normal(base.shape).astype(np.float32)
+    queries /= np.linalg.norm(queries, axis=1, keepdims=True)
+    truth = exact_neighbours(vectors, queries, args.k)
+    ids = [hashlib.md5(str(i).encode()).hexdigest() for i in range(args.count)]
+    row_of = {chunk_id: row for row, chunk_id in enumerate(ids)}
+
+    results = []
+    with tempfile.TemporaryDirectory() as directory:
+        if not args.skip_chroma:
+            store = Chroma(collection_name="bench", persist_directory=os.path.join(directory, "chroma"),
+                           embedding_function=HashingEmbeddings(args.dim))
+            for i in range(0, args.count, 5000):
+                store._collection.add(ids=ids[i:i + 5000], embeddings=vectors[i:i + 5000],
+                                      documents=[str(row) for row in range(i, min(i + 5000, args.count))])
+
+            def chroma_search(query):
+                found = store._collection.query(query_embeddings=[query], n_results=args.k, include=[])
+                return [row_of[chunk_id] for chunk_id in found["ids"][0]]
+
+            result = measure(chroma_search, queries, truth, args.k)
+            results.append(("chroma hnsw", "-", directory_bytes(os.path.join(directory, "chroma")), result))
+
+        for mode in ("int8", "binary"):
+            index = QuantizedIndex(os.path.join(directory, mode), mode=mode)
+            for i in range(0, args.count, 50_000):
+                index.add(ids[i:i + 50_000], vectors[i:i + 50_000])
+            for rescore_k in args.rescore:
+                def quantized_search(query):
+                    return [row_of[chunk_id] for chunk_id, _ in index.search(query, args.k, rescore_k)]
+
+                result = measure(quantized_search, queries, truth, args.k)
+                results.append((mode, rescore_k, index.stats()["code_bytes"], result))
+
+    print(f"\n{args.count} vectors x {args.dim} dims, {args.queries} queries, recall@{args.k} vs exact search")
+    print(f"float32 vectors alone: {args.count * args.dim * 4 / 2**20:.1f} MiB")
+    print(f"{'index':>12} {'rescore':>8} {'search MiB':>11} {'recall':>8} {'p50 ms':>8} {'p99 ms':>8}")
+    for name, rescore_k, size, result in results:
+        print(f"{name:>12} {rescore_k:>8} {size / 2**20:>11.1f} {result['recall_at_k']:>8.3f} "
+              f"{result['p50_ms']:>8.2f} {result['p99_ms']:>8.2f}")
+    print("search MiB: HNSW segment files for Chroma, in-memory codes for the quantized index "
+          "(full vectors stay on disk and are read only for re-scored candidates)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,111 @@
+"""
+Recall and latency of dense-only vs hybrid (BM25 + dense) retrieval, plus BM25
+latency on a large in-memory index. Runs offline with hashing embeddings.
+
+Run from the repository root:
+    python -m benchmarks.bench_retrieval --chunks 20000 --lexical-size 1000000
+"""
+
+import argparse
+import hashlib
+import random
+import re
+import tempfile
+import time
+
+from langchain_core.documents import Document
+
+from benchmarks.fakes import HashingEmbeddings
+from benchmarks.synthetic import make_sentences, make_zipf_queries, make_zipf_texts
+from benchmarks.timing import latency_summary
+from rag.lexical import BM25Index
+from rag.vectordb import VectorDB
+
+IDENTIFIER = re.compile(r"ERR-\d+")
+
+
+def make_chunks(count, seed=0):
+    sentences = make_sentences(count * 3, seed=seed)
+    chunks = []
+    for i in range(count):
+        text = " ".join(sentences[i * 3:(i + 1) * 3])
+        chunk_id = hashlib.md5(text.encode()).hexdigest()
+        chunks.append(Document(page_content=text, metadata={"id": chunk_id}))
+    return chunks
+
+
+def make_queries(chunks, count, seed=0):
+    """Half identifier lookups, half keyword queries; each with its set of relevant ids."""
+    rng = random.Random(seed)
+    by_identifier = {}
+    for chunk in chunks:
+        for identifier in IDENTIFIER.findall(chunk.page_content):
+            by_identifier.setdefault(identifier, set()).add(chunk.metadata["id"])
+
+    identifiers = sorted(by_identifier)
+    queries = []
+    for i in range(count):
+        if i % 2 == 0 and identifiers:
+            identifier = rng.choice(identifiers)
+            queries.append((f"What does {identifier} mean?", by_identifier[identifier]))
+        else:
+            chunk = rng.choice(chunks)
+            words = chunk.page_content.split()
+            start = rng.randrange(max(len(words) - 8, 1))
+            queries.append((" ".join(words[start:start + 8]), {chunk.metadata["id"]}))
+    return queries
+
+
+def evaluate(retriever, queries, k):
+    hits = 0
+    durations = []
+    for query, relevant in queries:
+        start = time.perf_counter()
+        docs = retriever.invoke(query)
+        durations.append(time.perf_counter() - start)
+        if relevant & {doc.metadata.get("id") for doc in docs[:k]}:
+            hits += 1
+    return {"recall_at_k": hits / len(queries), **latency_summary(durations)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--chunks", type=int, default=20_000)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=20)
+    parser.add_argument("--lexical-size", type=int, default=1_000_000)
+    args = parser.parse_args()
+
+    chunks = make_chunks(args.chunks)
+    queries = make_queries(chunks, args.queries)
+
+    with tempfile.TemporaryDirectory() as directory:
+        vector_db = VectorDB(persist_directory=directory, embedding=HashingEmbeddings(), embedding_cache_dir=None)
+        for i in range(0, len(chunks), 1000):
+            vector_db.add_documents(chunks[i:i + 1000])
+
+        dense = evaluate(vector_db.get_retriever(search_kwargs={"k": args.k}), queries, args.k)
+        hybrid = evaluate(vector_db.get_retriever(search_type="hybrid", search_kwargs={"k": args.k}), queries, args.k)
+
+    print(f"\n{args.chunks} chunks, {args.queries} queries, recall@{args.k}")
+    print(f"{'retriever':>10} {'recall':>8} {'p50 ms':>8} {'p99 ms':>8}")
+    for name, result in (("dense", dense), ("hybrid", hybrid)):
+        print(f"{name:>10} {result['recall_at_k']:>8.3f} {result['p50_ms']:>8.2f} {result['p99_ms']:>8.2f}")
+
+    if args.lexical_size:
+        # Zipf-distributed text, so postings lengths look like a real corpus
+        index = BM25Index()
+        for offset in range(0, args.lexical_size, 20_000):
+            size = min(20_000, args.lexical_size - offset)
+            index.add([str(i) for i in range(offset, offset + size)], make_zipf_texts(size, seed=offset))
+
+        durations = []
+        for query in make_zipf_queries(args.queries):
+            start = time.perf_counter()
+            index.search(query, k=args.k)
+            durations.append(time.perf_counter() - start)
+        result = latency_summary(durations)
+        print(f"\nBM25 on {len(index)} chunks: p50 {result['p50_ms']:.2f} ms, p99 {result['p99_ms']:.2f} ms")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,179 @@
+"""
+Memory held by UI sessions when each keeps its own copies of the retrieved chunks
+and its whole chat, versus chunk IDs resolved through the client's shared LRU and
+a capped chat. Also reports the size of the compressed docstore and its read
+latency from the memory map and from the LRU.
+
+Run from the repository root:
+    python -m benchmarks.bench_session_memory --sessions 300 --turns 40
+"""
+
+import argparse
+import hashlib
+import itertools
+import json
+import os
+import random
+import tempfile
+import time
+import tracemalloc
+
+from langchain_core.documents import Document
+
+from benchmarks.synthetic import make_sentences
+from benchmarks.timing import latency_summary
+from rag.docstore import DocStore
+from util.client import AskDocsClient
+
+
+def make_chunks(count, sentences_per_chunk=12, seed=0):
+    sentences = make_sentences(count * sentences_per_chunk, seed=seed)
+    chunks = []
+    for i in range(count):
+        text = " ".join(sentences[i * sentences_per_chunk:(i + 1) * sentences_per_chunk])
+        chunk_id = hashlib.md5(text.encode()).hexdigest()
+        chunks.append(Document(page_content=text, metadata={
+            "id": chunk_id, "source": f"file-{i // 100}.pdf", "page": i % 100, "file_hash": "0" * 32,
+        }))
+    return chunks
+
+
+class LocalClient(AskDocsClient):
+    """AskDocsClient answering /chunks from a DocStore in-process instead of over HTTP."""
+
+    def __init__(self, docstore, **kwargs):
+        super().__init__(**kwargs)
+        self.docstore = docstore
+
+    def _json(self, method, path, body=None, content_type="application/json"):
+        found = self.docstore.get(body["ids"])
+        return {"docs": [{"page_content": found[chunk_id].page_content, "metadata": found[chunk_id].metadata}
+                         for chunk_id in body["ids"] if chunk_id in found]}
+
+
+def conversations(chunks, sessions, turns, k, answer_words, seed=0):
+    """Per session and turn, the JSON "docs" event the UI receives and the answer text."""
+    rng = random.Random(seed)
+    # Sessions mostly ask about the same popular chunks
+    cum_weights = list(itertools.accumulate(1 / (rank + 1) for rank in range(len(chunks))))
+    words = make_sentences(200, seed=seed)
+    for _ in range(sessions):
+        session = []
+        for _ in range(turns):
+            docs = rng.choices(chunks, cum_weights=cum_weights, k=k)
+            payload = json.dumps({"type": "docs", "docs": [
+                {"page_content": doc.page_content, "metadata": doc.metadata} for doc in docs
+            ]})
+            answer = " ".join(rng.choice(words) for _ in range(answer_words // 8))
+            session.append((f"Question {rng.random()}", payload, answer))
+        yield session
+
+
+def traced_bytes(build):
+    """Bytes still allocated by build() once it returns (its result is kept alive until then)."""
+    tracemalloc.start()
+    baseline = tracemalloc.get_traced_memory()[0]
+    state = build()
+    used = tracemalloc.get_traced_memory()[0] - baseline
+    tracemalloc.stop()
+    del state
+    return used
+
+
+def per_session_copies(traffic):
+    """Each session keeps the documents of its last answer, as decoded from the response."""
+    sessions = []
+    for conversation in traffic:
+        state = {"relevant_docs": []}
+        for _, payload, _ in conversation:
+            state["relevant_docs"] = [Document(page_content=doc["page_content"], metadata=doc["metadata"])
+                                      for doc in json.loads(payload)["docs"]]
+        sessions.append(state)
+    return sessions
+
+
+def shared_ids(traffic, docstore, cache_size):
+    """Each session keeps chunk IDs; the process-wide client resolves them on every rerun."""
+    client = LocalClient(docstore, chunk_cache_size=cache_size)
+    sessions = []
+    for conversation in traffic:
+        state = {"relevant_ids": []}
+        for _, payload, _ in conversation:
+            docs = client._documents(json.loads(payload)["docs"])
+            state["relevant_ids"] = [doc.metadata.get("id") for doc in docs]
+            client.chunks(state["relevant_ids"])
+        sessions.append(state)
+    return client, sessions
+
+
+def chat_history(traffic, max_messages=None):
+    sessions = []
+    for conversation in traffic:
+        history = []
+        for question, _, answer in conversation:
+            history += [{"role": "user", "content": question}, {"role": "assistant", "content": answer}]
+            if max_messages:
+                del history[:-max_messages]
+        sessions.append(history)
+    return sessions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--chunks", type=int, default=5000)
+    parser.add_argument("--sessions", type=int, nargs="+", default=[100, 300, 1000])
+    parser.add_argument("--turns", type=int, default=40)
+    parser.add_argument("--k", type=int, default=20)
+    parser.add_argument("--answer-words", type=int, default=250)
+    parser.add_argument("--max-history", type=int, default=50)
+    parser.add_argument("--cache-size", type=int, default=2048)
+    args = parser.parse_args()
+
+    chunks = make_chunks(args.chunks)
+    raw_bytes = sum(len(json.dumps({"page_content": chunk.page_content, "metadata": chunk.metadata}))
+                    for chunk in chunks)
+
+    def traffic(sessions):
+        return conversations(chunks, sessions, args.turns, args.k, args.answer_words)
+
+    with tempfile.TemporaryDirectory() as directory:
+        docstore = DocStore(os.path.join(directory, "docstore"), cache_size=args.cache_size)
+        docstore.add([chunk.metadata["id"] for chunk in chunks], chunks)
+        data_bytes = docstore.data_bytes
+
+        # Reads straight from the memory map, then the same reads served by the LRU
+        reopened = DocStore(os.path.join(directory, "docstore"), cache_size=args.cache_size)
+        batches = [[chunk.metadata["id"] for chunk in random.Random(i).sample(chunks, args.k)] for i in range(100)]
+        cold, warm = [], []
+        for durations in (cold, warm):
+            for ids in batches:
+                start = time.perf_counter()
+                reopened.get(ids)
+                durations.append(time.perf_counter() - start)
+
+        relevant = [
+            (sessions, traced_bytes(lambda: per_session_copies(traffic(sessions))),
+             traced_bytes(lambda: shared_ids(traffic(sessions), docstore, args.cache_size)))
+            for sessions in args.sessions
+        ]
+
+    sessions = args.sessions[0]
+    uncapped = traced_bytes(lambda: chat_history(traffic(sessions)))
+    capped = traced_bytes(lambda: chat_history(traffic(sessions), args.max_history))
+
+    cold_summary, warm_summary = latency_summary(cold), latency_summary(warm)
+    print(f"\n{args.chunks} chunks, {args.turns} turns per session, k={args.k}")
+    print(f"docstore: {raw_bytes / 2**20:.1f} MiB of chunk JSON stored in {data_bytes / 2**20:.1f} MiB "
+          f"({data_bytes / raw_bytes:.0%})")
+    print(f"docstore get of {args.k} chunks: p50 {cold_summary['p50_ms']:.3f} ms from the memory map, "
+          f"{warm_summary['p50_ms']:.3f} ms from the LRU")
+    print(f"\nRelevant chunks held by the UI process (IDs include the shared LRU of {args.cache_size} chunks)")
+    print(f"{'sessions':>9} {'copies MiB':>11} {'IDs MiB':>9}")
+    for count, before, after in relevant:
+        print(f"{count:>9} {before / 2**20:>11.1f} {after / 2**20:>9.1f}")
+    print(f"\nChat history per session: {uncapped / 1024 / sessions:.1f} KiB unbounded, "
+          f"{capped / 1024 / sessions:.1f} KiB capped at {args.max_history} messages")
+
+
+if __name__ == "__main__":
+    main()
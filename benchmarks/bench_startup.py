@@ -0,0 +1,137 @@
+"""
+Cold-start benchmark: import time of the main modules, time until a fresh API
+process answers /health (liveness) and /ready (models warmed up), and time to
+the first render of the Streamlit page. Every measurement runs in a new process.
+
+By default the API is built with the offline hashing embeddings and FakeRAG, so
+/ready measures Chroma/BM25 start-up only; --real uses api.create_service.
+
+Run from the repository root:
+    python -m benchmarks.bench_startup --repeat 3
+"""
+
+import argparse
+import json
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.error
+import urllib.request
+
+MODULES = ["util.client", "api", "rag.rag", "rag.embeddings", "rag.vectordb", "rag.service"]
+
+
+def cold_seconds(code, env=None):
+    start = time.perf_counter()
+    subprocess.run([sys.executable, "-c", code], check=True, capture_output=True, env=env)
+    return time.perf_counter() - start
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def wait_for(url, deadline):
+    """Poll url until it returns 200; returns the time it first did."""
+    while time.perf_counter() < deadline:
+        try:
+            with urllib.request.urlopen(url, timeout=1) as response:
+                if response.status == 200:
+                    return time.perf_counter()
+        except (OSError, urllib.error.HTTPError):
+            pass
+        time.sleep(0.02)
+    raise TimeoutError(url)
+
+
+def serve(port, persist_directory):
+    """Entry point of the API process started by server_startup (offline models)."""
+    import uvicorn
+
+    import api
+
+    def offline_service():
+        from benchmarks.fakes import FakeRAG, HashingEmbeddings
+        from rag.service import AskDocsService
+        from rag.vectordb import VectorDB
+
+        vector_db = VectorDB(persist_directory=persist_directory, embedding=HashingEmbeddings(),
+                             embedding_cache_dir=None)
+        return AskDocsService(vector_db, FakeRAG())
+
+    uvicorn.run(api.create_app(service_factory=offline_service), host="127.0.0.1", port=port, log_level="warning")
+
+
+def server_startup(real, timeout=300):
+    """Seconds from spawning the API process until /health and /ready succeed."""
+    port = free_port()
+    with tempfile.TemporaryDirectory() as directory:
+        if real:
+            command = [sys.executable, "-m", "uvicorn", "api:app", "--port", str(port), "--log-level", "warning"]
+        else:
+            command = [sys.executable, "-c", f"from benchmarks.bench_startup import serve; serve({port}, {directory!r})"]
+        start = time.perf_counter()
+        process = subprocess.Popen(command, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        try:
+            base = f"http://127.0.0.1:{port}"
+            healthy = wait_for(base + "/health", start + timeout)
+            ready = wait_for(base + "/ready", start + timeout)
+        finally:
+            process.terminate()
+            process.wait()
+    return healthy - start, ready - start
+
+
+def first_render(api_url):
+    """Seconds for a new process to import app.py and render the upload page once."""
+    code = (
+        "from streamlit.testing.v1 import AppTest\n"
+        "at = AppTest.from_file('app.py', default_timeout=120).run()\n"
+        "assert not at.exception, at.exception\n"
+    )
+    return cold_seconds(code, env={**os.environ, "ASKDOCS_API_URL": api_url})
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--real", action="store_true", help="Start the API with the real models")
+    parser.add_argument("--output", help="Optional JSON file for the results")
+    args = parser.parse_args()
+
+    results = {}
+    baseline = cold_seconds("pass")
+    results["python_seconds"] = baseline
+    for module in MODULES:
+        samples = [cold_seconds(f"import {module}") - baseline for _ in range(args.repeat)]
+        results[f"import_{module}_seconds"] = statistics.median(samples)
+
+    samples = [server_startup(args.real) for _ in range(args.repeat)]
+    results["api_health_seconds"] = statistics.median(sample[0] for sample in samples)
+    results["api_ready_seconds"] = statistics.median(sample[1] for sample in samples)
+
+    try:
+        import streamlit  # noqa: F401
+    except ImportError:
+        print("streamlit is not installed, skipping the first-render measurement")
+    else:
+        # The page never waits for the service, so an unreachable URL is fine here
+        results["first_render_seconds"] = statistics.median(
+            first_render(f"http://127.0.0.1:{free_port()}") for _ in range(args.repeat)
+        )
+
+    for name, value in results.items():
+        print(f"  {name:<40} {value:>8.3f}")
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
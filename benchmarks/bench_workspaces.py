@@ -0,0 +1,85 @@
+"""
+Retrieval latency and result isolation for workspaces: searching the whole global
+corpus, one file of it (pre-filtered), a small workspace, and a fan-out over both.
+Runs offline with hashing embeddings.
+
+Run from the repository root:
+    python -m benchmarks.bench_workspaces --global-chunks 20000 --small-chunks 500
+"""
+
+import argparse
+import tempfile
+import time
+
+from benchmarks.bench_retrieval import make_chunks, make_queries
+from benchmarks.fakes import HashingEmbeddings
+from benchmarks.timing import latency_summary
+from rag.vectordb import VectorDB
+from rag.workspaces import WorkspaceStore
+
+
+def add_files(vector_db, chunks, files, prefix):
+    """Split chunks into files with their own hash, as ingestion would, and add them."""
+    per_file = -(-len(chunks) // files)
+    for i in range(files):
+        file_hash = f"{prefix}{i:04d}".ljust(32, "0")
+        batch = chunks[i * per_file:(i + 1) * per_file]
+        for chunk in batch:
+            chunk.metadata.update({"file_hash": file_hash, "source": f"{prefix}-{i}.pdf"})
+        for offset in range(0, len(batch), 1000):
+            vector_db.add_documents(batch[offset:offset + 1000])
+
+
+def measure(store, queries, k, **kwargs):
+    durations, hits, leaked = [], 0, 0
+    embedding = store.default_db.embedding
+    for question, relevant in queries:
+        query_vector = embedding.embed_query(question)
+        start = time.perf_counter()
+        docs = store.search(question, query_vector, k=k, **kwargs)
+        durations.append(time.perf_counter() - start)
+        ids = {doc.metadata.get("id") for doc in docs}
+        hits += bool(relevant & ids)
+        if kwargs.get("file_hashes"):
+            leaked += sum(doc.metadata.get("file_hash") not in kwargs["file_hashes"] for doc in docs)
+    return {"recall_at_k": hits / len(queries), "leaked": leaked, **latency_summary(durations)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--global-chunks", type=int, default=20_000)
+    parser.add_argument("--global-files", type=int, default=40)
+    parser.add_argument("--small-chunks", type=int, default=500)
+    parser.add_argument("--queries", type=int, default=100)
+    parser.add_argument("--k", type=int, default=20)
+    args = parser.parse_args()
+
+    global_chunks = make_chunks(args.global_chunks, seed=0)
+    small_chunks = make_chunks(args.small_chunks, seed=1)
+
+    with tempfile.TemporaryDirectory() as directory:
+        store = WorkspaceStore(VectorDB(persist_directory=directory, embedding=HashingEmbeddings(),
+                                        embedding_cache_dir=None))
+        add_files(store.default_db, global_chunks, args.global_files, "g")
+        add_files(store.get("small"), small_chunks, 1, "s")
+
+        first_file = global_chunks[0].metadata["file_hash"]
+        file_chunks = [chunk for chunk in global_chunks if chunk.metadata["file_hash"] == first_file]
+        runs = [
+            ("global", make_queries(global_chunks, args.queries), {}),
+            ("global, one file", make_queries(file_chunks, args.queries), {"file_hashes": [first_file]}),
+            ("small workspace", make_queries(small_chunks, args.queries), {"workspaces": ["small"]}),
+            ("fan-out both", make_queries(small_chunks, args.queries), {"workspaces": ["default", "small"]}),
+        ]
+        results = [(name, measure(store, queries, args.k, **kwargs)) for name, queries, kwargs in runs]
+
+    print(f"\n{args.global_chunks} global chunks in {args.global_files} files, "
+          f"{args.small_chunks} in the small workspace, recall@{args.k}")
+    print(f"{'search':>18} {'recall':>8} {'leaked':>7} {'p50 ms':>8} {'p99 ms':>8}")
+    for name, result in results:
+        print(f"{name:>18} {result['recall_at_k']:>8.3f} {result['leaked']:>7} "
+              f"{result['p50_ms']:>8.2f} {result['p99_ms']:>8.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,67 @@
+"""Offline stand-ins for the embedding model and the LLM."""
+
+import hashlib
+import re
+import time
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+WORD_PATTERN = re.compile(r"[a-z]+")
+
+
+class HashingEmbeddings(Embeddings):
+    """
+    Deterministic bag-of-words embeddings built with the hashing trick.
+    Only alphabetic tokens are used, which mimics how poorly subword models
+    separate identifiers such as ERR-1042 from ERR-1043.
+    """
+
+    model_name = "hashing-bow"
+
+    def __init__(self, dim=384):
+        self.dim = dim
+
+    def _embed(self, text):
+        vector = np.zeros(self.dim, dtype=np.float32)
+        for word in WORD_PATTERN.findall(text.lower()):
+            digest = hashlib.md5(word.encode()).digest()
+            bucket = int.from_bytes(digest[:4], "little") % self.dim
+            vector[bucket] += 1.0 if digest[4] & 1 else -1.0
+        norm = np.linalg.norm(vector)
+        return (vector / norm if norm else vector).tolist()
+
+    def embed_documents(self, texts):
+        return [self._embed(text) for text in texts]
+
+    def embed_query(self, text):
+        return self._embed(text)
+
+
+class FakeRAG:
+    """Drop-in for rag.rag.RAG that answers from the context without any network call."""
+
+    def __init__(self, answer_tokens=50, delay=0.0):
+        self.answer_tokens = answer_tokens
+        self.delay = delay
+        self.calls = 0
+
+    def _tokens(self, messages, context):
+        words = (context or messages[-1]["content"]).split()
+        return [words[i % len(words)] + " " for i in range(self.answer_tokens)] if words else ["(empty) "]
+
+    def llm(self, messages, context):
+        self.calls += 1
+        time.sleep(self.delay)
+        return "".join(self._tokens(messages, context))
+
+    def llm_stream(self, messages, context):
+        self.calls += 1
+        time.sleep(self.delay)
+        yield from self._tokens(messages, context)
+
+    def complete(self, prompt):
+        """Reply to a summary or rewrite prompt with its last answer_tokens words."""
+        self.calls += 1
+        time.sleep(self.delay)
+        return " ".join(prompt.split()[-self.answer_tokens:])
@@ -0,0 +1,120 @@
+"""
+Load test for the AskDocs HTTP service: concurrent /ask requests against a
+stubbed LLM, reporting QPS and p50/p99 latency.
+
+By default an in-process service is started on a temporary Chroma directory with
+hashing embeddings and a stub model server. Pass --url to target a running service.
+
+Run from the repository root:
+    python -m benchmarks.load_test --requests 500 --concurrency 32
+"""
+
+import argparse
+import asyncio
+import os
+import socket
+import sys
+import tempfile
+import time
+
+import httpx
+
+from benchmarks.stub_llm import StubLLMServer
+from benchmarks.synthetic import make_pdf, make_sentences
+from benchmarks.timing import latency_summary
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def start_local_service(directory, llm_url, pages):
+    """Start the API on a daemon thread with offline embeddings and the stub LLM."""
+    os.environ.update({
+        "OPENAI_BASE_URL": llm_url,
+        "OPENAI_API_BASE": llm_url,
+        "OPENAI_API_KEY": "stub",
+        "GEMINI_API_KEY": os.environ.get("GEMINI_API_KEY", "stub"),
+    })
+    from api import start_background_server
+    from benchmarks.fakes import HashingEmbeddings
+    from rag.rag import RAG
+    from rag.service import AskDocsService
+    from rag.vectordb import VectorDB
+
+    vector_db = VectorDB(persist_directory=directory, embedding=HashingEmbeddings(), embedding_cache_dir=None)
+    service = AskDocsService(vector_db, RAG(model="openai/stub"))
+    port = free_port()
+    start_background_server(port=port, service=service)
+    url = f"http://127.0.0.1:{port}"
+
+    with httpx.Client(base_url=url, timeout=600) as client:
+        for _ in range(100):
+            try:
+                client.get("/health")
+                break
+            except httpx.TransportError:
+                time.sleep(0.1)
+        job = client.post("/ingest", params={"name": "synthetic.pdf"}, content=make_pdf(pages)).json()
+        while job["status"] not in ("done", "indexed", "failed"):
+            time.sleep(0.2)
+            job = client.get(f"/jobs/{job['job_id']}").json()
+        print(f"Ingested {job.get('pages', 0)} pages, {job.get('chunks', 0)} chunks ({job['status']})")
+    return url
+
+
+async def run_load(url, questions, concurrency):
+    semaphore = asyncio.Semaphore(concurrency)
+    durations = []
+    errors = 0
+
+    async with httpx.AsyncClient(base_url=url, timeout=600,
+                                 limits=httpx.Limits(max_connections=concurrency)) as client:
+        async def ask(question):
+            nonlocal errors
+            async with semaphore:
+                start = time.perf_counter()
+                try:
+                    response = await client.post("/ask", json={"question": question, "history": []})
+                    response.raise_for_status()
+                    durations.append(time.perf_counter() - start)
+                except httpx.HTTPError:
+                    errors += 1
+
+        start = time.perf_counter()
+        await asyncio.gather(*(ask(question) for question in questions))
+        elapsed = time.perf_counter() - start
+        stats = (await client.get("/stats")).json()
+    return durations, errors, elapsed, stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", help="Base URL of a running service (default: start one in-process)")
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--pages", type=int, default=50)
+    parser.add_argument("--first-token-delay", type=float, default=0.2)
+    parser.add_argument("--token-delay", type=float, default=0.002)
+    args = parser.parse_args()
+
+    # Distinct questions, so the semantic cache does not short-circuit the LLM
+    questions = [f"{sentence} (#{i})" for i, sentence in enumerate(make_sentences(args.requests, seed=42))]
+
+    with tempfile.TemporaryDirectory() as directory, \
+            StubLLMServer(args.first_token_delay, args.token_delay, tokens=100) as llm:
+        url = args.url or start_local_service(directory, llm.base_url, args.pages)
+        durations, errors, elapsed, stats = asyncio.run(run_load(url, questions, args.concurrency))
+
+    summary = latency_summary(durations)
+    print(f"\n{args.requests} requests, concurrency {args.concurrency}, {errors} errors")
+    print(f"QPS {len(durations) / elapsed:.1f}   p50 {summary['p50_ms']:.0f} ms   p99 {summary['p99_ms']:.0f} ms")
+    if stats.get("query_batches"):
+        print(f"Query embeddings: {stats['queries_embedded']} in {stats['query_batches']} batches")
+    sys.exit(1 if errors else 0)
+
+
+if __name__ == "__main__":
+    main()
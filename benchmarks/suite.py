@@ -0,0 +1,208 @@
+"""
+Offline end-to-end benchmark suite for the ingest and query paths.
+
+Everything runs locally: PDFs are generated, embeddings come from the hashing
+model in benchmarks/fakes.py (or the real model with --embedding hf if it is
+already downloaded), the LLM is replaced by FakeRAG and Chroma lives in a
+temporary directory. Results are written as JSON so runs can be compared.
+
+Run from the repository root:
+    python -m benchmarks.suite --output bench.json
+    python -m benchmarks.suite --output new.json --compare bench.json
+"""
+
+import argparse
+import asyncio
+import io
+import json
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+
+from benchmarks.bench_retrieval import evaluate, make_queries
+from benchmarks.fakes import FakeRAG, HashingEmbeddings
+from benchmarks.synthetic import make_pdf, make_sentences
+from benchmarks.timing import latency_summary
+from util.util import chunk_text, extract_text_from_pdf, iter_chunks, iter_pdf_pages
+
+# Metrics where a larger value is better; everything else is a duration or count
+HIGHER_IS_BETTER = ("per_second", "recall")
+
+
+def timed(fn, *args, **kwargs):
+    start = time.perf_counter()
+    result = fn(*args, **kwargs)
+    return result, time.perf_counter() - start
+
+
+def nested_chunks(docs):
+    """Count chunks whose page range lies inside the previous chunk's, i.e. that hold no new text."""
+    return sum(
+        previous.metadata["page"] == doc.metadata["page"] and previous.metadata["start"] <= doc.metadata["start"]
+        and doc.metadata["end"] <= previous.metadata["end"]
+        for previous, doc in zip(docs, docs[1:])
+    )
+
+
+def long_sentence_pages(pages, seed=0):
+    """Pages mixing short sentences with ones longer than a chunk, which the chunker has to split."""
+    return [
+        (page, " ".join(", ".join(sentence.rstrip(".") for sentence in make_sentences(count, seed=seed + page)) + "."
+                        for count in (1, 3, 30, 2, 5, 1)))
+        for page in range(1, pages + 1)
+    ]
+
+
+def load_embedding(name):
+    if name == "hf":
+        from rag.embeddings import get_embedding_service
+        return get_embedding_service()
+    return HashingEmbeddings()
+
+
+def bench_size(pages, embedding, queries, k):
+    """Run every stage on one generated PDF and return a flat dict of metrics."""
+    from rag.service import AskDocsService
+    from rag.vectordb import VectorDB
+
+    pdf_bytes = make_pdf(pages, seed=pages)
+    metrics = {}
+
+    text, seconds = timed(extract_text_from_pdf, io.BytesIO(pdf_bytes))
+    metrics["extract_seconds"] = seconds
+    metrics["extract_pages_per_second"] = pages / seconds
+
+    chunks, seconds = timed(chunk_text, text)
+    metrics["chunk_text_seconds"] = seconds
+    metrics["chunk_text_chars_per_second"] = len(text) / seconds
+
+    docs, seconds = timed(lambda: list(iter_chunks(iter_pdf_pages(io.BytesIO(pdf_bytes)), "bench")))
+    metrics["stream_extract_chunk_seconds"] = seconds
+    metrics["chunks"] = len(docs)
+    long_docs = list(iter_chunks(long_sentence_pages(pages), "long"))
+    metrics["nested_chunks"] = nested_chunks(docs) + nested_chunks(long_docs)
+
+    texts = [doc.page_content for doc in docs]
+    _, seconds = timed(embedding.embed_documents, texts)
+    metrics["embed_chunks_per_second"] = len(texts) / seconds
+
+    with tempfile.TemporaryDirectory() as directory:
+        vector_db = VectorDB(persist_directory=directory, embedding=embedding, embedding_cache_dir=None)
+
+        _, seconds = timed(vector_db.add_documents, docs)
+        metrics["add_documents_seconds"] = seconds
+        metrics["add_documents_chunks_per_second"] = len(docs) / seconds
+
+        # Re-adding the same chunks should be close to free
+        _, seconds = timed(vector_db.add_documents, docs)
+        metrics["readd_documents_seconds"] = seconds
+
+        query_set = make_queries(docs, queries)
+        for search_type in ("similarity", "hybrid"):
+            retriever = vector_db.get_retriever(search_type=search_type, search_kwargs={"k": k})
+            result = evaluate(retriever, query_set, k)
+            metrics[f"{search_type}_recall_at_{k}"] = result["recall_at_k"]
+            metrics[f"{search_type}_p50_ms"] = result["p50_ms"]
+            metrics[f"{search_type}_p99_ms"] = result["p99_ms"]
+
+        # End-to-end ask through the service, with the LLM replaced by FakeRAG
+        service = AskDocsService(vector_db, FakeRAG())
+
+        async def ask_all():
+            durations = []
+            for i, (question, _) in enumerate(query_set):
+                start = time.perf_counter()
+                await service.ask(question, history=[{"role": "user", "content": str(i)}])
+                durations.append(time.perf_counter() - start)
+            return durations
+
+        result = latency_summary(asyncio.run(ask_all()))
+        metrics["ask_p50_ms"] = result["p50_ms"]
+        metrics["ask_p99_ms"] = result["p99_ms"]
+        service.llm_executor.shutdown()
+
+    return metrics
+
+
+def git_commit():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(current, baseline_path, tolerance):
+    """Print the change of every metric against a previous run; return the regressions."""
+    with open(baseline_path) as f:
+        baseline = json.load(f)["results"]
+
+    regressions = []
+    print(f"\nComparison with {baseline_path} (tolerance {tolerance:.0%})")
+    for size, metrics in current.items():
+        for name, value in metrics.items():
+            old = baseline.get(size, {}).get(name)
+            if not old:
+                continue
+            change = (value - old) / old
+            worse = -change if any(key in name for key in HIGHER_IS_BETTER) else change
+            flag = "  REGRESSION" if worse > tolerance and not name == "chunks" else ""
+            if flag:
+                regressions.append(f"{size}.{name}")
+            print(f"  {size:>10} {name:<34} {old:>12.4g} -> {value:>12.4g} ({change:+.1%}){flag}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pages", type=int, nargs="+", default=[10, 100, 1000])
+    parser.add_argument("--queries", type=int, default=100)
+    parser.add_argument("--k", type=int, default=20)
+    parser.add_argument("--embedding", choices=["hashing", "hf"], default="hashing")
+    parser.add_argument("--output", default="benchmark_results.json")
+    parser.add_argument("--compare", help="Previous results file to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="Relative slowdown reported as a regression")
+    args = parser.parse_args()
+
+    embedding = load_embedding(args.embedding)
+    results = {}
+    for pages in args.pages:
+        print(f"\n=== {pages} pages ===")
+        results[f"pages_{pages}"] = bench_size(pages, embedding, args.queries, args.k)
+
+    report = {
+        "meta": {
+            "commit": git_commit(),
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+            "python": sys.version.split()[0],
+            "platform": platform.platform(),
+            "embedding": args.embedding,
+            "queries": args.queries,
+            "k": args.k,
+        },
+        "results": results,
+    }
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"\nWrote {args.output}")
+
+    for size, metrics in results.items():
+        print(f"\n{size}")
+        for name, value in metrics.items():
+            print(f"  {name:<34} {value:>12.4g}")
+
+    nested = [size for size, metrics in results.items() if metrics["nested_chunks"]]
+    if nested:
+        print(f"\nChunks repeating only text of the previous chunk in: {', '.join(nested)}")
+        sys.exit(1)
+
+    if args.compare:
+        regressions = compare(results, args.compare, args.tolerance)
+        if regressions:
+            print(f"\n{len(regressions)} regression(s): {', '.join(regressions)}")
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
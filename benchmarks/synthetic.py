@@ -0,0 +1,94 @@
+"""Synthetic inputs for offline benchmarks."""
+
+import random
+
+import numpy as np
+
+WORDS = (
+    "system document network storage policy error code module request latency "
+    "index vector query model server client config release update backup cluster "
+    "node memory thread process cache token page chunk answer context retrieval"
+).split()
+
+
+def make_sentences(count, seed=0):
+    """Return a list of pseudo-random sentences drawn from a small vocabulary."""
+    rng = random.Random(seed)
+    sentences = []
+    for i in range(count):
+        words = [rng.choice(WORDS) for _ in range(rng.randint(6, 18))]
+        # Sprinkle in identifier-like tokens so lexical search has something to find
+        if i % 7 == 0:
+            words.append(f"ERR-{rng.randint(1000, 9999)}")
+        sentence = " ".join(words)
+        sentences.append(sentence[0].upper() + sentence[1:] + ".")
+    return sentences
+
+
+def make_zipf_texts(count, words_per_text=40, vocab_size=50_000, seed=0):
+    """
+    Return count texts over a pseudo-word vocabulary ("w0", "w1", ...) whose
+    frequencies follow Zipf's law, like natural language.
+    """
+    rng = np.random.default_rng(seed)
+    weights = 1 / np.arange(1, vocab_size + 1) ** 1.07
+    weights /= weights.sum()
+    ranks = rng.choice(vocab_size, size=(count, words_per_text), p=weights)
+    return [" ".join(f"w{rank}" for rank in row) for row in ranks]
+
+
+def make_zipf_queries(count, words_per_query=4, vocab_size=50_000, skip_top=50, seed=1):
+    """Queries drawn from the same distribution, minus the top ranks a stopword list would drop."""
+    rng = np.random.default_rng(seed)
+    weights = 1 / np.arange(1, vocab_size + 1) ** 1.07
+    weights[:skip_top] = 0
+    weights /= weights.sum()
+    ranks = rng.choice(vocab_size, size=(count, words_per_query), p=weights)
+    return [" ".join(f"w{rank}" for rank in row) for row in ranks]
+
+
+def _escape(text):
+    return text.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+
+
+def make_pdf(pages, lines_per_page=40, seed=0):
+    """
+    Build a text-only PDF in memory without any third-party writer.
+    Returns the PDF as bytes.
+    """
+    sentences = make_sentences(pages * lines_per_page, seed=seed)
+    objects = [
+        b"<< /Type /Catalog /Pages 2 0 R >>",
+        None,  # page tree, filled in once the page object ids are known
+        b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>",
+    ]
+    page_ids = []
+    for page in range(pages):
+        lines = sentences[page * lines_per_page:(page + 1) * lines_per_page]
+        stream = ["BT /F1 9 Tf 11 TL 36 800 Td"]
+        stream += [f"({_escape(line[:110])}) Tj T*" for line in lines]
+        stream.append("ET")
+        content = "\n".join(stream).encode("latin-1")
+        objects.append(b"<< /Length %d >>\nstream\n%s\nendstream" % (len(content), content))
+        content_id = len(objects)
+        objects.append(
+            b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 842] "
+            b"/Resources << /Font << /F1 3 0 R >> >> /Contents %d 0 R >>" % content_id
+        )
+        page_ids.append(len(objects))
+
+    kids = " ".join(f"{page_id} 0 R" for page_id in page_ids).encode()
+    objects[1] = b"<< /Type /Pages /Kids [%s] /Count %d >>" % (kids, len(page_ids))
+
+    out = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for number, body in enumerate(objects, 1):
+        offsets.append(len(out))
+        out += b"%d 0 obj\n%s\nendobj\n" % (number, body)
+
+    xref = len(out)
+    out += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1)
+    for offset in offsets:
+        out += b"%010d 00000 n \n" % offset
+    out += b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, xref)
+    return bytes(out)
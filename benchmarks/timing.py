@@ -0,0 +1,16 @@
+"""Helpers for summarizing benchmark timings."""
+
+import numpy as np
+
+
+def latency_summary(seconds):
+    """Return mean/p50/p99 of a list of durations, in milliseconds."""
+    samples = np.asarray(seconds, dtype=np.float64) * 1000
+    if not len(samples):
+        return {"count": 0, "mean_ms": 0.0, "p50_ms": 0.0, "p99_ms": 0.0}
+    return {
+        "count": int(len(samples)),
+        "mean_ms": float(samples.mean()),
+        "p50_ms": float(np.percentile(samples, 50)),
+        "p99_ms": float(np.percentile(samples, 99)),
+    }
@@ -0,0 +1,94 @@
+"""Portable index bundles: chunk texts, metadata, embeddings and manifest in one zip file."""
+
+import json
+import os
+import tempfile
+import time
+import zipfile
+
+import numpy as np
+from langchain_core.documents import Document
+
+FORMAT_VERSION = 1
+
+
+def write_bundle(path, model, manifest, batches):
+    """
+    Write a bundle, atomically replacing any file at path.
+    Members: bundle.json (format, model, dim, count, manifest), embeddings.f32
+    (float32 rows in chunk order, stored) and chunks.jsonl (ID, text and metadata
+    per line, deflated). Zip CRCs let readers detect corrupted members.
+    Args:
+        path: Bundle file to write
+        model: Name of the embedding model the vectors come from
+        manifest: VectorDB manifest (file hash -> name and chunk IDs)
+        batches: Iterable of (ids, embeddings, texts, metadatas)
+    Returns:
+        Number of chunks written
+    """
+    directory = os.path.dirname(os.path.abspath(path))
+    with tempfile.TemporaryDirectory(dir=directory) as staging:
+        count, dim = 0, None
+        embeddings_path = os.path.join(staging, "embeddings.f32")
+        chunks_path = os.path.join(staging, "chunks.jsonl")
+        with open(embeddings_path, "wb") as embeddings, open(chunks_path, "w", encoding="utf-8") as chunks:
+            for ids, vectors, texts, metadatas in batches:
+                vectors = np.asarray(vectors, dtype="<f4").reshape(len(ids), -1)
+                dim = vectors.shape[1] if len(ids) else dim
+                embeddings.write(vectors.tobytes())
+                for chunk_id, text, metadata in zip(ids, texts, metadatas):
+                    chunks.write(json.dumps({"id": chunk_id, "page_content": text, "metadata": metadata or {}},
+                                            ensure_ascii=False) + "\n")
+                count += len(ids)
+
+        header = {"format": FORMAT_VERSION, "model": model, "dim": dim, "count": count,
+                  "created": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()), "manifest": manifest}
+        tmp_path = os.path.join(staging, "bundle.zip")
+        with zipfile.ZipFile(tmp_path, "w", allowZip64=True) as bundle:
+            bundle.writestr("bundle.json", json.dumps(header))
+            bundle.write(embeddings_path, "embeddings.f32", compress_type=zipfile.ZIP_STORED)
+            bundle.write(chunks_path, "chunks.jsonl", compress_type=zipfile.ZIP_DEFLATED)
+        os.replace(tmp_path, path)
+    return count
+
+
+def read_header(path):
+    """Return the bundle.json of a bundle, raising ValueError if it is not a readable bundle."""
+    try:
+        with zipfile.ZipFile(path) as bundle:
+            header = json.loads(bundle.read("bundle.json"))
+    except (OSError, KeyError, ValueError, zipfile.BadZipFile) as e:
+        raise ValueError(f"Not a readable index bundle: {e}") from e
+    if header.get("format") != FORMAT_VERSION:
+        raise ValueError(f"Unsupported index bundle format {header.get('format')!r}")
+    return header
+
+
+def read_chunks(path, batch_size=5000):
+    """
+    Yield (ids, embeddings, documents) batches from a bundle. Corrupted or truncated
+    data raises ValueError, at the latest after the last batch.
+    """
+    header = read_header(path)
+    count, dim = header["count"], header["dim"]
+    try:
+        with zipfile.ZipFile(path) as bundle, bundle.open("embeddings.f32") as embeddings, \
+                bundle.open("chunks.jsonl") as chunks:
+            for start in range(0, count, batch_size):
+                size = min(batch_size, count - start)
+                data = embeddings.read(size * dim * 4)
+                lines = [chunks.readline() for _ in range(size)]
+                if len(data) != size * dim * 4 or not all(lines):
+                    raise ValueError("Index bundle is truncated")
+                records = [json.loads(line) for line in lines]
+                yield (
+                    [record["id"] for record in records],
+                    np.frombuffer(data, dtype="<f4").reshape(size, dim),
+                    [Document(page_content=record["page_content"], metadata=record["metadata"])
+                     for record in records],
+                )
+            # Reading to the end makes zipfile verify the CRC of both members
+            if embeddings.read() or chunks.read():
+                raise ValueError("Index bundle holds more chunks than its header declares")
+    except (KeyError, zipfile.BadZipFile) as e:
+        raise ValueError(f"Corrupted index bundle: {e}") from e
@@ -0,0 +1,124 @@
+"""Token-budgeted context assembly between the retriever and RAG.llm."""
+
+import hashlib
+
+import numpy as np
+from util.metrics import metrics
+
+
+def estimate_tokens(text):
+    """Rough token count (~4 characters per token for English text)."""
+    return max(1, len(text) // 4)
+
+
+class ContextBuilder:
+    """
+    Reranks retrieved passages with maximal marginal relevance over their embeddings,
+    drops near-duplicates and packs the best passages into a token budget.
+    """
+
+    def __init__(self, embedding, vector_db=None, workspaces=None, token_budget=1500, lambda_mult=0.7,
+                 duplicate_threshold=0.95):
+        """
+        Args:
+            embedding: Embeddings for the query and for passages that are not stored
+            vector_db: VectorDB holding the stored embeddings of untagged passages
+            workspaces: WorkspaceStore holding those of passages tagged with a "workspace"
+            token_budget: Most estimated tokens of the selected passages
+            lambda_mult: Weight of relevance against redundancy in the reranking
+            duplicate_threshold: Cosine similarity above which a passage counts as a duplicate
+        """
+        self.embedding = embedding
+        self.vector_db = vector_db
+        self.workspaces = workspaces
+        self.token_budget = token_budget
+        self.lambda_mult = lambda_mult
+        self.duplicate_threshold = duplicate_threshold
+
+    def _doc_vectors(self, docs):
+        """
+        Embeddings of the docs, read from the workspace or collection they were retrieved
+        from when stored, embedded otherwise.
+        """
+        ids = [(doc.metadata.get("workspace"),
+                doc.metadata.get("id") or hashlib.md5(doc.page_content.encode()).hexdigest()) for doc in docs]
+        ids_by_workspace = {}
+        for workspace, doc_id in ids:
+            ids_by_workspace.setdefault(workspace, []).append(doc_id)
+
+        untagged = ids_by_workspace.pop(None, [])
+        stored = {}
+        if untagged and self.vector_db is not None:
+            stored.update(((None, doc_id), vector)
+                          for doc_id, vector in self.vector_db.get_embeddings(untagged).items())
+        if ids_by_workspace and self.workspaces is not None:
+            stored.update(self.workspaces.get_embeddings(ids_by_workspace))
+        missing = [i for i, doc_id in enumerate(ids) if doc_id not in stored]
+        if missing:
+            vectors = self.embedding.embed_documents([docs[i].page_content for i in missing])
+            stored.update({ids[i]: vector for i, vector in zip(missing, vectors)})
+
+        matrix = np.asarray([stored[doc_id] for doc_id in ids], dtype=np.float32)
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        return matrix / np.where(norms == 0, 1, norms)
+
+    def build(self, query, docs, query_vector=None):
+        """
+        Select and join passages for the prompt.
+        Returns:
+            (selected docs, context string, report dict with token counts)
+        """
+        total_tokens = sum(estimate_tokens(doc.page_content) for doc in docs)
+        if not docs:
+            return [], "", {"candidates": 0, "selected": 0, "duplicates": 0,
+                            "prompt_tokens": 0, "tokens_saved": 0}
+
+        doc_vectors = self._doc_vectors(docs)
+        query_vector = np.asarray(
+            self.embedding.embed_query(query) if query_vector is None else query_vector, dtype=np.float32
+        )
+        query_vector = query_vector / (np.linalg.norm(query_vector) or 1)
+        relevance = doc_vectors @ query_vector
+        similarity = doc_vectors @ doc_vectors.T
+
+        selected = []
+        used_tokens = 0
+        duplicates = 0
+        remaining = list(range(len(docs)))
+        while remaining and used_tokens < self.token_budget:
+            if selected:
+                redundancy = similarity[np.ix_(remaining, selected)].max(axis=1)
+            else:
+                redundancy = np.zeros(len(remaining), dtype=np.float32)
+
+            # Drop passages that repeat something already selected
+            duplicate = redundancy >= self.duplicate_threshold
+            if duplicate.any():
+                duplicates += int(duplicate.sum())
+                remaining = [index for index, is_duplicate in zip(remaining, duplicate) if not is_duplicate]
+                redundancy = redundancy[~duplicate]
+                if not remaining:
+                    break
+
+            scores = self.lambda_mult * relevance[remaining] - (1 - self.lambda_mult) * redundancy
+            best = remaining.pop(int(np.argmax(scores)))
+
+            # Skip passages that no longer fit; a shorter one may still
+            tokens = estimate_tokens(docs[best].page_content)
+            if used_tokens + tokens <= self.token_budget:
+                selected.append(best)
+                used_tokens += tokens
+
+        selected_docs = [docs[index] for index in selected]
+        context = "\n".join(doc.page_content for doc in selected_docs)
+        report = {
+            "candidates": len(docs),
+            "selected": len(selected_docs),
+            "duplicates": duplicates,
+            "prompt_tokens": used_tokens,
+            "tokens_saved": total_tokens - used_tokens,
+        }
+        metrics.inc("prompt_tokens", used_tokens)
+        metrics.inc("prompt_tokens_saved", report["tokens_saved"])
+        metrics.inc("context_duplicates_dropped", duplicates)
+        return selected_docs, context, report
@@ -0,0 +1,144 @@
+"""Compressed, memory-mapped store of chunk texts and metadata keyed by chunk ID."""
+
+import json
+import mmap
+import os
+import threading
+import zlib
+from collections import OrderedDict
+
+import numpy as np
+from langchain_core.documents import Document
+from util.append_only import append, commit, truncate_uncommitted
+from util.metrics import metrics
+
+_RECORD = np.dtype([("id", np.uint8, 16), ("offset", "<u8"), ("length", "<u4")])
+
+
+class DocStore:
+    """
+    Append-only store of chunks keyed by their MD5 chunk IDs, shared by everything
+    in the process that needs chunk text. Each chunk is zlib-compressed JSON in one
+    memory-mapped data file, so the heap holds only the ID -> row index and an LRU
+    of recently decompressed chunks.
+
+    Files in directory: meta.json (committed count and data size), index.bin
+    (16-byte ID, offset and length per chunk) and data.bin.
+    """
+
+    def __init__(self, directory, cache_size=4096, level=6):
+        self.directory = directory
+        self.cache_size = cache_size
+        self.level = level
+        self.meta_path = os.path.join(directory, "meta.json")
+        self.index_path = os.path.join(directory, "index.bin")
+        self.data_path = os.path.join(directory, "data.bin")
+
+        self._lock = threading.Lock()
+        self._cache = OrderedDict()  # id -> Document, least recently used first
+        self._mapped = None
+        self.hits = 0
+        self.misses = 0
+
+        meta = {"count": 0, "data_bytes": 0}
+        if os.path.exists(self.meta_path):
+            with open(self.meta_path, encoding="utf-8") as f:
+                meta = json.load(f)
+        self.count = meta["count"]
+        self.data_bytes = meta["data_bytes"]
+        truncate_uncommitted({self.index_path: self.count * _RECORD.itemsize, self.data_path: self.data_bytes})
+
+        records = np.fromfile(self.index_path, dtype=_RECORD, count=self.count) if self.count else \
+            np.empty(0, dtype=_RECORD)
+        id_bytes = records["id"].tobytes()
+        self.rows = {id_bytes[i * 16:(i + 1) * 16].hex(): i for i in range(self.count)}
+        self.offsets = records["offset"].copy()
+        self.lengths = records["length"].copy()
+
+    def __len__(self):
+        return self.count
+
+    def __contains__(self, doc_id):
+        return doc_id in self.rows
+
+    def add(self, ids, docs):
+        """Store chunks under their IDs (32-character MD5 hex digests); stored IDs are skipped."""
+        with self._lock:
+            new = {}
+            for doc_id, doc in zip(ids, docs):
+                if doc_id not in self.rows:
+                    new.setdefault(doc_id, doc)
+            if not new:
+                return 0
+
+            payloads = [
+                zlib.compress(json.dumps({"page_content": doc.page_content, "metadata": doc.metadata},
+                                         ensure_ascii=False).encode(), self.level)
+                for doc in new.values()
+            ]
+            lengths = np.array([len(payload) for payload in payloads], dtype=np.uint32)
+            starts = np.concatenate((np.zeros(1, dtype=np.uint64), np.cumsum(lengths[:-1], dtype=np.uint64)))
+            offsets = self.data_bytes + starts
+            records = np.empty(len(new), dtype=_RECORD)
+            records["id"] = np.frombuffer(b"".join(bytes.fromhex(doc_id) for doc_id in new),
+                                          dtype=np.uint8).reshape(-1, 16)
+            records["offset"] = offsets
+            records["length"] = lengths
+
+            os.makedirs(self.directory, exist_ok=True)
+            append(self.data_path, b"".join(payloads))
+            append(self.index_path, records.tobytes())
+            data_bytes = self.data_bytes + int(lengths.sum())
+            commit(self.meta_path, {"count": self.count + len(new), "data_bytes": data_bytes})
+
+            for row, doc_id in enumerate(new, self.count):
+                self.rows[doc_id] = row
+            self.offsets = np.concatenate((self.offsets, offsets))
+            self.lengths = np.concatenate((self.lengths, lengths))
+            self.count += len(new)
+            self.data_bytes = data_bytes
+            return len(new)
+
+    def _data(self):
+        """Memory map of the committed data, reopened after it grew."""
+        if self._mapped is None or len(self._mapped) < self.data_bytes:
+            with open(self.data_path, "rb") as f:
+                self._mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        return self._mapped
+
+    def _load(self, row):
+        offset, length = int(self.offsets[row]), int(self.lengths[row])
+        record = json.loads(zlib.decompress(self._data()[offset:offset + length]))
+        return Document(page_content=record["page_content"], metadata=record["metadata"])
+
+    def get(self, ids):
+        """
+        Return {id: Document} for the given IDs that are stored. Each call gets its own
+        Document objects, which share their text with the LRU.
+        """
+        found = {}
+        with self._lock:
+            for doc_id in dict.fromkeys(ids):
+                doc = self._cache.get(doc_id)
+                if doc is not None:
+                    self._cache.move_to_end(doc_id)
+                    self.hits += 1
+                elif doc_id in self.rows:
+                    doc = self._load(self.rows[doc_id])
+                    self._cache[doc_id] = doc
+                    self.misses += 1
+                    if len(self._cache) > self.cache_size:
+                        self._cache.popitem(last=False)
+                if doc is not None:
+                    found[doc_id] = Document(page_content=doc.page_content, metadata=dict(doc.metadata))
+        metrics.inc("docstore_reads", len(found))
+        return found
+
+    def stats(self):
+        return {
+            "chunks": self.count,
+            "data_bytes": self.data_bytes,
+            "cached": len(self._cache),
+            "hits": self.hits,
+            "misses": self.misses,
+        }
@@ -0,0 +1,255 @@
+"""Content-addressed on-disk cache of chunk embeddings."""
+
+import hashlib
+import json
+import os
+import re
+import threading
+from collections import OrderedDict
+
+import numpy as np
+from filelock import FileLock
+from langchain_core.embeddings import Embeddings
+from util.metrics import metrics
+from util.printer import Printer
+
+DEFAULT_CACHE_DIR = "./embedding_cache"
+
+_caches = {}
+_caches_lock = threading.Lock()
+
+
+def content_hash(text):
+    """MD5 of the chunk text, the same id VectorDB stores in Chroma."""
+    return hashlib.md5(text.encode()).hexdigest()
+
+
+_SLOT = np.dtype([("key", np.uint8, 16), ("tick", "<u8")])
+
+
+class EmbeddingCache:
+    """
+    Stores embeddings for one model in a memory-mapped float32 matrix with a
+    hash -> row index kept in LRU order. When the matrix is full, the least
+    recently used row is overwritten.
+
+    Files in the model's directory: meta.json (dim and size, written once),
+    vectors.f32 and slots.bin, a memory-mapped record per row with the MD5 key it
+    holds and a use counter (0 for a free row). Inserts and hits only touch the
+    records of their rows, so the cost of a write does not grow with the cache.
+
+    Several processes (e.g. uvicorn workers) can share the directory: every access
+    holds cache.lock, and state.bin counts the inserts, so a process reloads the
+    row index from slots.bin when another one has written rows since its last access.
+    """
+
+    def __init__(self, model_name, cache_dir=DEFAULT_CACHE_DIR, max_rows=100_000):
+        self.printer = Printer()
+        self.model_name = model_name
+        self.max_rows = max_rows
+        self.directory = os.path.join(cache_dir, re.sub(r"[^A-Za-z0-9_.-]+", "_", model_name))
+        self.vectors_path = os.path.join(self.directory, "vectors.f32")
+        self.slots_path = os.path.join(self.directory, "slots.bin")
+        self.meta_path = os.path.join(self.directory, "meta.json")
+        self.state_path = os.path.join(self.directory, "state.bin")
+
+        self.dim = None
+        self.vectors = None
+        self.slots = None
+        self.state = None  # [generation, tick] shared by the processes using the directory
+        self.generation = 0
+        self.tick = 0
+        self.rows = OrderedDict()  # hash -> row, least recently used first
+        self.free_rows = []
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+
+        os.makedirs(self.directory, exist_ok=True)
+        self._file_lock = FileLock(os.path.join(self.directory, "cache.lock"))
+        with self._file_lock:
+            self._load()
+        if self.rows:
+            self.printer.print(f"Loaded embedding cache with {len(self.rows)} entries", "cyan")
+
+    def _load(self):
+        """Open the files if another process (or an earlier run) created them. Needs the file lock."""
+        if not os.path.exists(self.meta_path):
+            return
+        try:
+            with open(self.meta_path) as f:
+                meta = json.load(f)
+            if meta["max_rows"] != self.max_rows:
+                raise ValueError("cache size changed")
+            self.dim = meta["dim"]
+            self._open()
+            self._read_rows()
+        except (OSError, ValueError, KeyError) as e:
+            self.printer.print(f"⚠ Ignoring unreadable embedding cache: {e}", "yellow")
+            self.dim = None
+            self.vectors = self.slots = self.state = None
+            self.rows = OrderedDict()
+            for path in (self.meta_path, self.slots_path, self.vectors_path, self.state_path):
+                if os.path.exists(path):
+                    os.remove(path)
+
+    def _read_rows(self):
+        """Rebuild the LRU index and free rows from slots.bin."""
+        used = np.flatnonzero(self.slots["tick"])
+        used = used[np.argsort(self.slots["tick"][used], kind="stable")]
+        keys = self.slots["key"][used].tobytes()
+        self.rows = OrderedDict((keys[i * 16:(i + 1) * 16].hex(), int(row)) for i, row in enumerate(used))
+        free = np.ones(self.max_rows, dtype=bool)
+        free[used] = False
+        self.free_rows = np.flatnonzero(free)[::-1].tolist()
+        self.generation = int(self.state[0])
+        if self.max_rows:
+            self.state[1] = max(int(self.state[1]), int(self.slots["tick"].max()))
+
+    def _sync(self):
+        """Catch up with rows written by other processes. Needs the file lock."""
+        if self.vectors is None:
+            self._load()
+        elif int(self.state[0]) != self.generation:
+            self._read_rows()
+        if self.state is not None:
+            self.tick = int(self.state[1])
+
+    def _open(self):
+        """Memory-map the vectors, slots and state, creating them (and meta.json) if needed."""
+        for name, path, dtype, shape in (("vectors", self.vectors_path, np.float32, (self.max_rows, self.dim)),
+                                         ("slots", self.slots_path, _SLOT, (self.max_rows,)),
+                                         ("state", self.state_path, np.uint64, (2,))):
+            mode = "r+" if os.path.exists(path) else "w+"
+            setattr(self, name, np.memmap(path, dtype=dtype, mode=mode, shape=shape))
+        if not os.path.exists(self.meta_path):
+            tmp_path = self.meta_path + ".tmp"
+            with open(tmp_path, "w") as f:
+                json.dump({"model_name": self.model_name, "dim": self.dim, "max_rows": self.max_rows}, f)
+            os.replace(tmp_path, self.meta_path)
+
+    def _write_slots(self, items):
+        """Record (key, row) pairs as the most recently used, in order."""
+        for key, row in items:
+            self.tick += 1
+            self.slots[row] = (np.frombuffer(bytes.fromhex(key), dtype=np.uint8), self.tick)
+        self.state[1] = self.tick
+
+    def get_many(self, keys):
+        """Return a list with the cached vector (or None) for every key."""
+        results = []
+        hits = []
+        with self._lock, self._file_lock:
+            self._sync()
+            for key in keys:
+                row = self.rows.get(key)
+                if row is None:
+                    self.misses += 1
+                    results.append(None)
+                else:
+                    self.rows.move_to_end(key)
+                    self.hits += 1
+                    hits.append((key, row))
+                    results.append(self.vectors[row].tolist())
+            # Recency reaches disk with the next flush of the memory map
+            if hits:
+                self._write_slots(hits)
+        return results
+
+    def put_many(self, keys, vectors):
+        """Insert vectors, evicting the least recently used rows when full."""
+        if not keys:
+            return
+        with self._lock, self._file_lock:
+            self._sync()
+            if self.vectors is None:
+                self.dim = len(vectors[0])
+                self._open()
+                self.free_rows = list(range(self.max_rows - 1, -1, -1))
+
+            written = []
+            for key, vector in zip(keys, vectors):
+                row = self.rows.get(key)
+                if row is None:
+                    if self.free_rows:
+                        row = self.free_rows.pop()
+                    else:
+                        _, row = self.rows.popitem(last=False)
+                        self.evictions += 1
+                    self.rows[key] = row
+                else:
+                    self.rows.move_to_end(key)
+                self.vectors[row] = vector
+                written.append((key, row))
+            self._write_slots(written)
+            self.generation += 1
+            self.state[0] = self.generation
+            self._flush()
+
+    def _flush(self):
+        """Persist the vectors before the slots that point at them."""
+        self.vectors.flush()
+        self.slots.flush()
+        self.state.flush()
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "model_name": self.model_name,
+                "entries": len(self.rows),
+                "max_rows": self.max_rows,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+            }
+
+
+class CachedEmbeddings(Embeddings):
+    """Embeddings wrapper that only sends cache misses to the underlying model."""
+
+    def __init__(self, embedding, cache):
+        self.embedding = embedding
+        self.cache = cache
+        self.model_name = cache.model_name
+
+    def embed_documents(self, texts):
+        keys = [content_hash(text) for text in texts]
+        vectors = self.cache.get_many(keys)
+
+        # Embed each missing text once, even if it appears several times
+        missing = {}
+        for key, text, vector in zip(keys, texts, vectors):
+            if vector is None and key not in missing:
+                missing[key] = text
+
+        metrics.inc("embedding_cache_hits", len(keys) - len(missing))
+        metrics.inc("embedding_cache_misses", len(missing))
+        if missing:
+            with metrics.span("embed"):
+                new_vectors = self.embedding.embed_documents(list(missing.values()))
+            self.cache.put_many(list(missing.keys()), new_vectors)
+            computed = dict(zip(missing.keys(), new_vectors))
+            vectors = [computed[key] if vector is None else vector for key, vector in zip(keys, vectors)]
+
+        return vectors
+
+    def embed_query(self, text):
+        return self.embedding.embed_query(text)
+
+    def embed_queries(self, texts):
+        """Embed several queries in one pass, bypassing the chunk cache."""
+        return self.embedding.embed_documents(texts)
+
+
+def get_embedding_cache(model_name, cache_dir=DEFAULT_CACHE_DIR):
+    """Return the process-wide EmbeddingCache for a model and cache directory."""
+    key = (model_name, os.path.abspath(cache_dir))
+    with _caches_lock:
+        cache = _caches.get(key)
+        if cache is None:
+            cache = EmbeddingCache(model_name, cache_dir=cache_dir)
+            _caches[key] = cache
+        return cache
@@ -0,0 +1,194 @@
+"""Process-wide embedding service shared by every VectorDB instance."""
+
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+from langchain_core.embeddings import Embeddings
+from util.metrics import metrics
+from util.printer import Printer
+
+DEFAULT_EMBEDDING_MODEL = "BAAI/bge-small-en-v1.5"
+BACKENDS = ("huggingface", "onnx", "onnx-int8")
+
+_services = {}
+_services_lock = threading.Lock()
+
+
+class EmbeddingService(Embeddings):
+    """
+    Wraps a single embedding model and coalesces concurrent embedding calls
+    (e.g. from different Streamlit sessions) into one forward pass.
+    """
+
+    def __init__(self, model_name=DEFAULT_EMBEDDING_MODEL, max_batch_size=64, max_wait_ms=5,
+                 backend="huggingface", threads=None, onnx_dir=None, min_agreement=None):
+        """
+        Args:
+            model_name: Hugging Face model ID
+            max_batch_size: Texts collected from concurrent calls before a forward pass
+            max_wait_ms: How long to wait for more calls to join a batch
+            backend: "huggingface" (PyTorch fp32), "onnx" or "onnx-int8" (OnnxEmbeddings
+                on a model exported to onnx_dir)
+            threads: CPU threads of the backend, None for its default
+            onnx_dir: Directory of the exported ONNX model
+            min_agreement: Lowest cosine agreement with model_name recorded at export for
+                the ONNX model to load, None for OnnxEmbeddings' default
+        """
+        if backend not in BACKENDS:
+            raise ValueError(f"Unknown embedding backend {backend!r}, expected one of {', '.join(BACKENDS)}")
+        self.printer = Printer()
+        self.model_name = model_name
+        self.backend = backend
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+
+        start_time = time.time()
+        if backend == "huggingface":
+            # Imported here because it pulls in torch, which dominates import time
+            from langchain_huggingface import HuggingFaceEmbeddings
+            if threads:
+                import torch
+                torch.set_num_threads(threads)
+            self.model = HuggingFaceEmbeddings(model_name=model_name)
+        else:
+            from rag.onnx_embeddings import DEFAULT_ONNX_DIR, MIN_AGREEMENT, OnnxEmbeddings
+            self.model = OnnxEmbeddings(onnx_dir or DEFAULT_ONNX_DIR, int8=backend == "onnx-int8",
+                                        intra_op_threads=threads, min_agreement=min_agreement or MIN_AGREEMENT)
+            if self.model.model_name != model_name:
+                raise ValueError(f"{self.model.model_dir} holds {self.model.model_name}, not {model_name}")
+        self.load_seconds = time.time() - start_time
+        self.model_bytes = self._estimate_model_bytes()
+
+        self.printer.print(
+            f"Loaded embedding model {model_name} ({backend}) in {self.load_seconds:.2f} seconds "
+            f"(~{self.model_bytes / 1024 ** 2:.1f} MB)",
+            "bold_cyan",
+        )
+
+        self._queue = queue.Queue()
+        self._worker = None
+        self._worker_lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self.acquired = 0
+        self.requests = 0
+        self.batches = 0
+        self.texts = 0
+
+    def _estimate_model_bytes(self):
+        """Approximate the resident size of the model weights."""
+        if hasattr(self.model, "model_bytes"):
+            return self.model.model_bytes
+        try:
+            return sum(p.numel() * p.element_size() for p in self.model.client.parameters())
+        except Exception:
+            return 0
+
+    def _ensure_worker(self):
+        if self._worker is not None and self._worker.is_alive():
+            return
+        with self._worker_lock:
+            if self._worker is None or not self._worker.is_alive():
+                self._worker = threading.Thread(target=self._run, name="embedding-batcher", daemon=True)
+                self._worker.start()
+
+    def _run(self):
+        """Collect pending requests for a short window and embed them together."""
+        while True:
+            pending = [self._queue.get()]
+            size = len(pending[0][0])
+            deadline = time.time() + self.max_wait
+
+            while size < self.max_batch_size:
+                remaining = deadline - time.time()
+                if remaining <= 0:
+                    break
+                try:
+                    item = self._queue.get(timeout=remaining)
+                except queue.Empty:
+                    break
+                pending.append(item)
+                size += len(item[0])
+
+            texts = [text for item_texts, _ in pending for text in item_texts]
+            try:
+                with metrics.timer("embed_batch"):
+                    vectors = self.model.embed_documents(texts)
+            except Exception as e:
+                for _, future in pending:
+                    future.set_exception(e)
+                continue
+
+            with self._stats_lock:
+                self.batches += 1
+                self.requests += len(pending)
+                self.texts += len(texts)
+
+            offset = 0
+            for item_texts, future in pending:
+                future.set_result(vectors[offset:offset + len(item_texts)])
+                offset += len(item_texts)
+
+    def embed_documents(self, texts):
+        if not texts:
+            return []
+        self._ensure_worker()
+        future = Future()
+        self._queue.put((list(texts), future))
+        return future.result()
+
+    def embed_query(self, text):
+        return self.embed_documents([text])[0]
+
+    def stats(self):
+        """Return usage counters and the estimated savings from sharing the model."""
+        with self._stats_lock:
+            reused = max(self.acquired - 1, 0)
+            return {
+                "model_name": self.model_name,
+                "backend": self.backend,
+                "sessions": self.acquired,
+                "load_seconds": self.load_seconds,
+                "model_bytes": self.model_bytes,
+                "memory_saved_bytes": self.model_bytes * reused,
+                "load_seconds_saved": self.load_seconds * reused,
+                "requests": self.requests,
+                "batches": self.batches,
+                "texts": self.texts,
+                "avg_requests_per_batch": self.requests / self.batches if self.batches else 0.0,
+            }
+
+
+def get_embedding_service(model_name=DEFAULT_EMBEDDING_MODEL, backend=None):
+    """
+    Return the process-wide EmbeddingService for a model, loading it on first use.
+    Every call counts as one consumer sharing the model instead of loading its own copy.
+    The backend defaults to ASKDOCS_EMBEDDING_BACKEND, with ASKDOCS_EMBEDDING_THREADS,
+    ASKDOCS_ONNX_DIR and ASKDOCS_ONNX_MIN_AGREEMENT as its settings.
+    """
+    backend = backend or os.getenv("ASKDOCS_EMBEDDING_BACKEND", "huggingface")
+    with _services_lock:
+        service = _services.get((model_name, backend))
+        if service is None:
+            threads = os.getenv("ASKDOCS_EMBEDDING_THREADS")
+            min_agreement = os.getenv("ASKDOCS_ONNX_MIN_AGREEMENT")
+            service = EmbeddingService(model_name=model_name, backend=backend,
+                                       threads=int(threads) if threads else None,
+                                       onnx_dir=os.getenv("ASKDOCS_ONNX_DIR"),
+                                       min_agreement=float(min_agreement) if min_agreement else None)
+            _services[(model_name, backend)] = service
+
+    with service._stats_lock:
+        service.acquired += 1
+        reused = service.acquired - 1
+
+    if reused:
+        service.printer.print(
+            f"Reusing shared embedding model ({reused} loads avoided, "
+            f"~{service.model_bytes * reused / 1024 ** 2:.1f} MB and "
+            f"{service.load_seconds * reused:.2f} seconds saved)",
+            "cyan",
+        )
+    return service
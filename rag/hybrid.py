@@ -0,0 +1,148 @@
+"""Hybrid lexical + dense retrieval fused with reciprocal rank fusion."""
+
+import hashlib
+from typing import Any, Callable, List, Optional
+
+from langchain_core.documents import Document
+from langchain_core.retrievers import BaseRetriever
+from util.metrics import metrics
+
+
+def reciprocal_rank_fusion(rankings, rrf_k=60, weights=None):
+    """
+    Fuse several ranked lists of IDs.
+    Each ID scores sum(weight / (rrf_k + rank)) over the lists it appears in.
+    Returns:
+        List of (id, score) sorted by descending fused score
+    """
+    weights = weights or [1.0] * len(rankings)
+    scores = {}
+    for ranking, weight in zip(rankings, weights):
+        for rank, doc_id in enumerate(ranking, 1):
+            scores[doc_id] = scores.get(doc_id, 0.0) + weight / (rrf_k + rank)
+    return sorted(scores.items(), key=lambda item: item[1], reverse=True)
+
+
+class HybridRetriever(BaseRetriever):
+    """
+    Retrieves candidates from BM25 and Chroma, then merges them with RRF.
+    Searches can be restricted up front: filter is a Chroma where clause, dense_search
+    replaces the Chroma search with dense_search(query_vector, k) -> [(id, score)]
+    (dense_search_batch(query_vectors, k) does the same for search_batch), and
+    allowed_ids limits the lexical search. Texts missing from the dense results are read
+    from docstore when given, and from Chroma otherwise.
+    """
+
+    vector_store: Any
+    lexical_index: Any
+    k: int = 20
+    fetch_k: int = 50
+    rrf_k: int = 60
+    lexical_weight: float = 1.0
+    dense_weight: float = 1.0
+    filter: Optional[dict] = None
+    dense_search: Optional[Callable] = None
+    dense_search_batch: Optional[Callable] = None
+    allowed_ids: Optional[list] = None
+    docstore: Any = None
+
+    def _get_relevant_documents(self, query: str, *, run_manager=None) -> List[Document]:
+        return self.search(query)
+
+    def _dense(self, query, query_embedding):
+        """Return the dense ranking as a list of IDs and the documents it already loaded."""
+        if self.dense_search is not None:
+            if query_embedding is None:
+                query_embedding = self.vector_store.embeddings.embed_query(query)
+            return [doc_id for doc_id, _ in self.dense_search(query_embedding, self.fetch_k)], {}
+
+        if query_embedding is None:
+            dense_docs = self.vector_store.similarity_search(query, k=self.fetch_k, filter=self.filter)
+        else:
+            dense_docs = self.vector_store.similarity_search_by_vector(
+                query_embedding, k=self.fetch_k, filter=self.filter
+            )
+        docs_by_id = {
+            doc.metadata.get("id") or hashlib.md5(doc.page_content.encode()).hexdigest(): doc
+            for doc in dense_docs
+        }
+        return list(docs_by_id), docs_by_id
+
+    def _dense_batch(self, query_embeddings):
+        """Dense rankings of many queries from one index call, and the documents already loaded."""
+        if self.dense_search_batch is not None:
+            return [[doc_id for doc_id, _ in hits]
+                    for hits in self.dense_search_batch(query_embeddings, self.fetch_k)], {}
+        if self.dense_search is not None:
+            return [[doc_id for doc_id, _ in self.dense_search(vector, self.fetch_k)]
+                    for vector in query_embeddings], {}
+
+        found = self.vector_store._collection.query(
+            query_embeddings=[list(map(float, vector)) for vector in query_embeddings],
+            n_results=self.fetch_k, where=self.filter, include=["documents", "metadatas"],
+        )
+        docs_by_id = {}
+        for ids, texts, metadatas in zip(found["ids"], found["documents"], found["metadatas"]):
+            for doc_id, text, metadata in zip(ids, texts, metadatas):
+                docs_by_id[doc_id] = Document(page_content=text, metadata=metadata or {})
+        return found["ids"], docs_by_id
+
+    def _lexical(self, query):
+        return [doc_id for doc_id, _ in self.lexical_index.search(query, k=self.fetch_k, allowed=self.allowed_ids)]
+
+    def _fuse(self, dense_ids, lexical_ids):
+        return reciprocal_rank_fusion(
+            [lexical_ids, dense_ids], rrf_k=self.rrf_k,
+            weights=[self.lexical_weight, self.dense_weight],
+        )[:self.k]
+
+    def _fetch(self, ids, docs_by_id):
+        """Load the text of hits the dense search did not return (lexical-only) in one call."""
+        missing = [doc_id for doc_id in dict.fromkeys(ids) if doc_id not in docs_by_id]
+        if missing and self.docstore is not None:
+            docs_by_id.update(self.docstore.get(missing))
+            missing = [doc_id for doc_id in missing if doc_id not in docs_by_id]
+        if missing:
+            with metrics.span("retrieve_fetch"):
+                stored = self.vector_store.get(ids=missing, include=["documents", "metadatas"])
+            for doc_id, text, metadata in zip(stored["ids"], stored["documents"], stored["metadatas"]):
+                docs_by_id[doc_id] = Document(page_content=text, metadata=metadata or {})
+
+    @staticmethod
+    def _results(fused, docs_by_id):
+        # Copies, since the same chunk can be ranked by several queries of a batch; chunks
+        # stored without an "id" in their metadata get the ID they are stored under
+        return [
+            Document(page_content=docs_by_id[doc_id].page_content,
+                     metadata={**docs_by_id[doc_id].metadata, "id": doc_id, "fusion_score": score})
+            for doc_id, score in fused if doc_id in docs_by_id
+        ]
+
+    def search(self, query, query_embedding=None):
+        """Run the hybrid search, reusing a precomputed query embedding when given."""
+        with metrics.span("retrieve_dense"):
+            dense_ids, docs_by_id = self._dense(query, query_embedding)
+        with metrics.span("retrieve_lexical"):
+            lexical_ids = self._lexical(query)
+
+        fused = self._fuse(dense_ids, lexical_ids)
+        self._fetch([doc_id for doc_id, _ in fused], docs_by_id)
+        return self._results(fused, docs_by_id)
+
+    def search_batch(self, queries, query_embeddings):
+        """
+        Hybrid search for many queries: the dense top-k of the whole batch comes from
+        one vectorized index call and the chunk texts from one fetch.
+        Returns:
+            One list of documents per query
+        """
+        if not len(queries):
+            return []
+        with metrics.span("retrieve_dense"):
+            dense_rankings, docs_by_id = self._dense_batch(query_embeddings)
+        with metrics.span("retrieve_lexical"):
+            lexical_rankings = [self._lexical(query) for query in queries]
+
+        fused = [self._fuse(dense_ids, lexical_ids) for dense_ids, lexical_ids in zip(dense_rankings, lexical_rankings)]
+        self._fetch([doc_id for ranking in fused for doc_id, _ in ranking], docs_by_id)
+        return [self._results(ranking, docs_by_id) for ranking in fused]
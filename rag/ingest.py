@@ -0,0 +1,141 @@
+"""Background ingestion of PDFs into a VectorDB."""
+
+import io
+import itertools
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from util.metrics import metrics
+from util.printer import Printer
+from util.util import iter_pdf_pages, iter_chunks
+
+
+class IngestJob:
+    """Progress of a single file moving through extract -> chunk -> embed -> upsert."""
+
+    _ids = itertools.count(1)
+
+    def __init__(self, name, file_hash):
+        self.job_id = next(self._ids)
+        self.name = name
+        self.file_hash = file_hash
+        self.status = "queued"  # queued, running, done, indexed or failed
+        self.total_pages = 0
+        self.pages = 0
+        self.chunks = 0
+        self.added = 0
+        self.error = None
+        self.started_at = None
+        self.finished_at = None
+        self.future = None
+
+    @property
+    def finished(self):
+        return self.status in ("done", "indexed", "failed")
+
+    @property
+    def succeeded(self):
+        return self.status in ("done", "indexed")
+
+    def progress(self):
+        """Return a snapshot of the job's progress and throughput."""
+        elapsed = 0.0
+        if self.started_at is not None:
+            elapsed = (self.finished_at or time.time()) - self.started_at
+        return {
+            "job_id": self.job_id,
+            "name": self.name,
+            "file_hash": self.file_hash,
+            "status": self.status,
+            "pages": self.pages,
+            "total_pages": self.total_pages,
+            "fraction": self.pages / self.total_pages if self.total_pages else float(self.finished),
+            "chunks": self.chunks,
+            "added": self.added,
+            "elapsed": elapsed,
+            "pages_per_second": self.pages / elapsed if elapsed else 0.0,
+            "chunks_per_second": self.chunks / elapsed if elapsed else 0.0,
+            "error": self.error,
+        }
+
+
+class IngestionWorker:
+    """
+    Runs ingestion jobs on a small thread pool so the caller never blocks.
+    Chunks are embedded and written to Chroma in fixed-size batches as pages stream in,
+    and each file succeeds or fails on its own.
+    """
+
+    def __init__(self, vector_db, max_workers=2, batch_size=64):
+        self.printer = Printer()
+        self.vector_db = vector_db
+        self.batch_size = batch_size
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="ingest")
+        self.jobs = {}
+        self._lock = threading.Lock()
+
+    def submit(self, pdf_bytes, name, file_hash):
+        """Queue a PDF for ingestion and return its IngestJob immediately."""
+        job = IngestJob(name, file_hash)
+        with self._lock:
+            self.jobs[job.job_id] = job
+        job.future = self.executor.submit(self._run, job, pdf_bytes)
+        return job
+
+    def _count_pages(self, job, pages):
+        for page_number, text in pages:
+            job.pages = page_number
+            yield page_number, text
+
+    def _ingest(self, job, pdf_bytes):
+        """Stream pages into batched inserts and return the IDs of every chunk."""
+        pages = self._count_pages(job, iter_pdf_pages(
+            io.BytesIO(pdf_bytes), on_page_count=lambda count: setattr(job, "total_pages", count)
+        ))
+
+        ids = []
+        batch = []
+        for chunk in iter_chunks(pages, job.file_hash, source=job.name):
+            batch.append(chunk)
+            job.chunks += 1
+            if len(batch) == self.batch_size:
+                job.added += self.vector_db.add_documents(batch, record_manifest=False)
+                ids.extend(chunk.metadata["id"] for chunk in batch)
+                batch = []
+        if batch:
+            job.added += self.vector_db.add_documents(batch, record_manifest=False)
+            ids.extend(chunk.metadata["id"] for chunk in batch)
+        return ids
+
+    def _run(self, job, pdf_bytes):
+        job.status = "running"
+        job.started_at = time.time()
+        try:
+            if self.vector_db.has_file(job.file_hash):
+                job.status = "indexed"
+                return job
+
+            with metrics.span("ingest"):
+                ids = self._ingest(job, pdf_bytes)
+
+            # Only mark the file as ingested once every batch is stored
+            self.vector_db.record_file(job.file_hash, job.name, ids)
+            job.status = "done"
+            progress = job.progress()
+            self.printer.print(
+                f"✅ Ingested {job.name}: {job.pages} pages, {job.chunks} chunks "
+                f"({progress['pages_per_second']:.1f} pages/s, {progress['chunks_per_second']:.1f} chunks/s)",
+                "bold_green",
+            )
+        except Exception as e:
+            job.status = "failed"
+            job.error = str(e)
+            metrics.inc("ingest_failures")
+            self.printer.print(f"❌ Failed to ingest {job.name}: {e}", "red")
+        finally:
+            job.finished_at = time.time()
+        return job
+
+    def shutdown(self, wait=True):
+        self.executor.shutdown(wait=wait)
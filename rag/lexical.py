@@ -0,0 +1,258 @@
+"""Incremental BM25 inverted index kept alongside the Chroma collection."""
+
+import json
+import math
+import os
+import pickle
+import re
+import threading
+from array import array
+from collections import Counter
+
+import numpy as np
+from util.printer import Printer
+
+# Words plus identifiers such as part numbers and error codes (ERR-1042, v2.1.3, AB_12)
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+(?:[-_.:/][a-z0-9]+)*")
+
+
+# Frequent English words that would otherwise dominate postings without adding signal
+STOPWORDS = frozenset("""
+a an and are as at be but by can do does for from has have how i if in is it its
+me my no not of on or our so that the their then there these this to was we were
+what when where which who why will with you your
+""".split())
+
+
+def tokenize(text):
+    """Lowercase text and split it into word and identifier tokens, dropping stopwords."""
+    tokens = [token for token in TOKEN_PATTERN.findall(text.lower()) if token not in STOPWORDS]
+    # Also index the parts of compound identifiers so "1042" matches "err-1042"
+    parts = [part for token in tokens if not token.isalnum() for part in re.split(r"[-_.:/]", token)]
+    return tokens + parts
+
+
+class BM25Index:
+    """
+    BM25 over chunk IDs with append-only postings.
+    New documents are appended to a log on disk and folded into a snapshot
+    once the log grows past compact_every documents.
+    """
+
+    def __init__(self, directory=None, k1=1.2, b=0.75, compact_every=50_000):
+        self.printer = Printer()
+        self.directory = directory
+        self.k1 = k1
+        self.b = b
+        self.compact_every = compact_every
+        self._lock = threading.RLock()
+        self._clear()
+
+        if directory:
+            self.snapshot_path = os.path.join(directory, "bm25.pkl")
+            self.log_path = os.path.join(directory, "bm25.log")
+            self._load()
+
+    def _clear(self):
+        self.doc_ids = []
+        self.id_to_index = {}
+        self.doc_lengths = array("I")
+        self.postings = {}  # term -> (array of doc indices, array of term frequencies)
+        self.max_tf = {}  # term -> highest frequency in any document, for score upper bounds
+        self.total_length = 0
+        self.min_length = None
+        self.log_size = 0
+        self._norms = None
+
+    def __len__(self):
+        return len(self.doc_ids)
+
+    def __contains__(self, doc_id):
+        return doc_id in self.id_to_index
+
+    def _load(self):
+        try:
+            if os.path.exists(self.snapshot_path):
+                with open(self.snapshot_path, "rb") as f:
+                    state = pickle.load(f)
+                self.doc_ids = state["doc_ids"]
+                self.doc_lengths = state["doc_lengths"]
+                self.postings = state["postings"]
+                self.total_length = state["total_length"]
+                self.max_tf = state["max_tf"]
+                self.min_length = state["min_length"]
+                self.id_to_index = {doc_id: i for i, doc_id in enumerate(self.doc_ids)}
+
+            if os.path.exists(self.log_path):
+                with open(self.log_path) as f:
+                    for line in f:
+                        try:
+                            entry = json.loads(line)
+                        except ValueError:
+                            break  # torn write at the end of the log
+                        self._add_counts(entry["id"], entry["tf"])
+                        self.log_size += 1
+        except (OSError, pickle.UnpicklingError, KeyError, EOFError) as e:
+            self.printer.print(f"⚠ Lexical index unreadable, rebuilding: {e}", "yellow")
+            self._clear()
+
+    def _add_counts(self, doc_id, term_counts):
+        if doc_id in self.id_to_index:
+            return False
+        index = len(self.doc_ids)
+        self.doc_ids.append(doc_id)
+        self.id_to_index[doc_id] = index
+        length = sum(term_counts.values())
+        self.doc_lengths.append(length)
+        self.total_length += length
+        if self.min_length is None or length < self.min_length:
+            self.min_length = length
+        for term, count in term_counts.items():
+            if count > self.max_tf.get(term, 0):
+                self.max_tf[term] = count
+            entry = self.postings.get(term)
+            if entry is None:
+                entry = self.postings[term] = (array("I"), array("I"))
+            entry[0].append(index)
+            entry[1].append(count)
+        return True
+
+    def add(self, ids, texts):
+        """Index new documents, ignoring IDs that are already present."""
+        entries = []
+        with self._lock:
+            for doc_id, text in zip(ids, texts):
+                term_counts = dict(Counter(tokenize(text)))
+                if self._add_counts(doc_id, term_counts):
+                    entries.append({"id": doc_id, "tf": term_counts})
+            if not entries:
+                return 0
+            self._norms = None
+
+            if self.directory:
+                os.makedirs(self.directory, exist_ok=True)
+                with open(self.log_path, "a") as f:
+                    f.write("".join(json.dumps(entry) + "\n" for entry in entries))
+                    f.flush()
+                    os.fsync(f.fileno())
+                self.log_size += len(entries)
+                if self.log_size >= self.compact_every:
+                    self.compact()
+        return len(entries)
+
+    def compact(self):
+        """Fold the append log into a new snapshot, swapped in atomically."""
+        with self._lock:
+            tmp_path = self.snapshot_path + ".tmp"
+            with open(tmp_path, "wb") as f:
+                pickle.dump({
+                    "doc_ids": self.doc_ids,
+                    "doc_lengths": self.doc_lengths,
+                    "postings": self.postings,
+                    "total_length": self.total_length,
+                    "max_tf": self.max_tf,
+                    "min_length": self.min_length,
+                }, f, protocol=pickle.HIGHEST_PROTOCOL)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, self.snapshot_path)
+            if os.path.exists(self.log_path):
+                os.remove(self.log_path)
+            self.log_size = 0
+
+    def _length_norms(self):
+        """k1 * (1 - b + b * len / avg_len) for every document, cached until the next add."""
+        if self._norms is None or len(self._norms) != len(self.doc_ids):
+            lengths = np.frombuffer(self.doc_lengths, dtype=np.uint32).astype(np.float32)
+            avg_length = self.total_length / len(self.doc_ids)
+            self._norms = self.k1 * (1 - self.b + self.b * lengths / avg_length)
+        return self._norms
+
+    @staticmethod
+    def _matched(scores, touched, touched_size):
+        """Sorted indices of scored documents, from the postings when cheaper than a full scan."""
+        if touched_size * 8 < len(scores):
+            return np.unique(np.concatenate(touched)) if touched else np.empty(0, dtype=np.uint32)
+        return np.flatnonzero(scores)
+
+    def search(self, query, k=20, allowed=None):
+        """
+        Return up to k (doc_id, score) pairs ranked by BM25.
+        Terms are scored rarest first over their full postings. Once no unseen document
+        can reach the current k-th score, the remaining (common) terms only update the
+        existing candidates, found by binary search in their sorted postings (MaxScore).
+        Args:
+            query: Query text
+            k: Number of results
+            allowed: Optional doc IDs to restrict the search to; only these are scored
+        """
+        with self._lock:
+            count = len(self.doc_ids)
+            if not count:
+                return []
+
+            candidates = None
+            if allowed is not None:
+                indices = [self.id_to_index[doc_id] for doc_id in allowed if doc_id in self.id_to_index]
+                if not indices:
+                    return []
+                candidates = np.unique(np.asarray(indices, dtype=np.uint32))
+            norms = self._length_norms()
+
+            # Upper bound of a term's contribution: its highest tf in the shortest document
+            min_norm = self.k1 * (1 - self.b + self.b * self.min_length / (self.total_length / count))
+            terms = []
+            for term in set(tokenize(query)):
+                entry = self.postings.get(term)
+                if entry is not None:
+                    df = len(entry[0])
+                    idf = math.log(1 + (count - df + 0.5) / (df + 0.5))
+                    max_tf = self.max_tf[term]
+                    bound = idf * max_tf * (self.k1 + 1) / (max_tf + min_norm)
+                    terms.append((df, idf, bound, entry))
+            terms.sort(key=lambda term: term[0])
+
+            # What the terms not yet scored could still add to any document
+            remaining_bound = sum(term[2] for term in terms)
+            scored_bound = 0.0
+            scores = np.zeros(count, dtype=np.float32)
+            touched = []
+            touched_size = 0
+
+            for df, idf, bound, entry in terms:
+                remaining_bound -= bound
+                scored_bound += bound
+                doc_indices = np.frombuffer(entry[0], dtype=np.uint32)
+                term_freqs = np.frombuffer(entry[1], dtype=np.uint32)
+
+                if candidates is None:
+                    term_freqs = term_freqs.astype(np.float32)
+                    scores[doc_indices] += idf * term_freqs * (self.k1 + 1) / (term_freqs + norms[doc_indices])
+                    touched.append(doc_indices)
+                    touched_size += df
+
+                    # Unseen documents can no longer reach the top k once the k-th score beats
+                    # remaining_bound, which is impossible while scored_bound is smaller
+                    if scored_bound > remaining_bound:
+                        matched = self._matched(scores, touched, touched_size)
+                        if len(matched) >= k:
+                            threshold = np.partition(scores[matched], -k)[-k]
+                            if threshold > remaining_bound:
+                                # Keep only documents that can still reach the threshold
+                                candidates = matched[scores[matched] + remaining_bound >= threshold]
+                else:
+                    positions = np.searchsorted(doc_indices, candidates)
+                    positions[positions == len(doc_indices)] = 0
+                    found = doc_indices[positions] == candidates
+                    hits = candidates[found]
+                    freqs = term_freqs[positions[found]].astype(np.float32)
+                    scores[hits] += idf * freqs * (self.k1 + 1) / (freqs + norms[hits])
+
+            if candidates is None:
+                matched = self._matched(scores, touched, touched_size)
+            else:
+                matched = candidates[scores[candidates] > 0]
+            if len(matched) > k:
+                matched = matched[np.argpartition(scores[matched], -k)[-k:]]
+            ranked = matched[np.argsort(-scores[matched])]
+            return [(self.doc_ids[i], float(scores[i])) for i in ranked]
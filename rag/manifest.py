@@ -0,0 +1,107 @@
+"""Per-file manifest of ingested chunk IDs, one small JSON file per source file."""
+
+import json
+import os
+import re
+import threading
+from collections import OrderedDict
+
+from util.printer import Printer
+
+_HASH_PATTERN = re.compile(r"^[A-Za-z0-9_-]{1,128}$")
+
+
+class Manifest:
+    """
+    Records the source files ingested into a VectorDB, keyed by the MD5 of their
+    bytes, with their display name and chunk IDs. Every file has its own
+    <file hash>.json in directory, so recording a file rewrites only that file's
+    entry however large the corpus grows. The file hashes are listed on open; entries
+    are read on first use and the most recently used ones are kept in memory.
+    """
+
+    def __init__(self, directory, cache_size=256):
+        self.printer = Printer()
+        self.directory = directory
+        self.cache_size = cache_size
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()  # file hash -> entry, least recently used first
+        names = os.listdir(directory) if os.path.isdir(directory) else []
+        self.hashes = {name[:-len(".json")] for name in names if name.endswith(".json")}
+
+    def __contains__(self, file_hash):
+        return file_hash in self.hashes
+
+    def __iter__(self):
+        return iter(sorted(self.hashes))
+
+    def __len__(self):
+        return len(self.hashes)
+
+    def _path(self, file_hash):
+        if not _HASH_PATTERN.match(file_hash):
+            raise ValueError(f"Invalid file hash {file_hash!r}")
+        return os.path.join(self.directory, f"{file_hash}.json")
+
+    def _remember(self, file_hash, entry):
+        self._entries[file_hash] = entry
+        self._entries.move_to_end(file_hash)
+        if len(self._entries) > self.cache_size:
+            self._entries.popitem(last=False)
+
+    def _get(self, file_hash):
+        if file_hash not in self.hashes:
+            return None
+        entry = self._entries.get(file_hash)
+        if entry is None:
+            try:
+                with open(self._path(file_hash)) as f:
+                    entry = json.load(f)
+            except (OSError, ValueError) as e:
+                self.printer.print(f"⚠ Ignoring unreadable manifest entry {file_hash}: {e}", "yellow")
+                return None
+        self._remember(file_hash, entry)
+        return entry
+
+    def _write(self, file_hash, entry):
+        """Write an entry to a temporary file and atomically swap it in."""
+        path = self._path(file_hash)
+        os.makedirs(self.directory, exist_ok=True)
+        with open(path + ".tmp", "w") as f:
+            json.dump(entry, f)
+        os.replace(path + ".tmp", path)
+        self.hashes.add(file_hash)
+        self._remember(file_hash, entry)
+
+    def get(self, file_hash):
+        """Return {"name", "ids"} of an ingested file, or None."""
+        with self._lock:
+            return self._get(file_hash)
+
+    def ids(self, file_hash):
+        """Chunk IDs of an ingested file, empty if unknown."""
+        entry = self.get(file_hash)
+        return entry["ids"] if entry else []
+
+    def record(self, file_hash, name, ids):
+        """
+        Add chunk IDs to the entry of a file, creating it if needed.
+        Returns:
+            True if the file was not in the manifest before
+        """
+        with self._lock:
+            known = self._get(file_hash)
+            ids = list(dict.fromkeys((known["ids"] if known else []) + list(ids)))
+            self._write(file_hash, {"name": name, "ids": ids})
+        return known is None
+
+    def update(self, entries):
+        """Write many entries at once, e.g. the manifest of an imported bundle."""
+        with self._lock:
+            for file_hash, entry in entries.items():
+                self._write(file_hash, {"name": entry["name"], "ids": list(entry["ids"])})
+
+    def to_dict(self):
+        """Every entry as {file hash: {"name", "ids"}}, read from disk."""
+        entries = {file_hash: self.get(file_hash) for file_hash in self}
+        return {file_hash: entry for file_hash, entry in entries.items() if entry is not None}
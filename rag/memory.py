@@ -0,0 +1,230 @@
+"""Token-budgeted conversation memory with cached rolling summaries and query rewriting."""
+
+import hashlib
+import threading
+from collections import OrderedDict
+
+from rag.context import estimate_tokens
+from util.metrics import metrics
+
+SUMMARY_PROMPT = """Update the summary of a conversation between a user and a document Q&A assistant \
+with the new messages. Keep the facts, names, numbers and open questions the user may refer back to, \
+and drop formatting. Reply with the summary only, in at most {words} words.
+
+Summary so far:
+{summary}
+
+New messages:
+{messages}"""
+
+REWRITE_PROMPT = """Rewrite the user's last question as a standalone search query over their documents, \
+replacing pronouns and references with what they refer to in the conversation. \
+Reply with the query only.
+
+{conversation}
+Last question: {question}"""
+
+# Message hashes remembered per conversation, beyond any history a client sends
+MAX_COVERED = 1000
+
+
+def _truncate(text, tokens):
+    """Cut text to about the given number of tokens (see estimate_tokens)."""
+    return text if estimate_tokens(text) <= tokens else text[:tokens * 4].rstrip() + " …"
+
+
+def _message_hash(message):
+    return hashlib.md5(f"{message.get('role')}\0{message.get('content')}".encode()).digest()
+
+
+class ConversationMemory:
+    """
+    Condensed chat history for the LLM prompt. The newest messages that fit
+    window_tokens are kept verbatim; older ones are folded into a rolling summary
+    of at most summary_tokens. Every summary is cached under a hash chain of the
+    messages it covers, so each turn only folds in the messages that left the
+    window since the previous one. With a conversation ID, the latest summary of
+    the conversation is also found after the client dropped its oldest messages.
+    """
+
+    def __init__(self, complete, window_tokens=800, message_tokens=400, summary_tokens=250,
+                 rewrite_tokens=64, fold_tokens=4000, max_entries=10_000):
+        """
+        Args:
+            complete: Callable sending one prompt to the LLM and returning its reply
+            window_tokens: Budget of the verbatim recent messages
+            message_tokens: Longer messages are cut to this many tokens
+            summary_tokens: Budget of the rolling summary
+            rewrite_tokens: Longer rewritten queries are discarded in favour of the question
+            fold_tokens: Most message tokens summarized in one call; older unsummarized
+                messages are left out, e.g. when a client without a conversation ID
+                dropped the start of the chat
+            max_entries: Summaries, conversations and rewrites kept in each LRU
+        """
+        self.complete = complete
+        self.window_tokens = window_tokens
+        self.message_tokens = message_tokens
+        self.summary_tokens = summary_tokens
+        self.rewrite_tokens = rewrite_tokens
+        self.fold_tokens = fold_tokens
+        self.max_entries = max_entries
+
+        self._summaries = OrderedDict()  # chain key -> summary
+        self._conversations = OrderedDict()  # conversation ID -> (covered message hashes, summary)
+        self._rewrites = OrderedDict()  # key -> standalone query
+        self._lock = threading.Lock()
+        self.summary_calls = 0
+        self.messages_summarized = 0
+        self.summary_hits = 0
+        self.rewrite_calls = 0
+        self.rewrite_hits = 0
+
+    def _remember(self, cache, key, value):
+        with self._lock:
+            cache[key] = value
+            cache.move_to_end(key)
+            if len(cache) > self.max_entries:
+                cache.popitem(last=False)
+
+    def _recall(self, cache, key):
+        with self._lock:
+            value = cache.get(key)
+            if value is not None:
+                cache.move_to_end(key)
+            return value
+
+    def _window_start(self, history):
+        """Index of the first message kept verbatim; the last message is always kept."""
+        used = 0
+        start = len(history)
+        while start > 0:
+            tokens = min(estimate_tokens(history[start - 1]["content"]), self.message_tokens)
+            if start < len(history) and used + tokens > self.window_tokens:
+                break
+            used += tokens
+            start -= 1
+        # Start the window on a question rather than on the answer to it
+        if 0 < start < len(history) and history[start]["role"] == "assistant":
+            start += 1
+        return start
+
+    def _fold(self, summary, messages):
+        """Summarize messages into the summary with one LLM call."""
+        lines = "\n".join(
+            f"{'User' if message['role'] == 'user' else 'Assistant'}: "
+            f"{_truncate(message['content'], self.message_tokens)}"
+            for message in messages
+        )
+        prompt = SUMMARY_PROMPT.format(words=int(self.summary_tokens * 0.75), summary=summary or "(none)",
+                                       messages=lines)
+        with metrics.span("memory_summarize"):
+            summary = self.complete(prompt).strip()
+        self.summary_calls += 1
+        self.messages_summarized += len(messages)
+        metrics.inc("memory_summaries")
+        return _truncate(summary, self.summary_tokens)
+
+    def _summary(self, history, end, conversation_id):
+        """
+        Rolling summary of at least history[:end], folding in only what no cached
+        summary covers. A cached summary may reach past end when the window has grown.
+        Returns:
+            (summary, number of leading messages it covers)
+        """
+        hashes = [_message_hash(message) for message in history]
+        start, summary, covered = 0, "", []
+
+        if conversation_id:
+            # The client may have dropped its oldest messages since the last summary:
+            # find where the covered messages end within the history it sent
+            cached = self._recall(self._conversations, conversation_id)
+            if cached is not None:
+                for overlap in range(min(len(cached[0]), len(history) - 1), 0, -1):
+                    if cached[0][-overlap:] == hashes[:overlap]:
+                        start, covered, summary = overlap, cached[0], cached[1]
+                        break
+        else:
+            keys, key = [], hashlib.md5()
+            for message_hash in hashes[:-1]:
+                key.update(message_hash)
+                keys.append(key.hexdigest())
+            for prefix in range(len(keys), 0, -1):
+                cached = self._recall(self._summaries, keys[prefix - 1])
+                if cached is not None:
+                    start, summary = prefix, cached
+                    break
+
+        if start >= end:
+            self.summary_hits += 1
+            return summary, start
+
+        first, used = end, 0
+        while first > start:
+            used += min(estimate_tokens(history[first - 1]["content"]), self.message_tokens)
+            if used > self.fold_tokens:
+                break
+            first -= 1
+        summary = self._fold(summary, history[first:end])
+        if conversation_id:
+            covered = (covered + hashes[start:end])[-MAX_COVERED:]
+            self._remember(self._conversations, conversation_id, (covered, summary))
+        else:
+            self._remember(self._summaries, keys[end - 1], summary)
+        return summary, end
+
+    def condense(self, history, conversation_id=None):
+        """
+        Split a chat history into a summary of the older messages and the recent ones.
+        Args:
+            history: Chat messages ({"role", "content"}), oldest first
+            conversation_id: Stable ID of the chat, if the client has one
+        Returns:
+            (summary, recent messages with long ones cut to message_tokens)
+        """
+        history = [message for message in history or [] if message.get("content")]
+        start = self._window_start(history)
+        summary = ""
+        if start:
+            summary, start = self._summary(history, start, conversation_id)
+        recent = [{"role": message["role"], "content": _truncate(message["content"], self.message_tokens)}
+                  for message in history[start:]]
+        return summary, recent
+
+    def messages(self, question, summary, recent):
+        """Chat messages for the answering LLM call."""
+        messages = [{"role": "system", "content": f"Summary of the earlier conversation:\n{summary}"}] \
+            if summary else []
+        return messages + recent + [{"role": "user", "content": question}]
+
+    def rewrite(self, question, summary, recent):
+        """Rewrite a follow-up question into a standalone retrieval query, cached per conversation state."""
+        if not summary and not recent:
+            return question
+        conversation = (f"Conversation summary: {summary}\n" if summary else "") + "\n".join(
+            f"{'User' if message['role'] == 'user' else 'Assistant'}: {_truncate(message['content'], 100)}"
+            for message in recent[-2:]
+        )
+        key = hashlib.md5(f"{conversation}\0{question}".encode()).hexdigest()
+        query = self._recall(self._rewrites, key)
+        if query is not None:
+            self.rewrite_hits += 1
+            return query
+
+        with metrics.span("memory_rewrite"):
+            query = self.complete(REWRITE_PROMPT.format(conversation=conversation, question=question)).strip()
+        self.rewrite_calls += 1
+        if not query or estimate_tokens(query) > self.rewrite_tokens:
+            query = question
+        self._remember(self._rewrites, key, query)
+        return query
+
+    def stats(self):
+        return {
+            "summaries": len(self._summaries),
+            "conversations": len(self._conversations),
+            "summary_calls": self.summary_calls,
+            "summary_hits": self.summary_hits,
+            "messages_summarized": self.messages_summarized,
+            "rewrite_calls": self.rewrite_calls,
+            "rewrite_hits": self.rewrite_hits,
+        }
@@ -0,0 +1,314 @@
+"""
+CPU embedding engine running an ONNX export of a BERT-style model (fp32 or int8).
+
+Export bge-small-en-v1.5 once (needs torch and transformers, plus onnx for int8),
+checking it against the PyTorch model on chunks of an existing index or of PDFs:
+    python -m rag.onnx_embeddings ./models/bge-small-en-v1.5-onnx --int8 --check-pdfs docs/*.pdf
+"""
+
+import argparse
+import json
+import os
+import random
+import time
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+from rag.embeddings import DEFAULT_EMBEDDING_MODEL
+from util.metrics import metrics
+from util.printer import Printer
+
+DEFAULT_ONNX_DIR = "./models/bge-small-en-v1.5-onnx"
+FP32_FILE = "model.onnx"
+INT8_FILE = "model_int8.onnx"
+# Lowest per-text cosine agreement with the original model at which an export is loaded,
+# so its vectors can share indexes and caches with the ones the original model wrote
+MIN_AGREEMENT = 0.99
+
+
+class OnnxEmbeddings(Embeddings):
+    """
+    Embeds texts with onnxruntime, CLS-pooled and normalized like the
+    sentence-transformers config of bge models. Texts are tokenized once, sorted by
+    token length and cut into batches whose padded size fits max_batch_tokens, so
+    short chunks are not padded to the longest one in the call and batches of
+    short texts hold more of them.
+    """
+
+    def __init__(self, model_dir=DEFAULT_ONNX_DIR, int8=True, intra_op_threads=None, inter_op_threads=1,
+                 max_length=512, max_batch_tokens=16384, max_batch_size=256, pad_multiple=8, bucket=True,
+                 min_agreement=MIN_AGREEMENT):
+        """
+        Args:
+            model_dir: Directory written by export_onnx (model files and tokenizer.json)
+            int8: Run the dynamically quantized model instead of the fp32 one
+            intra_op_threads: Threads per operator, None for one per physical core
+            inter_op_threads: Operators run in parallel
+            max_length: Tokens per text, longer texts are truncated
+            max_batch_tokens: Upper bound on batch size x padded length
+            max_batch_size: Upper bound on texts per batch
+            pad_multiple: Padded lengths are rounded up to a multiple of this
+            bucket: Sort by length and size batches by tokens; False pads fixed-size batches
+                in input order to their longest text, for comparison
+            min_agreement: Refuse to load a model whose minimum cosine agreement with the
+                original, as recorded in export.json, is lower; None to skip the check
+        """
+        import onnxruntime
+        from tokenizers import Tokenizer
+
+        self.printer = Printer()
+        self.model_dir = model_dir
+        self.max_length = max_length
+        self.max_batch_tokens = max_batch_tokens
+        self.max_batch_size = max_batch_size
+        self.pad_multiple = pad_multiple
+        self.bucket = bucket
+
+        config = {}
+        config_path = os.path.join(model_dir, "export.json")
+        if os.path.exists(config_path):
+            with open(config_path, encoding="utf-8") as f:
+                config = json.load(f)
+        self.model_name = config.get("model_name", os.path.basename(os.path.normpath(model_dir)))
+        self.pooling = config.get("pooling", "cls")
+
+        model_path = os.path.join(model_dir, INT8_FILE if int8 else FP32_FILE)
+        if not os.path.exists(model_path):
+            raise FileNotFoundError(f"{model_path} not found, export it with: python -m rag.onnx_embeddings {model_dir}"
+                                    + (" --int8" if int8 else ""))
+        self.model_bytes = os.path.getsize(model_path)
+
+        variant = "int8" if int8 else "fp32"
+        agreement = config.get("agreement", {}).get(variant, {}).get("min")
+        if min_agreement is not None and (agreement is None or agreement < min_agreement):
+            found = "no recorded agreement" if agreement is None else f"a minimum agreement of {agreement:.4f}"
+            raise ValueError(f"The {variant} model in {model_dir} has {found} with {self.model_name} "
+                             f"(at least {min_agreement} required), re-export it with check texts")
+
+        self.tokenizer = Tokenizer.from_file(os.path.join(model_dir, "tokenizer.json"))
+        self.tokenizer.no_padding()
+        self.tokenizer.enable_truncation(max_length)
+
+        options = onnxruntime.SessionOptions()
+        options.graph_optimization_level = onnxruntime.GraphOptimizationLevel.ORT_ENABLE_ALL
+        options.execution_mode = onnxruntime.ExecutionMode.ORT_SEQUENTIAL if inter_op_threads <= 1 \
+            else onnxruntime.ExecutionMode.ORT_PARALLEL
+        options.inter_op_num_threads = inter_op_threads
+        if intra_op_threads:
+            options.intra_op_num_threads = intra_op_threads
+        self.session = onnxruntime.InferenceSession(model_path, options, providers=["CPUExecutionProvider"])
+        self.input_names = [model_input.name for model_input in self.session.get_inputs()]
+
+        self.batches = 0
+        self.tokens = 0
+        self.padded_tokens = 0
+
+    def _padded(self, length):
+        return min(-(-length // self.pad_multiple) * self.pad_multiple, self.max_length)
+
+    def plan(self, lengths):
+        """
+        Group text positions into batches.
+        Args:
+            lengths: Token count of every text
+        Returns:
+            List of (positions, padded length)
+        """
+        if not self.bucket:
+            return [
+                (list(range(start, min(start + self.max_batch_size, len(lengths)))),
+                 self._padded(max(lengths[start:start + self.max_batch_size])))
+                for start in range(0, len(lengths), self.max_batch_size)
+            ]
+
+        batches, batch, width = [], [], 0
+        for position in sorted(range(len(lengths)), key=lengths.__getitem__):
+            # Positions come shortest first, so the newest text sets the padded length
+            padded = self._padded(lengths[position])
+            if batch and (len(batch) >= self.max_batch_size or (len(batch) + 1) * padded > self.max_batch_tokens):
+                batches.append((batch, width))
+                batch = []
+            batch.append(position)
+            width = padded
+        if batch:
+            batches.append((batch, width))
+        return batches
+
+    def _run(self, encodings, width):
+        feeds = {name: np.zeros((len(encodings), width), dtype=np.int64) for name in self.input_names}
+        for row, encoding in enumerate(encodings):
+            length = len(encoding.ids)
+            feeds["input_ids"][row, :length] = encoding.ids
+            feeds["attention_mask"][row, :length] = 1
+            if "token_type_ids" in feeds:
+                feeds["token_type_ids"][row, :length] = encoding.type_ids
+
+        output = self.session.run(None, feeds)[0]
+        if output.ndim == 3:
+            if self.pooling == "mean":
+                mask = feeds["attention_mask"][:, :, None].astype(output.dtype)
+                output = (output * mask).sum(axis=1) / mask.sum(axis=1)
+            else:
+                output = output[:, 0]
+        return output / np.maximum(np.linalg.norm(output, axis=1, keepdims=True), 1e-12)
+
+    def embed_array(self, texts):
+        """Return the embeddings of texts as a float32 matrix in input order."""
+        texts = list(texts)
+        if not texts:
+            return np.empty((0, 0), dtype=np.float32)
+        encodings = self.tokenizer.encode_batch(texts)
+        lengths = [len(encoding.ids) for encoding in encodings]
+
+        vectors = None
+        for positions, width in self.plan(lengths):
+            with metrics.timer("embed_onnx_batch"):
+                batch = self._run([encodings[position] for position in positions], width)
+            if vectors is None:
+                vectors = np.empty((len(texts), batch.shape[1]), dtype=np.float32)
+            vectors[positions] = batch
+            self.batches += 1
+            self.padded_tokens += len(positions) * width
+        self.tokens += sum(lengths)
+        return vectors
+
+    def embed_documents(self, texts):
+        return self.embed_array(texts).tolist()
+
+    def embed_query(self, text):
+        return self.embed_array([text])[0].tolist()
+
+    def stats(self):
+        return {
+            "batches": self.batches,
+            "tokens": self.tokens,
+            "padding_ratio": self.padded_tokens / self.tokens if self.tokens else 0.0,
+        }
+
+
+def cosine_agreement(reference, vectors):
+    """
+    Per-text cosine similarity between two embeddings of the same texts.
+    Returns:
+        {"mean", "min", "p01"} of the similarities
+    """
+    reference = np.asarray(reference, dtype=np.float32)
+    vectors = np.asarray(vectors, dtype=np.float32)
+    similarity = (reference * vectors).sum(axis=1) / (
+        np.linalg.norm(reference, axis=1) * np.linalg.norm(vectors, axis=1))
+    return {"mean": float(similarity.mean()), "min": float(similarity.min()),
+            "p01": float(np.percentile(similarity, 1))}
+
+
+def export_onnx(output_dir=DEFAULT_ONNX_DIR, model_name=DEFAULT_EMBEDDING_MODEL, int8=True, opset=17,
+                check_texts=None):
+    """
+    Export a Hugging Face encoder to ONNX, optionally with an int8 copy quantized
+    dynamically (weights int8, activations quantized at run time).
+    Args:
+        output_dir: Directory for model.onnx, model_int8.onnx, tokenizer.json and export.json
+        model_name: Hugging Face model ID
+        int8: Also write the quantized model
+        opset: ONNX opset version
+        check_texts: Texts embedded by the exported models and the original one, to
+            record their cosine agreement in export.json
+    Returns:
+        Contents of export.json
+    """
+    import torch
+    from transformers import AutoModel, AutoTokenizer
+
+    printer = Printer()
+    os.makedirs(output_dir, exist_ok=True)
+    tokenizer = AutoTokenizer.from_pretrained(model_name)
+    tokenizer.save_pretrained(output_dir)
+    model = AutoModel.from_pretrained(model_name).eval()
+
+    start_time = time.time()
+    sample = tokenizer(["AskDocs exports this model."], return_tensors="pt")
+    names = [name for name in ("input_ids", "attention_mask", "token_type_ids") if name in sample]
+    fp32_path = os.path.join(output_dir, FP32_FILE)
+    with torch.inference_mode():
+        torch.onnx.export(
+            model, tuple(sample[name] for name in names), fp32_path, input_names=names,
+            output_names=["last_hidden_state"], opset_version=opset,
+            dynamic_axes={name: {0: "batch", 1: "sequence"} for name in names + ["last_hidden_state"]},
+        )
+    if int8:
+        from onnxruntime.quantization import QuantType, quantize_dynamic
+        quantize_dynamic(fp32_path, os.path.join(output_dir, INT8_FILE), weight_type=QuantType.QInt8)
+    printer.print(f"Exported {model_name} to {output_dir} in {time.time() - start_time:.1f} seconds", "bold_cyan")
+
+    config = {"model_name": model_name, "pooling": "cls", "opset": opset, "agreement": {},
+              "check_texts": len(check_texts or [])}
+    with open(os.path.join(output_dir, "export.json"), "w", encoding="utf-8") as f:
+        json.dump(config, f, indent=2)
+
+    if check_texts:
+        from langchain_huggingface import HuggingFaceEmbeddings
+        reference = HuggingFaceEmbeddings(model_name=model_name).embed_documents(check_texts)
+        for variant in (False, True) if int8 else (False,):
+            vectors = OnnxEmbeddings(output_dir, int8=variant, min_agreement=None).embed_array(check_texts)
+            agreement = cosine_agreement(reference, vectors)
+            config["agreement"]["int8" if variant else "fp32"] = agreement
+            printer.print(f"{'int8' if variant else 'fp32'} cosine agreement with {model_name}: "
+                          f"mean {agreement['mean']:.4f}, min {agreement['min']:.4f} "
+                          f"over {len(check_texts)} texts", "cyan")
+        with open(os.path.join(output_dir, "export.json"), "w", encoding="utf-8") as f:
+            json.dump(config, f, indent=2)
+    else:
+        printer.print("⚠️ No check texts: the export will not load until export.json records its agreement",
+                      "yellow")
+    return config
+
+
+def sample_texts(db_directory=None, pdfs=(), count=1000, seed=0):
+    """
+    Chunk texts to check an export on: a random sample of the chunks stored in an
+    index plus the chunks of some PDFs, cut the way ingestion cuts them.
+    Args:
+        db_directory: Persist directory of a VectorDB, or None
+        pdfs: Paths of PDF files
+        count: Largest number of texts returned
+        seed: Seed of the random sample
+    """
+    from rag.docstore import DocStore
+    from util.util import iter_chunks, iter_pdf_pages
+
+    texts = []
+    if db_directory and os.path.isdir(db_directory):
+        # The version in use after bundle imports, as in VectorDB
+        pointer = os.path.join(db_directory, "CURRENT")
+        if os.path.exists(pointer):
+            with open(pointer) as f:
+                db_directory = os.path.join(db_directory, f.read().strip())
+        docstore = DocStore(os.path.join(db_directory, "docstore"))
+        ids = random.Random(seed).sample(sorted(docstore.rows), min(count, len(docstore)))
+        texts += [doc.page_content for doc in docstore.get(ids).values()]
+    for path in pdfs:
+        texts += [chunk.page_content for chunk in iter_chunks(iter_pdf_pages(path), file_hash="", source=path)]
+    if len(texts) > count:
+        texts = random.Random(seed).sample(texts, count)
+    return texts
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export an embedding model to ONNX for OnnxEmbeddings")
+    parser.add_argument("output_dir", nargs="?", default=DEFAULT_ONNX_DIR)
+    parser.add_argument("--model", default=DEFAULT_EMBEDDING_MODEL)
+    parser.add_argument("--int8", action="store_true", help="Also write a dynamically quantized int8 model")
+    parser.add_argument("--opset", type=int, default=17)
+    parser.add_argument("--check-db", default=os.getenv("ASKDOCS_PERSIST_DIRECTORY", "./chroma_db"),
+                        help="Index whose stored chunks are sampled to check the export")
+    parser.add_argument("--check-pdfs", nargs="*", default=[], help="PDFs whose chunks are used to check the export")
+    parser.add_argument("--check-count", type=int, default=1000, help="Most texts in the check sample")
+    args = parser.parse_args()
+
+    check_texts = sample_texts(args.check_db, args.check_pdfs, args.check_count)
+    if not check_texts:
+        parser.error(f"No chunks in {args.check_db} to check the export on, pass some documents with --check-pdfs")
+    export_onnx(args.output_dir, args.model, args.int8, args.opset, check_texts)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,248 @@
+"""Compact quantized vector index with exact re-scoring, kept in memory-mapped files."""
+
+import json
+import os
+import threading
+from typing import Any, List
+
+import numpy as np
+from langchain_core.documents import Document
+from langchain_core.retrievers import BaseRetriever
+from util.append_only import append, commit, truncate_uncommitted
+from util.metrics import metrics
+from util.printer import Printer
+
+MODES = ("int8", "binary")
+
+# Population count of every byte value, for numpy versions without bitwise_count (< 2.0)
+_POPCOUNT = np.array([bin(value).count("1") for value in range(256)], dtype=np.uint8)
+_HAS_BITWISE_COUNT = hasattr(np, "bitwise_count")
+
+
+def _popcount(array):
+    if _HAS_BITWISE_COUNT:
+        return np.bitwise_count(array)
+    return _POPCOUNT[array]
+
+
+def _popcount_words(packed):
+    """View packed bits as 64-bit words where bitwise_count can count them; the table needs bytes."""
+    if _HAS_BITWISE_COUNT and packed.shape[-1] % 8 == 0:
+        return packed.view(np.uint64)
+    return packed
+
+
+def _normalize(vectors):
+    vectors = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    return vectors / np.where(norms == 0, 1, norms)
+
+
+class QuantizedIndex:
+    """
+    Append-only vector index for large collections. A first pass scans compact codes
+    (int8 with a per-vector scale, or one sign bit per dimension compared by Hamming
+    distance) held in a memory-mapped file; only the best candidates are re-scored
+    with exact cosine similarity against the full-precision vectors on disk.
+
+    Files in directory: meta.json, ids.bin (16-byte MD5 chunk IDs), codes.bin,
+    scales.f32 (int8 only) and vectors.f32.
+    """
+
+    def __init__(self, directory, mode=None, block_size=4096):
+        """
+        Args:
+            directory: Directory of the index files
+            mode: "int8" or "binary"; None keeps the mode of an existing index (int8 for a
+                new one). An existing index in another mode is emptied, to be rebuilt
+            block_size: Rows scanned per block in the first pass
+        """
+        if mode is not None and mode not in MODES:
+            raise ValueError(f"Unknown quantization mode {mode!r}, expected one of {MODES}")
+        self.printer = Printer()
+        self.directory = directory
+        self.block_size = block_size
+        self._lock = threading.Lock()
+        self._views = None
+
+        self.meta_path = os.path.join(directory, "meta.json")
+        meta = {"mode": mode or "int8", "dim": None, "count": 0}
+        if os.path.exists(self.meta_path):
+            with open(self.meta_path, encoding="utf-8") as f:
+                stored = json.load(f)
+            if mode is None or stored["mode"] == mode:
+                meta = stored
+            else:
+                self.printer.print(f"⚠ Quantized index in {directory} uses {stored['mode']}, "
+                                   f"rebuilding it as {mode}", "yellow")
+                for name in os.listdir(directory):
+                    os.remove(os.path.join(directory, name))
+        self.mode = meta["mode"]
+        self.dim = meta["dim"]
+        self.count = meta["count"]
+        if self.dim is not None:
+            truncate_uncommitted({self._path(name): self.count * width * np.dtype(dtype).itemsize
+                                  for name, dtype, width in self._row_layout()})
+
+    def __len__(self):
+        return self.count
+
+    def ids(self):
+        """Set of the chunk IDs in the index."""
+        if not self.count:
+            return set()
+        id_bytes = self._arrays()["ids.bin"].tobytes()
+        return {id_bytes[i * 16:(i + 1) * 16].hex() for i in range(self.count)}
+
+    @staticmethod
+    def exists(directory):
+        return os.path.exists(os.path.join(directory, "meta.json"))
+
+    def _path(self, name):
+        return os.path.join(self.directory, name)
+
+    def _row_layout(self):
+        """(file name, dtype, values per row) of every per-vector file."""
+        code_width = self.dim if self.mode == "int8" else (self.dim + 7) // 8
+        layout = [("ids.bin", np.uint8, 16), ("codes.bin", np.int8 if self.mode == "int8" else np.uint8, code_width),
+                  ("vectors.f32", np.float32, self.dim)]
+        if self.mode == "int8":
+            layout.append(("scales.f32", np.float32, 1))
+        return layout
+
+    def _quantize(self, vectors):
+        if self.mode == "binary":
+            return np.packbits(vectors > 0, axis=1), None
+        scales = np.abs(vectors).max(axis=1) / 127
+        scales[scales == 0] = 1
+        codes = np.rint(vectors / scales[:, None]).astype(np.int8)
+        return codes, scales.astype(np.float32)
+
+    def add(self, ids, vectors):
+        """Append vectors under their chunk IDs (32-character MD5 hex digests)."""
+        if not len(ids):
+            return
+        vectors = _normalize(vectors)
+        with self._lock:
+            if self.dim is None:
+                self.dim = vectors.shape[1]
+                os.makedirs(self.directory, exist_ok=True)
+            elif vectors.shape[1] != self.dim:
+                raise ValueError(f"Expected {self.dim}-dimensional vectors, got {vectors.shape[1]}")
+
+            codes, scales = self._quantize(vectors)
+            rows = {
+                "ids.bin": np.frombuffer(b"".join(bytes.fromhex(chunk_id) for chunk_id in ids), dtype=np.uint8),
+                "codes.bin": codes,
+                "vectors.f32": vectors,
+                "scales.f32": scales,
+            }
+            for name, _, _ in self._row_layout():
+                append(self._path(name), np.ascontiguousarray(rows[name]).tobytes())
+            self.count += len(ids)
+            commit(self.meta_path, {"mode": self.mode, "dim": self.dim, "count": self.count})
+            self._views = None
+
+    def _arrays(self):
+        """Memory-mapped views of the committed rows, reopened after appends."""
+        views = self._views
+        if views is None or views["count"] != self.count:
+            views = {"count": self.count}
+            for name, dtype, width in self._row_layout():
+                views[name] = np.memmap(self._path(name), dtype=dtype, mode="r", shape=(self.count, width))
+            self._views = views
+        return views
+
+    def _first_pass(self, codes, scales, query, start, stop):
+        """Approximate similarity of rows [start, stop) to the query; higher is better."""
+        if self.mode == "binary":
+            block = _popcount_words(np.asarray(codes[start:stop]))
+            distances = _popcount(np.bitwise_xor(block, query)).sum(axis=1, dtype=np.int32)
+            return -distances.astype(np.float32)
+        return (np.asarray(codes[start:stop], dtype=np.float32) @ query) * scales[start:stop, 0]
+
+    def search(self, query_vector, k=20, rescore_k=200):
+        """
+        Return up to k (chunk ID, cosine similarity) pairs, best first.
+        Args:
+            query_vector: Query embedding
+            k: Number of results
+            rescore_k: Candidates from the quantized pass that are re-scored exactly
+        """
+        if not self.count:
+            return []
+        views = self._arrays()
+        query = _normalize(query_vector)
+        codes, scales = views["codes.bin"], views.get("scales.f32")
+        if self.mode == "binary":
+            first_query = _popcount_words(np.packbits(query > 0))
+        else:
+            first_query = query
+
+        # Small blocks keep the decoded codes in cache while scanning
+        count = views["count"]
+        scores = np.empty(count, dtype=np.float32)
+        for start in range(0, count, self.block_size):
+            stop = min(start + self.block_size, count)
+            scores[start:stop] = self._first_pass(codes, scales, first_query, start, stop)
+
+        rescore_k = max(rescore_k, k)
+        rows = np.argpartition(-scores, rescore_k)[:rescore_k] if count > rescore_k else np.arange(count)
+
+        # Exact re-scoring reads only the candidate rows, in file order
+        rows = np.sort(rows)
+        exact = views["vectors.f32"][rows] @ query
+        best = np.argsort(-exact)[:k]
+        ids = views["ids.bin"]
+        return [(bytes(ids[rows[i]]).hex(), float(exact[i])) for i in best]
+
+    def stats(self):
+        """Bytes scanned in memory versus bytes kept on disk for re-scoring."""
+        if self.dim is None:
+            return {"mode": self.mode, "count": 0, "code_bytes": 0, "vector_bytes": 0}
+        layout = {name: np.dtype(dtype).itemsize * width for name, dtype, width in self._row_layout()}
+        code_bytes = layout["codes.bin"] + layout.get("scales.f32", 0)
+        return {
+            "mode": self.mode,
+            "count": self.count,
+            "code_bytes": self.count * code_bytes,
+            "vector_bytes": self.count * layout["vectors.f32"],
+        }
+
+
+class QuantizedRetriever(BaseRetriever):
+    """Retrieves from a QuantizedIndex and loads the matching chunks from Chroma."""
+
+    vector_store: Any
+    index: Any
+    embedding: Any
+    k: int = 20
+    rescore_k: int = 200
+
+    def _get_relevant_documents(self, query: str, *, run_manager=None) -> List[Document]:
+        return self.search(query)
+
+    def search(self, query, query_embedding=None):
+        """Run the quantized search, reusing a precomputed query embedding when given."""
+        if query_embedding is None:
+            query_embedding = self.embedding.embed_query(query)
+        with metrics.span("retrieve_quantized"):
+            hits = self.index.search(query_embedding, k=self.k, rescore_k=self.rescore_k)
+        if not hits:
+            return []
+
+        with metrics.span("retrieve_fetch"):
+            stored = self.vector_store.get(ids=[doc_id for doc_id, _ in hits], include=["documents", "metadatas"])
+        docs_by_id = {
+            doc_id: Document(page_content=text, metadata=metadata or {})
+            for doc_id, text, metadata in zip(stored["ids"], stored["documents"], stored["metadatas"])
+        }
+
+        results = []
+        for doc_id, score in hits:
+            doc = docs_by_id.get(doc_id)
+            if doc is not None:
+                doc.metadata["id"] = doc_id
+                doc.metadata["score"] = score
+                results.append(doc)
+        return results
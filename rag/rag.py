@@ -1,19 +1,44 @@
-from swarm import Swarm, Agent
 import os
-from dotenv import load_dotenv
+import threading
+from util.printer import Printer
 
-load_dotenv(override=True)
-os.environ["GEMINI_API_KEY"] = os.getenv('GEMINI_API_KEY')
+# One Swarm client per process, so HTTP connections are reused across calls and sessions
+_shared_client = None
+_shared_client_lock = threading.Lock()
+_environment_loaded = False
+
+def load_environment():
+    """Load settings from .env once, on first use instead of at import time."""
+    global _environment_loaded
+    if not _environment_loaded:
+        from dotenv import load_dotenv
+
+        load_dotenv(override=True)
+        if not os.getenv("GEMINI_API_KEY"):
+            Printer().print("⚠ GEMINI_API_KEY is not set", "yellow")
+        _environment_loaded = True
+
+def get_shared_client():
+    global _shared_client
+    if _shared_client is None:
+        with _shared_client_lock:
+            if _shared_client is None:
+                from swarm import Swarm
+
+                load_environment()
+                _shared_client = Swarm()
+    return _shared_client
 
 class RAG:
-    def __init__(self, model="gemini/gemini-2.0-flash", functions=[]) -> None:
+    def __init__(self, model="gemini/gemini-2.0-flash", functions=[], client=None) -> None:
         self.model = model
         self.functions = functions
-        
-    def llm(self, messages, context) -> str:
-        client = Swarm()
-        
-        agent = Agent(
+        self.client = client or get_shared_client()
+
+    def _build_agent(self, context):
+        from swarm import Agent
+
+        return Agent(
             name="Agent",
             model=self.model,
             instructions=f"""You are a knowledgeable and reliable RAG assistant.  
@@ -35,12 +60,45 @@ class RAG:
                     }
             )
         
-        response = client.run(
-            agent=agent,
+    def llm(self, messages, context) -> str:
+        response = self.client.run(
+            agent=self._build_agent(context),
             messages=messages,
         )
 
         return response.messages[-1]["content"]
+
+    def complete(self, prompt) -> str:
+        """
+        Answer a single prompt without the RAG instructions, e.g. to summarize a
+        conversation or rewrite a question.
+        """
+        from swarm import Agent
+
+        response = self.client.run(
+            agent=Agent(name="Helper", model=self.model, instructions="You are a precise, concise assistant.",
+                        model_config={"temperature": 0}),
+            messages=[{"role": "user", "content": prompt}],
+        )
+        return response.messages[-1]["content"]
+
+    def llm_stream(self, messages, context):
+        """
+        Stream the answer as it is generated.
+        Yields:
+            Text deltas of the assistant's reply
+        """
+        stream = self.client.run(
+            agent=self._build_agent(context),
+            messages=messages,
+            stream=True,
+        )
+
+        for chunk in stream:
+            # Skip the start/end delimiters and the final aggregated response
+            content = chunk.get("content") if isinstance(chunk, dict) else None
+            if content:
+                yield content
     
 
     
@@ -0,0 +1,128 @@
+"""Semantic cache of answers keyed by query embedding and collection fingerprint."""
+
+import itertools
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+from util.metrics import metrics
+
+
+class SemanticCache:
+    """
+    Returns a stored answer when a new query embeds within `threshold` cosine
+    similarity of a cached one asked against the same collection contents.
+    Entries expire after `ttl` seconds and the least recently used are evicted
+    beyond `max_entries`.
+    """
+
+    def __init__(self, embedding, threshold=0.95, ttl=3600, max_entries=1000):
+        self.embedding = embedding
+        self.threshold = threshold
+        self.ttl = ttl
+        self.max_entries = max_entries
+
+        self.entries = OrderedDict()  # entry id -> entry, least recently used first
+        self._ids = itertools.count()
+        self._matrix = None
+        self._matrix_ids = []
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def embed(self, query):
+        """Normalized query embedding, reusable across lookup() and store()."""
+        vector = np.asarray(self.embedding.embed_query(query), dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def _candidates(self):
+        """Matrix of cached query vectors, rebuilt only after the entries change."""
+        if self._matrix is None:
+            self._matrix_ids = list(self.entries)
+            vectors = [self.entries[entry_id]["vector"] for entry_id in self._matrix_ids]
+            self._matrix = np.vstack(vectors) if vectors else None
+        return self._matrix_ids, self._matrix
+
+    def _expire(self, now):
+        expired = [entry_id for entry_id, entry in self.entries.items() if entry["expires_at"] <= now]
+        for entry_id in expired:
+            del self.entries[entry_id]
+        if expired:
+            self._matrix = None
+
+    def lookup(self, query, fingerprint, scope="", vector=None):
+        """
+        Return the cached {"answer", "docs", "query", "similarity"} for a similar query, or None.
+        Args:
+            query: User question
+            fingerprint: Fingerprint of the collection contents the answer must match
+            scope: Extra key that must match exactly (e.g. a workspace)
+            vector: Precomputed query embedding, embedded here if omitted
+        """
+        vector = self.embed(query) if vector is None else vector
+        with self._lock:
+            self._expire(time.time())
+            entry_ids, matrix = self._candidates()
+            if matrix is not None:
+                similarities = matrix @ vector
+                for index in np.argsort(-similarities):
+                    if similarities[index] < self.threshold:
+                        break
+                    entry = self.entries[entry_ids[index]]
+                    if entry["fingerprint"] == fingerprint and entry["scope"] == scope:
+                        self.entries.move_to_end(entry_ids[index])
+                        self.hits += 1
+                        metrics.inc("semantic_cache_hits")
+                        return {"answer": entry["answer"], "docs": entry["docs"],
+                                "query": entry["query"], "similarity": float(similarities[index])}
+            self.misses += 1
+            metrics.inc("semantic_cache_misses")
+            return None
+
+    def store(self, query, fingerprint, answer, docs, scope="", vector=None):
+        """Cache an answer and the documents it was generated from."""
+        vector = self.embed(query) if vector is None else vector
+        with self._lock:
+            self.entries[next(self._ids)] = {
+                "query": query,
+                "vector": vector,
+                "fingerprint": fingerprint,
+                "scope": scope,
+                "answer": answer,
+                "docs": docs,
+                "expires_at": time.time() + self.ttl,
+            }
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+                self.evictions += 1
+            self._matrix = None
+
+    def invalidate(self, fingerprint=None, scope=None):
+        """
+        Drop entries built against any fingerprint other than the given one (all if None),
+        only within scope when one is given.
+        """
+        with self._lock:
+            stale = [entry_id for entry_id, entry in self.entries.items()
+                     if entry["fingerprint"] != fingerprint and (scope is None or entry["scope"] == scope)]
+            for entry_id in stale:
+                del self.entries[entry_id]
+            if stale:
+                self._matrix = None
+                self.invalidations += len(stale)
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self.entries),
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+            }
@@ -0,0 +1,260 @@
+"""Async query/ingest service sharing one VectorDB and one RAG across all requests."""
+
+import asyncio
+import hashlib
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from rag.context import ContextBuilder, estimate_tokens
+from rag.memory import ConversationMemory
+from rag.semantic_cache import SemanticCache
+from rag.workspaces import DEFAULT_WORKSPACE, WorkspaceStore
+from util.metrics import metrics
+from util.printer import Printer
+
+
+class QueryBatcher:
+    """
+    Coalesces query embeddings requested by concurrent coroutines into a single
+    embedding call, flushed when the batch is full or after max_wait_ms.
+    """
+
+    def __init__(self, embed_batch, max_batch_size=32, max_wait_ms=5):
+        self.embed_batch = embed_batch
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+        self._pending = []
+        self._timer = None
+        self.batches = 0
+        self.queries = 0
+
+    async def embed(self, text):
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.append((text, future))
+        if len(self._pending) >= self.max_batch_size:
+            self._flush()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.max_wait, self._flush)
+        return await future
+
+    def _flush(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        batch, self._pending = self._pending, []
+        if batch:
+            asyncio.ensure_future(self._run(batch))
+
+    async def _run(self, batch):
+        try:
+            vectors = await asyncio.to_thread(self.embed_batch, [text for text, _ in batch])
+        except Exception as e:
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        self.batches += 1
+        self.queries += len(batch)
+        for (_, future), vector in zip(batch, vectors):
+            if not future.done():
+                future.set_result(vector)
+
+
+class AskDocsService:
+    """
+    Framework-agnostic core of the HTTP service. Blocking work (Chroma, BM25,
+    the embedding model and the LLM) runs in worker threads, so retrieval for
+    one request overlaps with LLM I/O for others.
+    """
+
+    def __init__(self, vector_db, rag, semantic_cache=None, context_builder=None, memory=None, k=20,
+                 llm_workers=64):
+        self.printer = Printer()
+        self.vector_db = vector_db
+        self.rag = rag
+        self.k = k
+        self.semantic_cache = semantic_cache or SemanticCache(embedding=vector_db.embedding)
+        self.workspaces = WorkspaceStore(vector_db)
+        self.context_builder = context_builder or ContextBuilder(embedding=vector_db.embedding, vector_db=vector_db,
+                                                                 workspaces=self.workspaces)
+        self.memory = memory or ConversationMemory(complete=rag.complete)
+        # Answers for other workspaces or file subsets are keyed by their own fingerprints
+        vector_db.on_change(lambda fingerprint: self.semantic_cache.invalidate(fingerprint, scope=""))
+
+        embedding = vector_db.embedding
+        self.query_batcher = QueryBatcher(getattr(embedding, "embed_queries", embedding.embed_documents))
+
+        # LLM calls mostly wait on the network, so they get their own larger pool
+        self.llm_executor = ThreadPoolExecutor(max_workers=llm_workers, thread_name_prefix="llm")
+
+    def warm_up(self):
+        """Run one query embedding and touch the collection so the first request pays no load cost."""
+        with metrics.span("warm_up"):
+            self.vector_db.embedding.embed_query("warm up")
+            self.vector_db.fingerprint()
+
+    async def _run_llm(self, fn, *args):
+        return await asyncio.get_running_loop().run_in_executor(self.llm_executor, fn, *args)
+
+    def ingest(self, pdf_bytes, name, workspace=None):
+        """Queue a PDF for background ingestion into a workspace and return its progress."""
+        vector_db = self.workspaces.get(workspace, create=True)
+        file_hash = hashlib.md5(pdf_bytes).hexdigest()
+        if vector_db.has_file(file_hash):
+            return {"name": name, "file_hash": file_hash, "status": "indexed", "job_id": None}
+        return vector_db.ingest_async(pdf_bytes, name, file_hash).progress()
+
+    def export_bundle(self, path, workspace=None):
+        """Write the index of a workspace to a bundle file; returns the number of chunks."""
+        return self.workspaces.get(workspace).export_bundle(path)
+
+    def import_bundle(self, path, workspace=None):
+        """Replace the index of a workspace with a bundle without downtime; returns the number of chunks."""
+        return self.workspaces.get(workspace, create=True).import_bundle(path)
+
+    def job(self, job_id):
+        """Return the progress of an ingestion job, or None if unknown."""
+        for vector_db in self.workspaces.open_dbs():
+            ingestion = vector_db.ingestion
+            job = ingestion.jobs.get(job_id) if ingestion is not None else None
+            if job is not None:
+                return job.progress()
+        return None
+
+    async def retrieve(self, question, k=None, query_vector=None, workspaces=None, file_hashes=None):
+        """
+        Hybrid retrieval with a micro-batched query embedding, restricted to the
+        given workspaces (default workspace if empty) and optionally to some files.
+        """
+        if query_vector is None:
+            with metrics.span("embed_query"):
+                query_vector = await self.query_batcher.embed(question)
+        with metrics.span("retrieve"):
+            return await asyncio.to_thread(
+                self.workspaces.search, question, query_vector, workspaces, k or self.k, file_hashes
+            )
+
+    def _chunks(self, ids, workspaces):
+        found = {}
+        for workspace in dict.fromkeys(workspaces or [DEFAULT_WORKSPACE]):
+            missing = [chunk_id for chunk_id in ids if chunk_id not in found]
+            if not missing:
+                break
+            found.update(self.workspaces.get(workspace).get_documents(missing))
+        return [found[chunk_id] for chunk_id in ids if chunk_id in found]
+
+    async def chunks(self, ids, workspaces=None):
+        """Return the stored chunks with the given IDs, in that order, looked up in the given workspaces."""
+        return await asyncio.to_thread(self._chunks, list(ids), workspaces)
+
+    async def _prepare(self, question, history, workspaces=None, file_hashes=None, conversation_id=None):
+        """
+        Condense the history and rewrite follow-ups into standalone queries, embed
+        the query, consult the semantic cache for standalone questions, and otherwise
+        retrieve and assemble the context.
+        """
+        is_standalone = not history
+        query, messages = question, [{"role": "user", "content": question}]
+        if not is_standalone:
+            with metrics.span("memory"):
+                summary, recent = await self._run_llm(self.memory.condense, history, conversation_id)
+                query = await self._run_llm(self.memory.rewrite, question, summary, recent)
+            messages = self.memory.messages(question, summary, recent)
+
+        with metrics.span("embed_query"):
+            query_vector = await self.query_batcher.embed(query)
+        # May open a workspace and counts its collection, both blocking
+        fingerprint = await asyncio.to_thread(self.workspaces.fingerprint, workspaces, file_hashes)
+        scope = self.workspaces.scope(workspaces, file_hashes)
+        if is_standalone:
+            with metrics.span("semantic_cache"):
+                cached = self.semantic_cache.lookup(question, fingerprint, scope=scope, vector=query_vector)
+            if cached:
+                return {"cached": True, "answer": cached["answer"], "docs": cached["docs"], "report": None}
+
+        docs = await self.retrieve(query, query_vector=query_vector, workspaces=workspaces,
+                                   file_hashes=file_hashes)
+        with metrics.span("context"):
+            docs, context, report = await asyncio.to_thread(
+                self.context_builder.build, query, docs, query_vector
+            )
+        history_tokens = sum(estimate_tokens(message["content"]) for message in messages[:-1])
+        metrics.inc("history_tokens", history_tokens)
+        if report is not None:
+            report = {**report, "query": query, "history_tokens": history_tokens}
+        return {
+            "cached": False, "docs": docs, "context": context, "report": report, "messages": messages,
+            "fingerprint": fingerprint, "scope": scope, "vector": query_vector, "standalone": is_standalone,
+        }
+
+    async def ask(self, question, history=None, workspaces=None, file_hashes=None, conversation_id=None):
+        """
+        Answer a question. Returns {"answer", "docs", "cached", "report"}.
+        Passing a stable conversation_id lets the history's summary survive the
+        client dropping its oldest messages.
+        """
+        metrics.inc("requests", endpoint="ask")
+        with metrics.span("ask"):
+            return await self._ask(question, history, workspaces, file_hashes, conversation_id)
+
+    async def _ask(self, question, history, workspaces, file_hashes, conversation_id):
+        prepared = await self._prepare(question, history, workspaces, file_hashes, conversation_id)
+        if prepared["cached"]:
+            return prepared
+
+        with metrics.span("llm"):
+            answer = await self._run_llm(self.rag.llm, prepared["messages"], prepared["context"])
+        if prepared["standalone"]:
+            self.semantic_cache.store(question, prepared["fingerprint"], answer, prepared["docs"],
+                                      scope=prepared["scope"], vector=prepared["vector"])
+        return {"cached": False, "answer": answer, "docs": prepared["docs"], "report": prepared["report"]}
+
+    async def ask_stream(self, question, history=None, workspaces=None, file_hashes=None, conversation_id=None):
+        """
+        Answer a question as a stream of events:
+        {"type": "docs", ...}, then {"type": "token", "text": ...}..., then {"type": "done"}.
+        """
+        metrics.inc("requests", endpoint="ask_stream")
+        # Spans cannot stay open across yields, so the request and LLM stages are timed by hand
+        started = time.perf_counter()
+        with metrics.span("ask_stream_prepare"):
+            prepared = await self._prepare(question, history, workspaces, file_hashes, conversation_id)
+        yield {"type": "docs", "docs": prepared["docs"], "cached": prepared["cached"], "report": prepared["report"]}
+        if prepared["cached"]:
+            yield {"type": "token", "text": prepared["answer"]}
+            yield {"type": "done"}
+            metrics.record("ask_stream_total", time.perf_counter() - started)
+            return
+
+        # Pull tokens from the blocking stream in a worker thread
+        stream = self.rag.llm_stream(prepared["messages"], prepared["context"])
+        done = object()
+        parts = []
+        llm_started = time.perf_counter()
+        while True:
+            token = await self._run_llm(next, stream, done)
+            if token is done:
+                break
+            if not parts:
+                metrics.record("llm_first_token", time.perf_counter() - llm_started)
+            parts.append(token)
+            yield {"type": "token", "text": token}
+        metrics.record("llm", time.perf_counter() - llm_started)
+
+        if prepared["standalone"]:
+            self.semantic_cache.store(question, prepared["fingerprint"], "".join(parts), prepared["docs"],
+                                      scope=prepared["scope"], vector=prepared["vector"])
+        yield {"type": "done"}
+        metrics.record("ask_stream_total", time.perf_counter() - started)
+
+    def stats(self):
+        return {
+            "semantic_cache": self.semantic_cache.stats(),
+            "query_batches": self.query_batcher.batches,
+            "queries_embedded": self.query_batcher.queries,
+            "workspaces": self.workspaces.names(),
+            "docstore": self.vector_db.docstore.stats(),
+            "memory": self.memory.stats(),
+            "metrics": metrics.snapshot(),
+        }
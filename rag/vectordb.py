@@ -1,16 +1,70 @@
 from langchain_community.vectorstores import Chroma
-from langchain_huggingface import HuggingFaceEmbeddings
+from langchain_core.documents import Document
+from rag.embeddings import get_embedding_service
+from rag.embedding_cache import CachedEmbeddings, get_embedding_cache
+from rag import bundle
+from rag.docstore import DocStore
+from rag.ingest import IngestionWorker
+from rag.lexical import BM25Index
+from rag.manifest import Manifest
+from rag.hybrid import HybridRetriever
+from rag.quantized import QuantizedIndex, QuantizedRetriever
+from util.metrics import metrics
 from util.printer import Printer
 import time
 import shutil
 import os
 import hashlib
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+# Entries of a database directory that survive a reset: workspaces and imported index versions
+_KEPT_ON_RESET = ("workspaces", "versions", "CURRENT")
 
 class VectorDB:
-    def __init__(self, chunks=None, persist_directory="./chroma_db"):
+    def __init__(self, chunks=None, persist_directory="./chroma_db", embedding=None,
+                 embedding_cache_dir="./embedding_cache", quantization=None, max_file_vectors=200_000):
         self.printer = Printer()
-        self.persist_directory = persist_directory
-        self.embedding = HuggingFaceEmbeddings(model_name="BAAI/bge-small-en-v1.5")
+        # Imported index versions live in persist_directory/versions/, the one in use is named in CURRENT
+        self.root_directory = persist_directory
+        self.persist_directory = self._active_directory(persist_directory)
+        # Share one embedding model per process unless a specific one is injected
+        embedding = embedding if embedding is not None else get_embedding_service()
+        self.model_name = getattr(embedding, "model_name", type(embedding).__name__)
+        # Skip the model for chunks that were already embedded in any earlier upload
+        if embedding_cache_dir:
+            embedding = CachedEmbeddings(embedding, get_embedding_cache(self.model_name, embedding_cache_dir))
+        self.embedding = embedding
+
+        # Per-file manifest of ingested chunk IDs, shared by every session on this directory
+        self.manifest = Manifest(os.path.join(self.persist_directory, "manifest"))
+
+        # Serializes writes so background ingestion and sessions can share this instance
+        self._write_lock = threading.RLock()
+        self.ingestion = None
+
+        # Normalized embeddings of recently searched files, for exact file-restricted search
+        self._file_vectors = OrderedDict()
+        self._file_vectors_lock = threading.Lock()
+        self.max_file_vectors = max_file_vectors
+
+        # Callbacks notified with the new fingerprint whenever the collection changes
+        self._change_listeners = []
+        self._fingerprint = None
+
+        # Lexical index for exact matches on identifiers, persisted next to Chroma
+        self.lexical_index = BM25Index(os.path.join(self.persist_directory, "lexical"))
+
+        # Compressed copy of every chunk for fetching texts by ID without going through Chroma
+        self.docstore = DocStore(os.path.join(self.persist_directory, "docstore"))
+
+        # Optional compact index ("int8" or "binary"), kept up to date once it exists on disk
+        self.quantized_index = None
+        self.quantization = quantization
+        if quantization or QuantizedIndex.exists(self._quantized_directory()):
+            self.quantized_index = QuantizedIndex(self._quantized_directory(), mode=quantization)
         
         # Initialize vector_db
         if chunks:
@@ -22,10 +76,11 @@ class VectorDB:
             except ValueError as e:
                 if "Could not connect to tenant" in str(e):
                     self.printer.print("⚠ Database error! Resetting and recreating...", "red")
-                    self._reset_database()
+                    self._quarantine_database()
                     self.vector_db = self._create_vectordb(chunks)
                 else:
                     raise e
+            self._record_files(chunks, self._chunk_ids(chunks))
             
             elapsed_time = time.time() - start_time
             self.printer.print(f"Total initialization time: {elapsed_time:.2f} seconds", "bold_cyan")
@@ -37,70 +92,430 @@ class VectorDB:
                     persist_directory=self.persist_directory,
                     embedding_function=self.embedding
                 )
+                self._sync_lexical_index()
+                self._sync_docstore()
+                self._sync_quantized_index()
             else:
                 self.printer.print("No chunks provided and no existing database found", "yellow")
                 self.vector_db = None
         
-    def _create_vectordb(self, chunks):
+    @staticmethod
+    def _active_directory(root):
+        """Directory of the index version in use: the one named in root/CURRENT, else root itself."""
+        pointer = os.path.join(root, "CURRENT")
+        if os.path.exists(pointer):
+            with open(pointer) as f:
+                return os.path.join(root, f.read().strip())
+        return root
+
+    @staticmethod
+    def _chunk_ids(chunks):
+        """Return the content-based ID of each chunk, hashing only chunks that lack one."""
+        return [
+            chunk.metadata.get("id") or hashlib.md5(chunk.page_content.encode()).hexdigest()
+            for chunk in chunks
+        ]
+
+    def _create_vectordb(self, chunks, ids=None, embeddings=None):
         start_time = time.time()
         self.printer.print("Creating vector database...", "yellow")
         
-        # Generate unique IDs for each chunk based on content
-        ids = [hashlib.md5(chunk.page_content.encode()).hexdigest() for chunk in chunks]
-        
-        vector_db = Chroma.from_documents(
-            chunks,
-            embedding=self.embedding,
-            persist_directory=self.persist_directory,
-            ids=ids
-        )
-        vector_db.persist() 
+        if ids is None:
+            # Use the content IDs computed by the chunker, one chunk per ID
+            unique = dict(zip(self._chunk_ids(chunks), chunks))
+            ids, chunks = list(unique), list(unique.values())
+        if embeddings is None:
+            embeddings = self.embedding.embed_documents([chunk.page_content for chunk in chunks])
+
+        vector_db = Chroma(persist_directory=self.persist_directory, embedding_function=self.embedding)
+        self._write_chunks(vector_db, ids, chunks, embeddings)
         
         elapsed_time = time.time() - start_time
         self.printer.print(f"✅ Vector database successfully created in {elapsed_time:.2f} seconds", "bold_green")
         
         return vector_db
 
-    def add_documents(self, chunks):
+    def has_file(self, file_hash):
+        """Return True if a file with this content hash has already been ingested."""
+        return file_hash in self.manifest and self.vector_db is not None
+
+    def record_file(self, file_hash, name, ids):
+        """Mark a file as ingested with the given chunk IDs."""
+        is_new = self.manifest.record(file_hash, name, ids)
+        with self._file_vectors_lock:
+            self._file_vectors.pop(file_hash, None)
+        if is_new:
+            self._notify_change()
+
+    def _record_files(self, chunks, ids):
+        """Add the chunk IDs of every source file in chunks to the manifest."""
+        files = {}
+        for chunk, chunk_id in zip(chunks, ids):
+            file_hash = chunk.metadata.get("file_hash")
+            if file_hash:
+                entry = files.setdefault(file_hash, {"name": chunk.metadata.get("source", file_hash), "ids": []})
+                entry["ids"].append(chunk_id)
+
+        for file_hash, entry in files.items():
+            self.record_file(file_hash, entry["name"], entry["ids"])
+
+    def _sync_lexical_index(self, batch_size=5000):
+        """Backfill the lexical index with chunks stored before it existed."""
+        collection = self.vector_db._collection
+        if collection.count() <= len(self.lexical_index):
+            return
+        self.printer.print("Building lexical index from existing chunks...", "yellow")
+        for offset in range(0, collection.count(), batch_size):
+            batch = collection.get(include=["documents"], limit=batch_size, offset=offset)
+            self.lexical_index.add(batch["ids"], batch["documents"])
+
+    def _sync_docstore(self, batch_size=5000):
+        """Backfill the docstore with chunks stored before it existed."""
+        collection = self.vector_db._collection
+        if collection.count() <= len(self.docstore):
+            return
+        self.printer.print("Building docstore from existing chunks...", "yellow")
+        for offset in range(0, collection.count(), batch_size):
+            batch = collection.get(include=["documents", "metadatas"], limit=batch_size, offset=offset)
+            self.docstore.add(batch["ids"], [
+                Document(page_content=text, metadata=metadata or {})
+                for text, metadata in zip(batch["documents"], batch["metadatas"])
+            ])
+
+    def get_documents(self, ids):
+        """Return {id: Document} for the given chunk IDs, from the docstore or else from Chroma."""
+        found = self.docstore.get(ids)
+        missing = [chunk_id for chunk_id in ids if chunk_id not in found]
+        if missing and self.vector_db is not None:
+            stored = self.vector_db.get(ids=missing, include=["documents", "metadatas"])
+            for chunk_id, text, metadata in zip(stored["ids"], stored["documents"], stored["metadatas"]):
+                found[chunk_id] = Document(page_content=text, metadata=metadata or {})
+        for chunk_id, doc in found.items():
+            doc.metadata["id"] = chunk_id
+        return found
+
+    def _quantized_directory(self):
+        return os.path.join(self.persist_directory, "quantized")
+
+    def _write_chunks(self, vector_db, ids, chunks, embeddings):
+        """Store embedded chunks in Chroma, the lexical index, the docstore and the quantized index."""
+        vector_db._collection.add(
+            ids=ids, embeddings=embeddings, documents=[chunk.page_content for chunk in chunks],
+            metadatas=[chunk.metadata or None for chunk in chunks],
+        )
+        self.lexical_index.add(ids, [chunk.page_content for chunk in chunks])
+        self.docstore.add(ids, chunks)
+        if self.quantized_index is not None:
+            self.quantized_index.add(ids, embeddings)
+
+    def _sync_quantized_index(self, batch_size=5000):
+        """Backfill the quantized index with stored chunks it does not hold yet."""
+        if self.quantized_index is None:
+            return
+        collection = self.vector_db._collection
+        indexed = self.quantized_index.ids()
+        if collection.count() <= len(indexed):
+            return
+        self.printer.print("Building quantized index from existing chunks...", "yellow")
+        for offset in range(0, collection.count(), batch_size):
+            ids = collection.get(include=[], limit=batch_size, offset=offset)["ids"]
+            missing = [chunk_id for chunk_id in ids if chunk_id not in indexed]
+            if missing:
+                batch = collection.get(ids=missing, include=["embeddings"])
+                self.quantized_index.add(batch["ids"], batch["embeddings"])
+                indexed.update(batch["ids"])
+
+    def _existing_ids(self, ids, batch_size=5000):
+        """Return the subset of ids already stored in the collection, looked up in bulk."""
+        existing = set()
+        for i in range(0, len(ids), batch_size):
+            existing.update(self.vector_db.get(ids=ids[i:i + batch_size], include=[])["ids"])
+        return existing
+
+    def add_documents(self, chunks, record_manifest=True):
         """
         Add new documents to existing vector database.
+        Chunks whose IDs are already in the collection are skipped before embedding.
         If vector database doesn't exist, create a new one.
+        Args:
+            chunks: Documents to add
+            record_manifest: Whether to mark the chunks' source files as fully ingested
+        Returns:
+            Number of chunks actually embedded and inserted
         """
         if not chunks:
-            self.printer.print("No chunks to add", "yellow")
+            return 0
+
+        # Use the content IDs computed by the chunker
+        ids = self._chunk_ids(chunks)
+
+        # Keep one chunk per ID, drop those already stored and embed the rest before
+        # taking the write lock, so that concurrent ingestion jobs embed in parallel
+        unique = dict(zip(ids, chunks))
+        existing = self._existing_ids(list(unique)) if self.vector_db is not None else set()
+        new_ids = [chunk_id for chunk_id in unique if chunk_id not in existing]
+        embeddings = []
+        if new_ids:
+            with metrics.span("embed_chunks"):
+                embeddings = self.embedding.embed_documents([unique[chunk_id].page_content for chunk_id in new_ids])
+
+        with self._write_lock, metrics.span("upsert"):
+            # Another writer may have stored some of the chunks in the meantime
+            if new_ids and self.vector_db is not None:
+                existing = self._existing_ids(new_ids)
+                kept = [i for i, chunk_id in enumerate(new_ids) if chunk_id not in existing]
+                new_ids, embeddings = [new_ids[i] for i in kept], [embeddings[i] for i in kept]
+            new_chunks = [unique[chunk_id] for chunk_id in new_ids]
+            metrics.inc("chunks_added", len(new_chunks))
+            metrics.inc("chunks_already_indexed", len(chunks) - len(new_chunks))
+
+            if new_chunks and self.vector_db is None:
+                # If no vector database exists, create new one
+                self.vector_db = self._create_vectordb(new_chunks, new_ids, embeddings)
+            elif new_chunks:
+                # If vector database exists, add new documents
+                try:
+                    self._write_chunks(self.vector_db, new_ids, new_chunks, embeddings)
+                except Exception as e:
+                    self.printer.print(f"❌ Error adding documents: {e}", "red")
+                    raise e
+
+        if record_manifest:
+            self._record_files(chunks, ids)
+        if new_chunks:
+            self._notify_change()
+        return len(new_chunks)
+
+    def _load_file_vectors(self, file_hash, batch_size=5000):
+        """(chunk IDs, normalized embedding matrix) of an ingested file, cached in an LRU."""
+        with self._file_vectors_lock:
+            if file_hash in self._file_vectors:
+                self._file_vectors.move_to_end(file_hash)
+                return self._file_vectors[file_hash]
+
+        ids = self.manifest.ids(file_hash)
+        if not ids or self.vector_db is None:
+            return [], None
+        stored_ids, vectors = [], []
+        for i in range(0, len(ids), batch_size):
+            stored = self.vector_db.get(ids=ids[i:i + batch_size], include=["embeddings"])
+            stored_ids.extend(stored["ids"])
+            vectors.extend(stored["embeddings"])
+        matrix = np.asarray(vectors, dtype=np.float32).reshape(len(stored_ids), -1)
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        entry = (stored_ids, matrix / np.where(norms == 0, 1, norms))
+
+        with self._file_vectors_lock:
+            self._file_vectors[file_hash] = entry
+            cached = sum(len(file_ids) for file_ids, _ in self._file_vectors.values())
+            while cached > self.max_file_vectors and len(self._file_vectors) > 1:
+                evicted_ids, _ = self._file_vectors.popitem(last=False)[1]
+                cached -= len(evicted_ids)
+        return entry
+
+    def search_files(self, query_vector, file_hashes, k=50):
+        """
+        Exact dense search over the chunks of the given files only, so its cost depends
+        on the size of those files rather than of the whole collection.
+        Returns:
+            Up to k (chunk ID, cosine similarity) pairs, best first
+        """
+        return self.search_files_batch([query_vector], file_hashes, k)[0]
+
+    def search_files_batch(self, query_vectors, file_hashes, k=50):
+        """
+        search_files for many queries at once: one matrix product per file and a
+        row-wise top-k over the whole score matrix.
+        Returns:
+            One list of up to k (chunk ID, cosine similarity) pairs per query
+        """
+        queries = np.asarray(query_vectors, dtype=np.float32).reshape(len(query_vectors), -1)
+        norms = np.linalg.norm(queries, axis=1, keepdims=True)
+        queries = queries / np.where(norms == 0, 1, norms)
+        ids, scores = [], []
+        for file_hash in file_hashes:
+            file_ids, matrix = self._load_file_vectors(file_hash)
+            if file_ids:
+                ids.extend(file_ids)
+                scores.append(queries @ matrix.T)
+        if not ids:
+            return [[] for _ in range(len(queries))]
+        scores = np.concatenate(scores, axis=1)
+        if scores.shape[1] > k:
+            top = np.argpartition(-scores, k, axis=1)[:, :k]
+        else:
+            top = np.broadcast_to(np.arange(scores.shape[1]), scores.shape)
+        top_scores = np.take_along_axis(scores, top, axis=1)
+        top = np.take_along_axis(top, np.argsort(-top_scores, axis=1), axis=1)
+        return [[(ids[i], float(row_scores[i])) for i in row] for row, row_scores in zip(top, scores)]
+
+    def file_filter(self, file_hashes):
+        """
+        Search kwargs restricting hybrid retrieval to the chunks of the given files:
+        exact dense search over just those files and their chunk IDs for the lexical search.
+        """
+        file_hashes = list(file_hashes)
+        allowed_ids = [chunk_id for file_hash in file_hashes for chunk_id in self.manifest.ids(file_hash)]
+        return {
+            "dense_search": lambda query_vector, k: self.search_files(query_vector, file_hashes, k),
+            "dense_search_batch": lambda query_vectors, k: self.search_files_batch(query_vectors, file_hashes, k),
+            "allowed_ids": allowed_ids,
+        }
+
+    def get_embeddings(self, ids):
+        """Return {id: embedding} for the given chunk IDs that are stored in the collection."""
+        if self.vector_db is None or not ids:
+            return {}
+        stored = self.vector_db.get(ids=list(ids), include=["embeddings"])
+        return dict(zip(stored["ids"], stored["embeddings"]))
+
+    def fingerprint(self):
+        """Short hash identifying the current contents of the collection."""
+        if self._fingerprint is None:
+            count = self.vector_db._collection.count() if self.vector_db is not None else 0
+            files = ",".join(self.manifest)
+            self._fingerprint = hashlib.md5(f"{count}:{files}".encode()).hexdigest()
+        return self._fingerprint
+
+    def on_change(self, callback):
+        """Register callback(fingerprint), called after chunks are added to the collection."""
+        self._change_listeners.append(callback)
+
+    def _notify_change(self):
+        self._fingerprint = None
+        fingerprint = self.fingerprint()
+        for callback in self._change_listeners:
+            callback(fingerprint)
+
+    def ingest_async(self, pdf_bytes, name, file_hash):
+        """
+        Queue a PDF for background ingestion.
+        Returns:
+            IngestJob whose progress() reports per-file status and throughput
+        """
+        with self._write_lock:
+            if self.ingestion is None:
+                self.ingestion = IngestionWorker(self)
+        return self.ingestion.submit(pdf_bytes, name, file_hash)
+
+    def _quarantine_database(self):
+        """
+        Move a damaged database aside into a corrupt-<time> directory and start an empty
+        one in its place. Nothing is deleted, and workspaces and index versions stay put.
+        """
+        if not os.path.exists(self.persist_directory):
             return
-            
+        quarantine = os.path.join(self.persist_directory, time.strftime("corrupt-%Y%m%d-%H%M%S"))
+        os.makedirs(quarantine, exist_ok=True)
+        for name in os.listdir(self.persist_directory):
+            if name not in _KEPT_ON_RESET and not name.startswith("corrupt-"):
+                shutil.move(os.path.join(self.persist_directory, name), quarantine)
+        self.manifest = Manifest(os.path.join(self.persist_directory, "manifest"))
+        self._file_vectors.clear()
+        self.lexical_index = BM25Index(os.path.join(self.persist_directory, "lexical"))
+        self.docstore = DocStore(os.path.join(self.persist_directory, "docstore"))
+        if self.quantized_index is not None:
+            self.quantized_index = QuantizedIndex(self._quantized_directory(), mode=self.quantized_index.mode)
+        self.printer.print(f"🗃 Moved the damaged database to {quarantine}", "yellow")
+
+    def _collection_batches(self, batch_size=5000):
+        """Yield (ids, embeddings, texts, metadatas) of every stored chunk."""
+        collection = self.vector_db._collection
+        for offset in range(0, collection.count(), batch_size):
+            batch = collection.get(include=["embeddings", "documents", "metadatas"], limit=batch_size, offset=offset)
+            yield batch["ids"], batch["embeddings"], batch["documents"], batch["metadatas"]
+
+    def export_bundle(self, path, batch_size=5000):
+        """
+        Write the chunks, their embeddings and the manifest to a portable bundle file
+        that import_bundle loads without re-embedding. Writes wait until it is done.
+        Returns:
+            Number of chunks exported
+        """
+        with self._write_lock:
+            batches = self._collection_batches(batch_size) if self.vector_db is not None else []
+            count = bundle.write_bundle(path, self.model_name, self.manifest.to_dict(), batches)
+        self.printer.print(f"📦 Exported {count} chunks to {path}", "bold_green")
+        return count
+
+    def import_bundle(self, path, batch_size=5000):
+        """
+        Load a bundle into a new index version and switch to it atomically. Queries keep
+        using the current version until the switch and writes wait for it; the previous
+        version is kept on disk, older ones are removed.
+        Returns:
+            Number of chunks imported
+        """
+        header = bundle.read_header(path)
+        if header["model"] != self.model_name:
+            raise ValueError(f"Bundle was embedded with {header['model']!r}, this index uses {self.model_name!r}")
+
         start_time = time.time()
-        self.printer.print(f"Adding {len(chunks)} new chunks to vector database", "cyan")
-        
-        # Generate unique IDs for each chunk based on content
-        ids = [hashlib.md5(chunk.page_content.encode()).hexdigest() for chunk in chunks]
-        
-        if self.vector_db is None:
-            # If no vector database exists, create new one
-            self.vector_db = self._create_vectordb(chunks)
-        else:
-            # If vector database exists, add new documents
+        with self._write_lock:
+            directory = os.path.join(self.root_directory, "versions", f"v{time.time_ns()}")
+            vector_db = Chroma(persist_directory=directory, embedding_function=self.embedding)
+            lexical_index = BM25Index(os.path.join(directory, "lexical"))
+            docstore = DocStore(os.path.join(directory, "docstore"))
+            quantized_index = None
+            if self.quantized_index is not None:
+                quantized_index = QuantizedIndex(os.path.join(directory, "quantized"), mode=self.quantized_index.mode)
+
             try:
-                self.vector_db.add_documents(chunks, ids=ids)
-                self.vector_db.persist()
-                elapsed_time = time.time() - start_time
-                self.printer.print(f"✅ Added {len(chunks)} chunks in {elapsed_time:.2f} seconds", "bold_green")
-            except Exception as e:
-                self.printer.print(f"❌ Error adding documents: {e}", "red")
-                raise e
-
-    def _reset_database(self):
-        """Delete the old database if there are errors and recreate it."""
-        if os.path.exists(self.persist_directory):
-            shutil.rmtree(self.persist_directory)
-            self.printer.print("🗑 Old database deleted!", "yellow")
+                for ids, embeddings, docs in bundle.read_chunks(path, batch_size):
+                    vector_db._collection.add(
+                        ids=ids, embeddings=embeddings, documents=[doc.page_content for doc in docs],
+                        metadatas=[doc.metadata or None for doc in docs],
+                    )
+                    lexical_index.add(ids, [doc.page_content for doc in docs])
+                    docstore.add(ids, docs)
+                    if quantized_index is not None:
+                        quantized_index.add(ids, embeddings)
+                lexical_index.compact()
+                manifest = Manifest(os.path.join(directory, "manifest"))
+                manifest.update(header["manifest"])
+            except Exception:
+                shutil.rmtree(directory, ignore_errors=True)
+                raise
+
+            # Writing CURRENT is the commit point: a crash before it leaves the old version in use
+            pointer = os.path.join(self.root_directory, "CURRENT")
+            with open(pointer + ".tmp", "w") as f:
+                f.write(os.path.relpath(directory, self.root_directory))
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(pointer + ".tmp", pointer)
+
+            previous = self.persist_directory
+            self.persist_directory = directory
+            self.manifest = manifest
+            self.vector_db = vector_db
+            self.lexical_index = lexical_index
+            self.docstore = docstore
+            self.quantized_index = quantized_index
+            with self._file_vectors_lock:
+                self._file_vectors.clear()
+            self._remove_old_versions(keep={directory, previous})
+        self._notify_change()
+
+        self.printer.print(f"📦 Imported {header['count']} chunks from {path} in "
+                           f"{time.time() - start_time:.2f} seconds", "bold_green")
+        return header["count"]
+
+    def _remove_old_versions(self, keep):
+        versions = os.path.join(self.root_directory, "versions")
+        keep = {os.path.abspath(directory) for directory in keep}
+        for name in os.listdir(versions):
+            directory = os.path.join(versions, name)
+            if os.path.abspath(directory) not in keep:
+                shutil.rmtree(directory, ignore_errors=True)
 
     def get_retriever(self, search_type: str = "similarity", search_kwargs: dict = {"k": 20}):
         """
         Get a retriever instance from the vector database.
         Args:
-            search_type: Type of search to perform ('similarity' by default)
+            search_type: Type of search to perform ('similarity' by default, 'hybrid'
+                to fuse BM25 and dense results with reciprocal rank fusion, or 'quantized'
+                to scan compact int8/binary codes and re-score the best candidates exactly)
             search_kwargs: Additional search parameters (default k=20 for top results)
         Returns:
             Retriever instance or None if database is not available
@@ -108,6 +523,15 @@ class VectorDB:
         if self.vector_db is None:
             self.printer.print("⚠ No vector database available", "red")
             return None
-            
-        self.printer.print(f"Getting retriever with search_type={search_type}, search_kwargs={search_kwargs}", "cyan")
+
+        if search_type == "hybrid":
+            return HybridRetriever(vector_store=self.vector_db, lexical_index=self.lexical_index,
+                                   docstore=self.docstore, **search_kwargs)
+        if search_type == "quantized":
+            with self._write_lock:
+                if self.quantized_index is None:
+                    self.quantized_index = QuantizedIndex(self._quantized_directory(), mode=self.quantization)
+                    self._sync_quantized_index()
+            return QuantizedRetriever(vector_store=self.vector_db, index=self.quantized_index,
+                                      embedding=self.embedding, **search_kwargs)
         return self.vector_db.as_retriever(search_type=search_type, search_kwargs=search_kwargs)
@@ -0,0 +1,179 @@
+"""Workspaces: independent partitions of the corpus, searched alone or fanned out in parallel."""
+
+import contextvars
+import hashlib
+import heapq
+import os
+import re
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from rag.vectordb import VectorDB
+from util.metrics import metrics
+
+DEFAULT_WORKSPACE = "default"
+
+_NAME_PATTERN = re.compile(r"^[A-Za-z0-9_-]{1,64}$")
+
+
+class WorkspaceStore:
+    """
+    Keeps one VectorDB (Chroma collection, BM25 index and manifest) per workspace, so
+    a query only touches the indexes of the workspaces it names. The default workspace
+    is the given VectorDB; the others live in <its persist directory>/workspaces/<name>
+    and share its embedding model and cache.
+    """
+
+    def __init__(self, default_db, max_workers=8):
+        self.default_db = default_db
+        self.directory = os.path.join(default_db.root_directory, "workspaces")
+        self._dbs = {DEFAULT_WORKSPACE: default_db}
+        self._lock = threading.Lock()
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="shard")
+
+    def get(self, workspace=None, create=False):
+        """
+        Return the VectorDB of a workspace, opening it on first use.
+        Args:
+            workspace: Workspace name, None for the default one
+            create: Create the workspace if it does not exist; otherwise an unknown
+                name raises ValueError, so read paths cannot create workspaces
+        """
+        workspace = workspace or DEFAULT_WORKSPACE
+        db = self._dbs.get(workspace)
+        if db is not None:
+            return db
+        if not _NAME_PATTERN.match(workspace):
+            raise ValueError(f"Invalid workspace name {workspace!r}")
+        persist_directory = os.path.join(self.directory, workspace)
+        with self._lock:
+            db = self._dbs.get(workspace)
+            if db is None:
+                if not create and not os.path.isdir(persist_directory):
+                    raise ValueError(f"Unknown workspace {workspace!r}")
+                db = VectorDB(persist_directory=persist_directory, embedding=self.default_db.embedding,
+                              embedding_cache_dir=None)
+                # Mark the workspace as existing before its first chunks are written
+                os.makedirs(persist_directory, exist_ok=True)
+                self._dbs[workspace] = db
+        return db
+
+    def names(self):
+        """Workspaces that are open or exist on disk."""
+        on_disk = os.listdir(self.directory) if os.path.isdir(self.directory) else []
+        return sorted(set(self._dbs) | set(on_disk))
+
+    def open_dbs(self):
+        return list(self._dbs.values())
+
+    @staticmethod
+    def _is_default(workspaces, file_hashes):
+        return not file_hashes and (not workspaces or list(workspaces) == [DEFAULT_WORKSPACE])
+
+    def scope(self, workspaces=None, file_hashes=None):
+        """Semantic cache scope of a query; empty for the unfiltered default workspace."""
+        if self._is_default(workspaces, file_hashes):
+            return ""
+        return ",".join(sorted(workspaces or [DEFAULT_WORKSPACE])) + "|" + ",".join(sorted(file_hashes or []))
+
+    def fingerprint(self, workspaces=None, file_hashes=None):
+        """Fingerprint of the contents a query can see."""
+        if self._is_default(workspaces, file_hashes):
+            return self.default_db.fingerprint()
+        parts = [self.get(workspace).fingerprint() for workspace in sorted(workspaces or [DEFAULT_WORKSPACE])]
+        return hashlib.md5((",".join(parts) + "|" + self.scope(workspaces, file_hashes)).encode()).hexdigest()
+
+    @staticmethod
+    def _retriever(db, k, file_hashes):
+        search_kwargs = {"k": k}
+        if file_hashes:
+            search_kwargs.update(db.file_filter(file_hashes))
+        return db.get_retriever(search_type="hybrid", search_kwargs=search_kwargs)
+
+    @staticmethod
+    def _tag(docs, workspace):
+        """Record the workspace of each result, so its stored embedding can be found later."""
+        for doc in docs:
+            doc.metadata["workspace"] = workspace
+        return docs
+
+    def _search_one(self, workspace, question, query_vector, k, file_hashes):
+        db = self.get(workspace)
+        if db.vector_db is None:
+            return []
+        return self._tag(self._retriever(db, k, file_hashes).search(question, query_vector), workspace)
+
+    def _search_batch_one(self, workspace, questions, query_vectors, k, file_hashes):
+        db = self.get(workspace)
+        if db.vector_db is None:
+            return [[] for _ in questions]
+        results = self._retriever(db, k, file_hashes).search_batch(questions, query_vectors)
+        return [self._tag(docs, workspace) for docs in results]
+
+    def get_embeddings(self, ids_by_workspace):
+        """
+        Stored embeddings of chunks, read from the workspaces they were retrieved from.
+        Args:
+            ids_by_workspace: {workspace name: chunk IDs}
+        Returns:
+            {(workspace, chunk ID): embedding} for the chunks that are stored
+        """
+        return {
+            (workspace, chunk_id): vector
+            for workspace, ids in ids_by_workspace.items()
+            for chunk_id, vector in self.get(workspace).get_embeddings(ids).items()
+        }
+
+    def search(self, question, query_vector=None, workspaces=None, k=20, file_hashes=None):
+        """
+        Hybrid search restricted to the given workspaces and, optionally, files.
+        Filters are applied inside each index before ranking; several workspaces are
+        searched in parallel and their results merged by fusion score.
+        Args:
+            question: Query text
+            query_vector: Precomputed query embedding
+            workspaces: Workspace names (default workspace if empty)
+            k: Number of results
+            file_hashes: Optional MD5 hashes of the files to search within
+        """
+        names = list(dict.fromkeys(workspaces or [DEFAULT_WORKSPACE]))
+        for workspace in names:
+            self.get(workspace)
+        if len(names) == 1:
+            return self._search_one(names[0], question, query_vector, k, file_hashes)
+
+        # Each shard runs in a copy of this context so its spans nest under the caller's
+        with metrics.span("retrieve_fanout"):
+            futures = [
+                self.executor.submit(contextvars.copy_context().run, self._search_one,
+                                     workspace, question, query_vector, k, file_hashes)
+                for workspace in names
+            ]
+            results = [doc for future in futures for doc in future.result()]
+        return heapq.nlargest(k, results, key=lambda doc: doc.metadata.get("fusion_score", 0.0))
+
+    def search_batch(self, questions, query_vectors, workspaces=None, k=20, file_hashes=None):
+        """
+        search() for many questions with the same workspaces and files, running one
+        batched dense search per workspace.
+        Returns:
+            One list of documents per question
+        """
+        names = list(dict.fromkeys(workspaces or [DEFAULT_WORKSPACE]))
+        for workspace in names:
+            self.get(workspace)
+        if len(names) == 1:
+            return self._search_batch_one(names[0], questions, query_vectors, k, file_hashes)
+
+        with metrics.span("retrieve_fanout"):
+            futures = [
+                self.executor.submit(contextvars.copy_context().run, self._search_batch_one,
+                                     workspace, questions, query_vectors, k, file_hashes)
+                for workspace in names
+            ]
+            per_db = [future.result() for future in futures]
+        return [
+            heapq.nlargest(k, [doc for results in per_question for doc in results],
+                           key=lambda doc: doc.metadata.get("fusion_score", 0.0))
+            for per_question in zip(*per_db)
+        ]
@@ -0,0 +1,39 @@
+"""
+Crash-safe append-only files: data is appended and synced first, then a small JSON
+meta file is swapped in atomically with the new sizes. The meta file is the commit
+point, so anything past the committed sizes was written by an interrupted append.
+"""
+
+import json
+import os
+
+from util.printer import Printer
+
+
+def append(path, data):
+    """Append bytes to a file and sync them to disk."""
+    with open(path, "ab") as f:
+        f.write(data)
+        f.flush()
+        os.fsync(f.fileno())
+
+
+def commit(meta_path, meta):
+    """Write the meta file to a temporary file and atomically swap it in."""
+    tmp_path = meta_path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(meta, f)
+    os.replace(tmp_path, meta_path)
+
+
+def truncate_uncommitted(sizes):
+    """
+    Cut files back to their committed sizes.
+    Args:
+        sizes: {path: committed size in bytes}
+    """
+    for path, size in sizes.items():
+        if os.path.exists(path) and os.path.getsize(path) > size:
+            Printer().print(f"⚠ Truncating uncommitted data in {path}", "yellow")
+            with open(path, "r+b") as f:
+                f.truncate(size)
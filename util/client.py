@@ -0,0 +1,136 @@
+"""Thin HTTP client for the AskDocs service (see api.py)."""
+
+import json
+import shutil
+import threading
+import urllib.parse
+import urllib.request
+from collections import OrderedDict
+
+
+class AskDocsClient:
+    """
+    Client shared by every session of the UI process. Chunks it receives are kept in
+    one LRU keyed by chunk ID, so sessions can hold IDs and look the texts up again.
+    """
+
+    def __init__(self, base_url="http://127.0.0.1:8000", timeout=120, chunk_cache_size=2048):
+        self.base_url = base_url.rstrip("/")
+        self.timeout = timeout
+        self.chunk_cache_size = chunk_cache_size
+        self._chunk_cache = OrderedDict()  # id -> Document, least recently used first
+        self._chunk_cache_lock = threading.Lock()
+
+    def _request(self, method, path, body=None, content_type="application/json"):
+        data = body
+        if body is not None and content_type == "application/json":
+            data = json.dumps(body).encode()
+        request = urllib.request.Request(
+            self.base_url + path, data=data, method=method,
+            headers={"Content-Type": content_type} if data is not None else {},
+        )
+        return urllib.request.urlopen(request, timeout=self.timeout)
+
+    def _json(self, method, path, body=None, content_type="application/json"):
+        with self._request(method, path, body, content_type) as response:
+            return json.loads(response.read())
+
+    def _documents(self, docs):
+        # Imported on first use to keep the UI's startup light
+        from langchain_core.documents import Document
+
+        return self._remember([Document(page_content=doc["page_content"], metadata=doc["metadata"])
+                               for doc in docs])
+
+    def _remember(self, documents):
+        """Add documents to the LRU; returns them with cached chunks swapped for the cached copy."""
+        shared = []
+        with self._chunk_cache_lock:
+            for doc in documents:
+                chunk_id = doc.metadata.get("id")
+                if chunk_id:
+                    doc = self._chunk_cache.setdefault(chunk_id, doc)
+                    self._chunk_cache.move_to_end(chunk_id)
+                shared.append(doc)
+            while len(self._chunk_cache) > self.chunk_cache_size:
+                self._chunk_cache.popitem(last=False)
+        return shared
+
+    def chunks(self, ids, workspaces=None):
+        """Return the chunks with the given IDs, from the shared LRU or else from the service."""
+        with self._chunk_cache_lock:
+            found = {chunk_id: self._chunk_cache[chunk_id] for chunk_id in ids if chunk_id in self._chunk_cache}
+            for chunk_id in found:
+                self._chunk_cache.move_to_end(chunk_id)
+        missing = [chunk_id for chunk_id in ids if chunk_id not in found]
+        if missing:
+            body = {"ids": missing, "workspaces": workspaces or []}
+            for doc in self._documents(self._json("POST", "/chunks", body)["docs"]):
+                found[doc.metadata.get("id")] = doc
+        return [found[chunk_id] for chunk_id in ids if chunk_id in found]
+
+    def health(self):
+        return self._json("GET", "/health")
+
+    def ready(self):
+        """Return True once the service has loaded its models and indexes."""
+        try:
+            return self._json("GET", "/ready")["status"] == "ready"
+        except OSError:
+            return False
+
+    def ingest(self, pdf_bytes, name, workspace=None):
+        """Upload a PDF for background ingestion; returns the job's progress."""
+        query = urllib.parse.urlencode({"name": name, **({"workspace": workspace} if workspace else {})})
+        return self._json("POST", f"/ingest?{query}", pdf_bytes, content_type="application/pdf")
+
+    @staticmethod
+    def _workspace_query(workspace):
+        return urllib.parse.urlencode({"workspace": workspace} if workspace else {})
+
+    def export_bundle(self, path, workspace=None):
+        """Download the index of a workspace as a bundle file."""
+        with self._request("GET", f"/bundle?{self._workspace_query(workspace)}") as response, \
+                open(path, "wb") as f:
+            shutil.copyfileobj(response, f)
+
+    def import_bundle(self, path, workspace=None):
+        """Replace the index of a workspace with a bundle file; returns {"chunks": count}."""
+        with open(path, "rb") as f:
+            return self._json("POST", f"/bundle?{self._workspace_query(workspace)}", f.read(),
+                              content_type="application/zip")
+
+    def job(self, job_id):
+        return self._json("GET", f"/jobs/{job_id}")
+
+    def workspaces(self):
+        return self._json("GET", "/workspaces")["workspaces"]
+
+    def retrieve(self, question, k=20, workspaces=None, file_hashes=None):
+        body = {"question": question, "k": k, "workspaces": workspaces or [], "file_hashes": file_hashes or []}
+        return self._documents(self._json("POST", "/retrieve", body)["docs"])
+
+    @staticmethod
+    def _ask_body(question, history, workspaces, file_hashes, conversation_id):
+        return {"question": question, "history": history or [], "workspaces": workspaces or [],
+                "file_hashes": file_hashes or [], "conversation_id": conversation_id or ""}
+
+    def ask(self, question, history=None, workspaces=None, file_hashes=None, conversation_id=None):
+        result = self._json("POST", "/ask",
+                            self._ask_body(question, history, workspaces, file_hashes, conversation_id))
+        result["docs"] = self._documents(result["docs"])
+        return result
+
+    def ask_stream(self, question, history=None, workspaces=None, file_hashes=None, conversation_id=None):
+        """
+        Yield the service's answer events; the "docs" event carries Document objects.
+        """
+        body = self._ask_body(question, history, workspaces, file_hashes, conversation_id)
+        with self._request("POST", "/ask/stream", body) as response:
+            for line in response:
+                if not line.strip():
+                    continue
+                event = json.loads(line)
+                if event["type"] == "docs":
+                    event["docs"] = self._documents(event["docs"])
+                yield event
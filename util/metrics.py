@@ -0,0 +1,232 @@
+"""
+Lightweight in-process instrumentation: nested timing spans, counters and
+latency histograms, exported in the Prometheus text format.
+
+    from util.metrics import metrics
+
+    with metrics.span("retrieve"):
+        ...
+    metrics.inc("chunks_added", len(new_chunks))
+
+Set ASKDOCS_METRICS=0 to disable; spans then return a shared no-op object.
+"""
+
+import bisect
+import contextvars
+import functools
+import os
+import threading
+import time
+from collections import deque
+
+# Upper bounds in seconds, from sub-millisecond lookups to slow LLM calls
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+_current_span = contextvars.ContextVar("askdocs_span", default=None)
+
+
+class Histogram:
+    """Cumulative-bucket histogram with an estimated percentile."""
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def percentile(self, q):
+        """Estimate the q-th percentile (0-100) by interpolating within its bucket."""
+        if not self.count:
+            return 0.0
+        rank = q / 100 * self.count
+        seen = 0
+        for index, count in enumerate(self.counts):
+            if count and seen + count >= rank:
+                lower = self.buckets[index - 1] if index > 0 else 0.0
+                upper = self.buckets[index] if index < len(self.buckets) else self.buckets[-1]
+                return lower + (upper - lower) * (rank - seen) / count
+            seen += count
+        return self.buckets[-1]
+
+
+class _NoopSpan:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NOOP_SPAN = _NoopSpan()
+
+
+class _Timer:
+    """Records a stage duration without joining the current span tree."""
+
+    __slots__ = ("metrics", "name", "start")
+
+    def __init__(self, metrics, name):
+        self.metrics = metrics
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.metrics.record(self.name, time.perf_counter() - self.start, error=exc_type is not None)
+        return False
+
+
+class Span(_Timer):
+    """A timed stage that nests under the span active in the current context."""
+
+    __slots__ = ("parent", "children", "duration", "_token")
+
+    def __enter__(self):
+        self.parent = _current_span.get()
+        self.children = []
+        self._token = _current_span.set(self)
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.duration = time.perf_counter() - self.start
+        _current_span.reset(self._token)
+        self.metrics.record(self.name, self.duration, error=exc_type is not None)
+        if self.parent is not None:
+            self.parent.children.append(self)
+        else:
+            self.metrics.traces.append(self)
+        return False
+
+    def to_dict(self):
+        return {
+            "name": self.name,
+            "ms": round(self.duration * 1000, 3),
+            "children": [child.to_dict() for child in self.children],
+        }
+
+
+class Metrics:
+    """
+    Process-wide registry. Every span or timer feeds the askdocs_stage_seconds
+    histogram labelled by stage; root spans are kept as recent traces.
+    """
+
+    def __init__(self, enabled=True, trace_limit=100, buckets=DEFAULT_BUCKETS):
+        self.enabled = enabled
+        self.buckets = buckets
+        self._lock = threading.Lock()
+        self.counters = {}
+        self.histograms = {}
+        self.traces = deque(maxlen=trace_limit)
+
+    def span(self, name):
+        """Context manager timing a pipeline stage, nested under the current span."""
+        return Span(self, name) if self.enabled else _NOOP_SPAN
+
+    def timer(self, name):
+        """Like span, for work on background threads that has no request to nest under."""
+        return _Timer(self, name) if self.enabled else _NOOP_SPAN
+
+    def timed(self, name):
+        """Decorator wrapping every call of a function in a span."""
+        def decorator(fn):
+            @functools.wraps(fn)
+            def wrapper(*args, **kwargs):
+                if not self.enabled:
+                    return fn(*args, **kwargs)
+                with Span(self, name):
+                    return fn(*args, **kwargs)
+            return wrapper
+        return decorator
+
+    def record(self, stage, seconds, error=False):
+        """Record a stage duration measured by the caller."""
+        self.observe("stage_seconds", seconds, stage=stage)
+        if error:
+            self.inc("stage_errors", stage=stage)
+
+    def inc(self, name, value=1, **labels):
+        if not self.enabled:
+            return
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self.counters[key] = self.counters.get(key, 0) + value
+
+    def observe(self, name, value, **labels):
+        if not self.enabled:
+            return
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            histogram = self.histograms.get(key)
+            if histogram is None:
+                histogram = self.histograms[key] = Histogram(self.buckets)
+            histogram.observe(value)
+
+    def reset(self):
+        with self._lock:
+            self.counters.clear()
+            self.histograms.clear()
+            self.traces.clear()
+
+    def snapshot(self):
+        """Counters and per-stage latency summaries (milliseconds) as plain dicts."""
+        with self._lock:
+            counters = {_format_key(name, labels): value for (name, labels), value in self.counters.items()}
+            stages = {}
+            for (name, labels), histogram in self.histograms.items():
+                stages[_format_key(name, labels)] = {
+                    "count": histogram.count,
+                    "mean_ms": histogram.sum / histogram.count * 1000,
+                    "p50_ms": histogram.percentile(50) * 1000,
+                    "p99_ms": histogram.percentile(99) * 1000,
+                }
+        return {"counters": counters, "histograms": stages}
+
+    def recent_traces(self, limit=20):
+        """The most recent root spans with their nested children, newest first."""
+        return [span.to_dict() for span in list(self.traces)[::-1][:limit]]
+
+    def render_prometheus(self):
+        """Render all metrics in the Prometheus text exposition format."""
+        lines = []
+        with self._lock:
+            for name in sorted({name for name, _ in self.counters}):
+                lines.append(f"# TYPE askdocs_{name}_total counter")
+                for (key, labels), value in self.counters.items():
+                    if key == name:
+                        lines.append(f"askdocs_{name}_total{_format_labels(labels)} {value}")
+
+            for name in sorted({name for name, _ in self.histograms}):
+                lines.append(f"# TYPE askdocs_{name} histogram")
+                for (key, labels), histogram in self.histograms.items():
+                    if key != name:
+                        continue
+                    cumulative = 0
+                    for bound, count in zip(histogram.buckets + ("+Inf",), histogram.counts):
+                        cumulative += count
+                        bucket_labels = _format_labels(labels + (("le", str(bound)),))
+                        lines.append(f"askdocs_{name}_bucket{bucket_labels} {cumulative}")
+                    lines.append(f"askdocs_{name}_sum{_format_labels(labels)} {histogram.sum}")
+                    lines.append(f"askdocs_{name}_count{_format_labels(labels)} {histogram.count}")
+        return "\n".join(lines) + "\n"
+
+
+def _format_labels(labels):
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{key}="{value}"' for key, value in labels) + "}"
+
+
+def _format_key(name, labels):
+    return name + _format_labels(labels)
+
+
+metrics = Metrics(enabled=os.getenv("ASKDOCS_METRICS", "1") != "0")
@@ -1,40 +1,101 @@
 import PyPDF2
+import hashlib
+import io
+import multiprocessing
+import os
 import re
-from langchain.schema import Document
-from util.printer import Printer
-
-printer = Printer()
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from langchain_core.documents import Document
+from util.metrics import metrics
 
 def convert_to_documents(chunks):
     """Convert text chunks into Document objects."""
-    printer.print(f"Converting {len(chunks)} text chunks into Document objects...", "cyan")
-    documents = [Document(page_content=chunk) for chunk in chunks]
-    printer.print("Conversion completed successfully.", "bold_green")
-    return documents
+    return [Document(page_content=chunk) for chunk in chunks]
+
+def _read_pdf_bytes(pdf_file):
+    """Return the raw bytes of an uploaded file object or a path."""
+    if hasattr(pdf_file, "read"):
+        pdf_file.seek(0)
+        return pdf_file.read()
+    with open(pdf_file, "rb") as f:
+        return f.read()
+
+# Per-process reader, opened once by each pool worker
+_worker_reader = None
+
+def _init_pdf_worker(pdf_bytes):
+    global _worker_reader
+    _worker_reader = PyPDF2.PdfReader(io.BytesIO(pdf_bytes))
+
+def _extract_page(page_index):
+    return _worker_reader.pages[page_index].extract_text() or ""
+
+def iter_pdf_pages(pdf_file, max_workers=None, max_pending=None, min_parallel_pages=16, on_page_count=None):
+    """
+    Yield (page_number, text) for every page of a PDF, in page order.
+    Args:
+        pdf_file: Uploaded file object or path to a PDF
+        max_workers: Size of the extraction process pool (defaults to the CPU count)
+        max_pending: Maximum pages in flight at once, bounding memory use (default 2x workers)
+        min_parallel_pages: PDFs with fewer pages are extracted serially in-process
+        on_page_count: Called with the number of pages before the first one is extracted
+    """
+    pdf_bytes = _read_pdf_bytes(pdf_file)
+    pdf_reader = PyPDF2.PdfReader(io.BytesIO(pdf_bytes))
+    page_count = len(pdf_reader.pages)
+    if on_page_count is not None:
+        on_page_count(page_count)
+    max_workers = max_workers or os.cpu_count() or 1
+
+    if max_workers == 1 or page_count < min_parallel_pages:
+        for page_index, page in enumerate(pdf_reader.pages):
+            with metrics.timer("extract_page"):
+                text = page.extract_text() or ""
+            metrics.inc("pages_extracted")
+            yield page_index + 1, text
+        return
+
+    del pdf_reader
+    max_pending = max_pending or max_workers * 2
+    # Forking a process that runs the server, the embedding batcher and torch/onnx thread
+    # pools can deadlock the children, so workers start from a clean forkserver (or spawn)
+    start_method = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+    with ProcessPoolExecutor(max_workers=max_workers, initializer=_init_pdf_worker, initargs=(pdf_bytes,),
+                             mp_context=multiprocessing.get_context(start_method)) as pool:
+        pending = deque()
+        next_page = 0
+        page_number = 0
+        try:
+            while next_page < page_count or pending:
+                # Keep a bounded window of pages in flight
+                while next_page < page_count and len(pending) < max_pending:
+                    pending.append(pool.submit(_extract_page, next_page))
+                    next_page += 1
+                page_number += 1
+                with metrics.timer("extract_page"):
+                    text = pending.popleft().result()
+                metrics.inc("pages_extracted")
+                yield page_number, text
+        finally:
+            for future in pending:
+                future.cancel()
 
 def extract_text_from_pdf(pdf_file):
     """Read a PDF file and extract text."""
-    printer.print(f"Extracting text from PDF: {pdf_file.name}", "yellow")
-    pdf_reader = PyPDF2.PdfReader(pdf_file)
-    text = ""
-    
-    printer.print(f"PDF contains {len(pdf_reader.pages)} pages.", "cyan")
-    for i, page in enumerate(pdf_reader.pages, 1):
-        extracted_text = page.extract_text()
-        if extracted_text:
-            text += extracted_text
-
-    printer.print(f"Total pages processed: {len(pdf_reader.pages)}", "bold_green")
-    return text
+    with metrics.span("extract"):
+        return "".join(text for _, text in iter_pdf_pages(pdf_file))
 
 def chunk_text(text, chunk_size=500):
     """Split text into chunks based on sentence boundaries or line breaks."""
-    printer.print(f"Chunking text with size limit: {chunk_size} characters...", "yellow")
-    printer.print(f"Initial text length: {len(text)} characters.", "cyan")
+    with metrics.span("chunk"):
+        merged_chunks = _merge_sentences(text, chunk_size)
+    metrics.inc("chunks_created", len(merged_chunks))
+    return merged_chunks
 
+def _merge_sentences(text, chunk_size):
     # Split based on ".", "?", "!", or double line breaks "\n\n"
     chunks = re.split(r'(?<=[.?!])\s+|\n\n', text)
-    printer.print(f"Initial split resulted in {len(chunks)} chunks.", "cyan")
 
     # Merge short chunks
     merged_chunks = []
@@ -55,5 +116,77 @@ def chunk_text(text, chunk_size=500):
     if buffer:  # Add the remaining text
         merged_chunks.append(buffer.strip())
 
-    printer.print(f"Total chunks created: {len(merged_chunks)}", "bold_green")
     return merged_chunks
+
+
+# Sentence ends (".", "?", "!") followed by whitespace, or paragraph breaks
+_SEGMENT_SEPARATOR = re.compile(r'(?<=[.?!])\s+|\n\n')
+
+def _iter_segments(text, chunk_size):
+    """Yield (start, end) offsets of sentences, splitting any longer than chunk_size."""
+    position = 0
+    for match in _SEGMENT_SEPARATOR.finditer(text):
+        yield from _split_segment(text, position, match.start(), chunk_size)
+        position = match.end()
+    yield from _split_segment(text, position, len(text), chunk_size)
+
+def _split_segment(text, start, end, chunk_size):
+    # Trim surrounding whitespace without copying the text
+    while start < end and text[start].isspace():
+        start += 1
+    while end > start and text[end - 1].isspace():
+        end -= 1
+    while end - start > chunk_size:
+        yield start, start + chunk_size
+        start += chunk_size
+    if start < end:
+        yield start, end
+
+def iter_chunks(pages, file_hash, source=None, chunk_size=500, overlap=50):
+    """
+    Stream Documents from (page_number, text) pairs in a single pass.
+    Sentences are packed into chunks of at most chunk_size characters, and each chunk
+    repeats the trailing sentences of the previous one that fit within overlap characters.
+    Args:
+        pages: Iterable of (page_number, text), e.g. from iter_pdf_pages
+        file_hash: MD5 of the source file, stored on every chunk
+        source: Display name of the source file
+        chunk_size: Character budget per chunk
+        overlap: Character budget shared between consecutive chunks on a page
+    Yields:
+        Document with metadata source, file_hash, page, start, end (page offsets) and id
+    """
+    for page_number, text in pages:
+        with metrics.timer("chunk_page"):
+            segments = list(_iter_segments(text, chunk_size))
+        first = 0
+        while first < len(segments):
+            start = segments[first][0]
+            last = first
+            while last + 1 < len(segments) and segments[last + 1][1] - start <= chunk_size:
+                last += 1
+            end = segments[last][1]
+
+            # Replacing single characters keeps the offsets valid for the page text
+            content = text[start:end].replace("\n", " ")
+            metrics.inc("chunks_created")
+            yield Document(
+                page_content=content,
+                metadata={
+                    "source": source or file_hash,
+                    "file_hash": file_hash,
+                    "page": page_number,
+                    "start": start,
+                    "end": end,
+                    "id": hashlib.md5(content.encode()).hexdigest(),
+                },
+            )
+
+            # Start the next chunk at the earliest sentence that fits in the overlap, as long as
+            # the following sentence still fits after it, so every chunk holds new text
+            next_first = last + 1
+            while (next_first < len(segments) and next_first - 1 > first
+                   and end - segments[next_first - 1][0] <= overlap
+                   and segments[last + 1][1] - segments[next_first - 1][0] <= chunk_size):
+                next_first -= 1
+            first = next_first